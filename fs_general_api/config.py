@@ -9,6 +9,12 @@ class GitConnProtocol(Enum):
     SSH = "ssh"
 
 
+class GitCheckoutMode(Enum):
+    CLONE = "clone"
+    MIRROR = "mirror"
+    SPARSE = "sparse"
+
+
 class Settings(BaseSettings):
     schema_name: str
     db_user: str
@@ -16,6 +22,13 @@ class Settings(BaseSettings):
     db_host: str
     db_port: str
     db_name: str
+    db_async_mode: bool = False
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_timeout: Optional[int] = None
     backend_uri_dev: str
     backend_uri_prod: str
     backend_proxy_url: str = "http://fs-backend-proxy:8080"
@@ -37,9 +50,59 @@ class Settings(BaseSettings):
     git_conn_protocol: GitConnProtocol = GitConnProtocol.HTTP
     git_username: Optional[str] = None
     git_password: Optional[str] = None
+    git_checkout_mode: GitCheckoutMode = GitCheckoutMode.MIRROR
+    git_mirror_cache_dir: str = "/tmp/fs_general_api/git_mirrors"
+    git_timeout: float = 600
+    git_connect_timeout: int = 30
+    git_low_speed_limit: int = 1000
+    git_low_speed_time: int = 60
+    checker_git_checkout_mode: Optional[GitCheckoutMode] = None
+    synchronizer_git_checkout_mode: Optional[GitCheckoutMode] = None
     etl_status_update_timeout: int = 2
+    use_etl_run_events: bool = False
+    etl_status_reconciliation_timeout: int = 30
+    schedule_index_lookback_hours: int = 24
+    schedule_index_horizon_hours: int = 48
+    schedule_index_refresh_timeout: int = 10
+    schedule_index_max_fire_times: int = 5000
+    schedule_load_max_window_days: int = 31
+    checker_workers: int = 2
+    checker_worker_concurrency: int = 2
+    checker_queue_timeout: float = 1
+    checker_batch_size: int = 10
+    checker_synchronizes: bool = False
+    checker_fair_by_hub: bool = False
+    synchronizer_batch_size: int = 10
+    checker_checks: List[str] = []
+    checker_check_threads: int = 8
+    checker_check_timeout: float = 60
+    checker_scan_threads: int = 4
+    event_handler_batch_size: int = 100
+    event_handler_queue_timeout: float = 1
+    use_db_job_queue: bool = False
+    embedded_workers: bool = True
+    job_lease_timeout: float = 60
+    job_max_attempts: int = 3
+    job_poll_interval: float = 1
+    job_notify: bool = True
+    job_notify_fallback_interval: float = 30
+    job_backoff_base: float = 5
+    use_outbox: bool = True
+    outbox_dispatch_interval: float = 5
+    outbox_batch_size: int = 100
+    outbox_concurrency: int = 10
+    outbox_max_attempts: int = 12
+    outbox_backoff_base: float = 2
+    outbox_backoff_max: float = 600
+    outbox_lease: float = 120
     server_port: int = 8000
 
+    http_pool_limit: int = 100
+    http_pool_limit_per_host: int = 20
+    http_keepalive_timeout: float = 30
+    http_dns_cache_ttl: int = 300
+    http_request_timeout: float = 300
+
     retro_metric_start_version_require: str = "0.23.24"
 
     airflow_ssh_host_prod: str = "0.0.0.0"
@@ -55,5 +118,9 @@ class Settings(BaseSettings):
     def connection_uri(self):
         return f"postgresql://{self.db_user}:{self.db_pass}@{self.db_host}:{self.db_port}/{self.db_name}"
 
+    @property
+    def async_connection_uri(self):
+        return f"postgresql+asyncpg://{self.db_user}:{self.db_pass}@{self.db_host}:{self.db_port}/{self.db_name}"
+
 
 settings = Settings()
@@ -0,0 +1,317 @@
+"""
+Пакетное вычисление cron-расписаний.
+
+Набор cron-выражений компилируется в битовые маски NumPy (минуты, часы, дни месяца, месяцы,
+дни недели), после чего ответы на вопросы «какие из N расписаний срабатывают в интервале»
+и «когда следующий запуск у каждого из N расписаний» вычисляются одним проходом по массивам,
+без построения `croniter` на каждое выражение.
+
+Поддерживается подмножество синтаксиса, допустимое
+`EtlProjectSynchronizer.CRON_EXPRESSION_PATTERN`: в каждом поле `*`, число или `*/шаг`.
+Результаты совпадают с `croniter`, включая правило объединения (OR) дня месяца и дня недели,
+когда ограничены оба поля.
+"""
+import re
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# (минимум, максимум) значений полей: минута, час, день месяца, месяц, день недели
+FIELD_RANGES: Tuple[Tuple[int, int], ...] = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+_FIELD_RE = re.compile(r"^(\*|\d+|\*/\d+)$")
+
+MINUTES_IN_DAY = 24 * 60
+
+# максимальное число дней в месяце (с учетом високосного февраля), индекс - номер месяца
+_MONTH_LENGTHS = np.array([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+# Периоды (в днях), на которых ищется следующий запуск. Второй покрывает самые редкие
+# выполнимые расписания (29 февраля), между которыми бывает до 8 лет.
+_SEARCH_HORIZONS_DAYS = (62, 9 * 366)
+
+
+class CronExpressionError(ValueError):
+    pass
+
+
+def _parse_field(token: str, low: int, high: int) -> np.ndarray:
+    if not _FIELD_RE.match(token):
+        raise CronExpressionError(f"Unsupported cron field `{token}`")
+
+    mask = np.zeros(high + 1, dtype=bool)
+
+    if token == "*":
+        mask[low:] = True
+    elif token.startswith("*/"):
+        step = int(token[2:])
+        if step == 0:
+            raise CronExpressionError(f"Invalid cron step in `{token}`")
+        mask[low::step] = True
+    else:
+        value = int(token)
+        if not low <= value <= high:
+            raise CronExpressionError(f"Cron value `{token}` is out of range")
+        mask[value] = True
+
+    return mask
+
+
+class CompiledCronSet:
+    """
+    Скомпилированный набор cron-выражений.
+
+    Args:
+        expressions: cron-выражения из пяти полей
+    """
+
+    def __init__(self, expressions: Sequence[str]):
+        self.expressions = list(expressions)
+
+        masks = [[], [], [], [], []]
+        day_or = []
+
+        for expression in self.expressions:
+            tokens = expression.split()
+            if len(tokens) != 5:
+                raise CronExpressionError(
+                    f"Cron expression `{expression}` must have 5 fields"
+                )
+
+            for field_masks, token, (low, high) in zip(
+                masks, tokens, FIELD_RANGES
+            ):
+                field_masks.append(_parse_field(token, low, high))
+
+            day_or.append(self._is_day_or(tokens, masks[2][-1], masks[4][-1]))
+
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            np.array(field_masks, dtype=bool).reshape(
+                len(self.expressions), high + 1
+            )
+            for field_masks, (_, high) in zip(masks, FIELD_RANGES)
+        )
+        self.day_or = np.array(day_or, dtype=bool)
+
+        # croniter не находит запуск, если заданные дни месяца не встречаются ни в одном
+        # из заданных месяцев, даже когда по правилу OR подошел бы день недели
+        days_in_months = np.arange(32) <= _MONTH_LENGTHS[:, np.newaxis]
+        self.days_possible = (
+            self.months[:, :, np.newaxis]
+            & days_in_months[np.newaxis, :, :]
+            & self.days[:, np.newaxis, :]
+        ).any(axis=(1, 2))
+
+        # минуты суток, в которые срабатывает расписание: (N, 1440)
+        self.times_of_day = (
+            self.hours[:, :, np.newaxis] & self.minutes[:, np.newaxis, :]
+        ).reshape(len(self.expressions), MINUTES_IN_DAY)
+
+    def __len__(self) -> int:
+        return len(self.expressions)
+
+    @staticmethod
+    def is_supported(expression: str) -> bool:
+        try:
+            CompiledCronSet([expression])
+        except CronExpressionError:
+            return False
+        return True
+
+    @staticmethod
+    def _is_day_or(tokens: List[str], days: np.ndarray, weekdays: np.ndarray) -> bool:
+        """
+        Как и в croniter, поле дня месяца (дня недели) считается неограниченным, если оно равно `*`
+        или покрывает все значения при `*` в другом поле. Если ограничены оба поля, день подходит
+        при совпадении любого из них.
+        """
+        day_token, weekday_token = tokens[2], tokens[4]
+
+        day_is_star = day_token == "*" or (
+            days[1:].all() and "*" in weekday_token
+        )
+        weekday_is_star = weekday_token == "*" or (
+            weekdays.all() and "*" in day_token
+        )
+
+        return not day_is_star and not weekday_is_star
+
+    def _match_days(self, first_day: np.datetime64, days_count: int) -> np.ndarray:
+        """
+        Возвращает (N, days_count) маску дней, начиная с `first_day`, в которые расписание срабатывает
+        """
+        days = first_day + np.arange(days_count)
+        month_starts = days.astype("datetime64[M]")
+
+        months = month_starts.astype(np.int64) % 12 + 1
+        days_of_month = (days - month_starts.astype("datetime64[D]")).astype(np.int64) + 1
+        # 1970-01-01 - четверг (4 в нумерации cron, где 0 - воскресенье)
+        weekdays = (days.astype(np.int64) + 4) % 7
+
+        day_match = self.days[:, days_of_month]
+        weekday_match = self.weekdays[:, weekdays]
+        day_ok = np.where(
+            self.day_or[:, np.newaxis],
+            day_match | weekday_match,
+            day_match & weekday_match,
+        )
+
+        return day_ok & self.months[:, months]
+
+    def _first_fire_minutes(
+        self, start: np.datetime64, end: Optional[np.datetime64] = None
+    ) -> np.ndarray:
+        """
+        Возвращает для каждого расписания первый запуск не раньше `start` (datetime64[m])
+        или NaT, если расписание невыполнимо (или не срабатывает раньше `end`, если он задан).
+        """
+        result = np.full(len(self), np.datetime64("NaT"), dtype="datetime64[m]")
+        if not len(self):
+            return result
+
+        first_day = start.astype("datetime64[D]")
+        start_minute = int((start - first_day.astype("datetime64[m]")).astype(np.int64))
+
+        has_time = self.times_of_day.any(axis=1)
+        first_time = self.times_of_day.argmax(axis=1)
+
+        later_times = self.times_of_day[:, start_minute:]
+        has_later_time = later_times.any(axis=1)
+        first_later_time = later_times.argmax(axis=1) + start_minute
+
+        horizons = _SEARCH_HORIZONS_DAYS
+        if end is not None:
+            days_count = int((end.astype("datetime64[D]") - first_day).astype(np.int64))
+            horizons = (max(days_count + 1, 2),)
+
+        pending = has_time & self.days_possible
+        for horizon in horizons:
+            if not pending.any():
+                break
+
+            rows = np.flatnonzero(pending)
+            day_ok = self._match_days(first_day, horizon)[rows]
+
+            # в первый день подходят только запуски не раньше start
+            today = day_ok[:, 0] & has_later_time[rows]
+            later_days = day_ok[:, 1:]
+            has_later_day = later_days.any(axis=1)
+            first_later_day = later_days.argmax(axis=1) + 1
+
+            found = today | has_later_day
+            day_offsets = np.where(today, 0, first_later_day)
+            time_offsets = np.where(today, first_later_time[rows], first_time[rows])
+
+            found_rows = rows[found]
+            result[found_rows] = (
+                first_day.astype("datetime64[m]")
+                + (day_offsets[found] * MINUTES_IN_DAY + time_offsets[found]).astype(
+                    "timedelta64[m]"
+                )
+            )
+            pending[found_rows] = False
+
+        return result
+
+    def next_fire_times(
+        self, after: datetime, before: Optional[datetime] = None
+    ) -> List[Optional[datetime]]:
+        """
+        Следующий запуск каждого расписания строго после `after`,
+        аналог `croniter(expression, after).get_next(datetime)`.
+        Если задан `before`, запуски не раньше него не ищутся и возвращается None.
+        """
+        start = np.datetime64(after.replace(tzinfo=None), "m") + np.timedelta64(1, "m")
+        end = None
+        if before is not None:
+            end = np.datetime64(before.replace(tzinfo=None), "us")
+            if end <= start:
+                return [None] * len(self)
+
+        return [
+            None
+            if np.isnat(fire_time) or (end is not None and fire_time >= end)
+            else fire_time.item()
+            for fire_time in self._first_fire_minutes(start, end)
+        ]
+
+    def fires_between(self, start: datetime, end: datetime) -> np.ndarray:
+        """
+        Маска расписаний, у которых есть запуск в интервале [start, end)
+        """
+        first_minute = np.datetime64(start.replace(tzinfo=None), "m")
+        if first_minute.item() < start.replace(tzinfo=None):
+            first_minute += np.timedelta64(1, "m")
+
+        end = np.datetime64(end.replace(tzinfo=None), "us")
+        if end <= first_minute:
+            return np.zeros(len(self), dtype=bool)
+
+        first_fire = self._first_fire_minutes(first_minute, end)
+        return ~np.isnat(first_fire) & (first_fire < end)
+
+    def fire_counts(
+        self,
+        start: datetime,
+        end: datetime,
+        bucket_minutes: int,
+        weights: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Количество запусков в интервалах [start + i * bucket, start + (i + 1) * bucket) внутри [start, end).
+
+        Args:
+            start: начало периода
+            end: конец периода (не включительно)
+            bucket_minutes: длина интервала в минутах
+            weights: (G, N) матрица весов расписаний, например, число версий каждой группы с данным
+                расписанием; по умолчанию каждое расписание учитывается один раз
+
+        Returns:
+            (G, количество интервалов) матрица количества запусков
+        """
+        if weights is None:
+            weights = np.ones((1, len(self)))
+        weights = np.asarray(weights, dtype=np.float64)
+
+        first_minute = np.datetime64(start.replace(tzinfo=None), "m")
+        if first_minute.item() < start.replace(tzinfo=None):
+            first_minute += np.timedelta64(1, "m")
+        last_minute = np.datetime64(end.replace(tzinfo=None), "m")
+        if last_minute.item() == end.replace(tzinfo=None):
+            last_minute -= np.timedelta64(1, "m")
+
+        buckets_count = max(
+            0, -(-int((end - start).total_seconds()) // (bucket_minutes * 60))
+        )
+        if last_minute < first_minute or not len(self):
+            return np.zeros((weights.shape[0], buckets_count), dtype=np.int64)
+
+        first_day = first_minute.astype("datetime64[D]")
+        days_count = int(
+            (last_minute.astype("datetime64[D]") - first_day).astype(np.int64)
+        ) + 1
+
+        day_ok = self._match_days(first_day, days_count)
+        times_of_day = self.times_of_day.astype(np.float64)
+
+        minute_counts = np.empty((weights.shape[0], days_count * MINUTES_IN_DAY))
+        for day in range(days_count):
+            minute_counts[
+                :, day * MINUTES_IN_DAY:(day + 1) * MINUTES_IN_DAY
+            ] = (weights * day_ok[:, day]) @ times_of_day
+
+        offset = int((first_minute - first_day.astype("datetime64[m]")).astype(np.int64))
+        length = int((last_minute - first_minute).astype(np.int64)) + 1
+        window = minute_counts[:, offset:offset + length]
+
+        counts = np.zeros((weights.shape[0], buckets_count))
+        edges = np.arange(0, length, bucket_minutes)
+        counts[:, :len(edges)] = np.add.reduceat(window, edges, axis=1)
+
+        return np.rint(counts).astype(np.int64)
+
+
+def next_fire_time(expression: str, after: datetime) -> Optional[datetime]:
+    return CompiledCronSet([expression]).next_fire_times(after)[0]
@@ -1,22 +1,71 @@
 import asyncio
+import os
+import time
+import uuid
+from datetime import datetime
 from threading import Lock
-from typing import List, Iterable, Optional, Tuple, Generator
+from typing import (
+    Any,
+    AsyncGenerator,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
 from functools import wraps
 
 from fs_common_lib.fs_backend_api.internal_dto import InternalPdtEtlRun
-from fs_common_lib.fs_general_api.data_types import EtlProjectStatus
+from fs_common_lib.fs_general_api.data_types import (
+    CheckType,
+    EtlProjectStatus,
+    ProjectCheckResult,
+    SimpleCheckResult,
+)
 from fs_db.db_classes_general import (
     EtlProject,
     EtlProjectVersion,
+    GeneralCheck,
     HistoryEvent,
     ProjectTransferRequest,
+    SimpleCheck,
     User,
 )
 from fs_db.metadata_storage import MetadataStorage, Database
-from sqlalchemy import func, create_engine, tuple_, or_
-from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import exc as sqlalchemy_exc
+from sqlalchemy import (
+    create_engine,
+    exists,
+    func,
+    literal_column,
+    or_,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload
+from sqlalchemy.pool import QueuePool
 
 from fs_general_api.config import settings
+from fs_general_api.db_classes import (
+    CheckResultCache,
+    EtlRunCursor,
+    EtlScheduleFireTime,
+    EtlScheduleIndex,
+    OutboxMessage,
+    OutboxMessageStatus,
+)
+from fs_general_api.history import HistoryRecorder
+from fs_general_api.metrics import metrics
+from fs_general_api.pagination import keyset_paginate
+from fs_general_api.schedule_index import refresh_versions
 
 
 class MetadataStorageGeneral(MetadataStorage):
@@ -101,6 +150,106 @@ class MetadataStorageGeneral(MetadataStorage):
             .all()
         )
 
+    @staticmethod
+    def get_production_projects_fire_times(
+        db_session: Session, datetime_start: datetime, datetime_end: datetime
+    ) -> Optional[List[Tuple[EtlProjectVersion, datetime]]]:
+        """
+        Возвращает production-версии ETL-проектов с первым плановым запуском в интервале
+        (datetime_start, datetime_end) по материализованному расписанию.
+        Если интервал выходит за рассчитанное окно расписания, возвращает None.
+        """
+        materialized_from, materialized_until = db_session.query(
+            func.max(EtlScheduleIndex.materialized_from),
+            func.min(EtlScheduleIndex.materialized_until),
+        ).one()
+
+        if (
+            materialized_from is None
+            or datetime_start < materialized_from
+            or datetime_end > materialized_until
+        ):
+            return None
+
+        first_fire_times = (
+            db_session.query(
+                EtlScheduleFireTime.etl_project_version_id,
+                func.min(EtlScheduleFireTime.fire_ts).label("run_ts"),
+            )
+            .filter(
+                EtlScheduleFireTime.fire_ts > datetime_start,
+                EtlScheduleFireTime.fire_ts < datetime_end,
+            )
+            .group_by(EtlScheduleFireTime.etl_project_version_id)
+            .subquery()
+        )
+
+        return (
+            db_session.query(EtlProjectVersion, first_fire_times.c.run_ts)
+            .join(
+                first_fire_times,
+                EtlProjectVersion.id == first_fire_times.c.etl_project_version_id,
+            )
+            .options(joinedload(EtlProjectVersion.etl_project))
+            .filter(EtlProjectVersion.status == EtlProjectStatus.PRODUCTION)
+            .all()
+        )
+
+    @staticmethod
+    def get_production_schedules_fingerprint(db_session: Session) -> str:
+        """
+        Возвращает отпечаток расписаний production-версий: меняется при изменении набора версий,
+        их `schedule_interval` или хаба проекта. Считается на стороне БД, каталог не выгружается.
+        """
+        return (
+            db_session.query(
+                func.md5(
+                    func.coalesce(
+                        func.string_agg(
+                            func.concat_ws(
+                                ":",
+                                EtlProjectVersion.id,
+                                EtlProject.hub_id,
+                                EtlProjectVersion.schedule_interval,
+                            ),
+                            aggregate_order_by(
+                                literal_column("','"), EtlProjectVersion.id
+                            ),
+                        ),
+                        "",
+                    )
+                )
+            )
+            .join(EtlProjectVersion.etl_project)
+            .filter(
+                EtlProjectVersion.schedule_interval.isnot(None),
+                EtlProjectVersion.status == EtlProjectStatus.PRODUCTION,
+            )
+            .scalar()
+        )
+
+    @staticmethod
+    def get_production_schedules_by_hub(
+        db_session: Session,
+    ) -> List[Tuple[str, Optional[int], int]]:
+        """
+        Возвращает (schedule_interval, hub_id, количество production-версий) по всем расписаниям
+        """
+        return (
+            db_session.query(
+                EtlProjectVersion.schedule_interval,
+                EtlProject.hub_id,
+                func.count(EtlProjectVersion.id),
+            )
+            .join(EtlProjectVersion.etl_project)
+            .filter(
+                EtlProjectVersion.schedule_interval.isnot(None),
+                EtlProjectVersion.status == EtlProjectStatus.PRODUCTION,
+            )
+            .group_by(EtlProjectVersion.schedule_interval, EtlProject.hub_id)
+            .all()
+        )
+
     @staticmethod
     def get_users_by_list_id(session: Session, ids: Iterable) -> List[User]:
         return session.query(User).filter(User.user_id.in_(ids)).all()
@@ -128,6 +277,67 @@ class MetadataStorageGeneral(MetadataStorage):
 
         return query.all()
 
+    @staticmethod
+    def count_etl_project_history(
+        db_session: Session, etl_project_version: EtlProjectVersion
+    ) -> int:
+        return (
+            db_session.query(func.count(HistoryEvent.id))
+            .filter(
+                HistoryEvent.etl_project_version_id == etl_project_version.id
+            )
+            .scalar()
+        )
+
+    @staticmethod
+    def get_etl_project_history_page(
+        db_session: Session,
+        etl_project_version: EtlProjectVersion,
+        limit: int,
+        cursor: Optional[str] = None,
+        with_total: bool = False,
+    ) -> Tuple[List[HistoryEvent], Optional[str], Optional[int]]:
+        """
+        Возвращает страницу истории версии ETL-проекта (от новых событий к старым) с выборкой
+        по ключу (created_timestamp, id), токен следующей страницы и, при `with_total`,
+        общее количество событий версии. Количество считается скалярным подзапросом в том же
+        запросе, что и страница.
+        """
+        version_filter = (
+            HistoryEvent.etl_project_version_id == etl_project_version.id
+        )
+        entities = [HistoryEvent]
+        if with_total:
+            entities.append(
+                db_session.query(func.count(HistoryEvent.id))
+                .filter(version_filter)
+                .scalar_subquery()
+            )
+
+        rows, next_cursor = keyset_paginate(
+            db_session.query(*entities).filter(version_filter),
+            columns=(HistoryEvent.created_timestamp, HistoryEvent.id),
+            cursor_values=lambda row: (
+                (row[0] if with_total else row).created_timestamp,
+                (row[0] if with_total else row).id,
+            ),
+            limit=limit,
+            cursor=cursor,
+            descending=True,
+        )
+
+        if not with_total:
+            return rows, next_cursor, None
+
+        if rows:
+            total = rows[0][1]
+        else:
+            total = MetadataStorageGeneral.count_etl_project_history(
+                db_session, etl_project_version
+            )
+
+        return [row[0] for row in rows], next_cursor, total
+
     @staticmethod
     def add_history_event(
         db_session: Session,
@@ -137,7 +347,19 @@ class MetadataStorageGeneral(MetadataStorage):
         old_value: Optional[str] = None,
         new_value: Optional[str] = None,
         extra_data: Optional[List] = None,
+        history: Optional[HistoryRecorder] = None,
     ):
+        if history is not None:
+            history.add(
+                name=name,
+                etl_project_version_id=etl_project_version_id,
+                author_name=author_name,
+                old_value=old_value,
+                new_value=new_value,
+                extra_data=extra_data,
+            )
+            return
+
         history_event = HistoryEvent(
             name=name,
             old_value=old_value,
@@ -151,6 +373,178 @@ class MetadataStorageGeneral(MetadataStorage):
             db_session.add(history_event)
             db_session.commit()
 
+    @staticmethod
+    def get_etl_run_cursor_position(
+        db_session: Session, backend: str
+    ) -> Optional[int]:
+        """
+        Позиция опроса запусков backend-а без блокировки
+        """
+        return (
+            db_session.query(EtlRunCursor.last_run_id)
+            .filter(EtlRunCursor.backend == backend)
+            .scalar()
+        )
+
+    @staticmethod
+    def lock_etl_run_cursor(
+        db_session: Session, backend: str
+    ) -> Optional[EtlRunCursor]:
+        """
+        Блокирует позицию опроса запусков backend-а до конца транзакции.
+        Если позиция уже заблокирована другой репликой, возвращает None.
+        """
+        db_session.execute(
+            insert(EtlRunCursor)
+            .values(backend=backend)
+            .on_conflict_do_nothing(index_elements=[EtlRunCursor.backend])
+        )
+
+        return (
+            db_session.query(EtlRunCursor)
+            .filter(EtlRunCursor.backend == backend)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+
+    @staticmethod
+    def get_cached_check_result(
+        db_session: Session,
+        git_repo: str,
+        commit_sha: str,
+        etl_project_name: str,
+        project_type: str,
+        check_set_version: int,
+    ) -> Optional[CheckResultCache]:
+        return db_session.query(CheckResultCache).get(
+            (git_repo, commit_sha, etl_project_name, project_type, check_set_version)
+        )
+
+    @staticmethod
+    def save_check_result(
+        db_session: Session,
+        git_repo: str,
+        commit_sha: str,
+        etl_project_name: str,
+        project_type: str,
+        check_set_version: int,
+        result: str,
+        checks: List[Dict[str, str]],
+    ) -> None:
+        """
+        Сохраняет результат проверок коммита. Если результат уже сохранен другим процессом, оставляет его.
+        """
+        db_session.execute(
+            insert(CheckResultCache)
+            .values(
+                git_repo=git_repo,
+                commit_sha=commit_sha,
+                etl_project_name=etl_project_name,
+                project_type=project_type,
+                check_set_version=check_set_version,
+                result=result,
+                checks=checks,
+            )
+            .on_conflict_do_nothing()
+        )
+        db_session.commit()
+
+    @staticmethod
+    def supersede_processing_checks(
+        etl_project_version: EtlProjectVersion, check_type: CheckType
+    ) -> List[GeneralCheck]:
+        """
+        Завершает выполняющиеся проверки версии проекта того же типа: их заменяет новая проверка.
+        Статуса "пропущена" у проверок нет, поэтому проверка завершается с ошибкой
+        и поясняющим предупреждением. Ответ по такой проверке от процесса проверок игнорируется.
+        """
+        superseded = []
+        for general_check in etl_project_version.checks:
+            if (
+                general_check.result == ProjectCheckResult.PROCESSING
+                and CheckType(general_check.check_type) == CheckType(check_type)
+            ):
+                general_check.result = ProjectCheckResult.FAILED
+                general_check.checks = [
+                    SimpleCheck(
+                        description="Проверка пропущена: запущена более новая проверка этой версии проекта",
+                        result=SimpleCheckResult.WARNING,
+                    )
+                ]
+                superseded.append(general_check)
+        return superseded
+
+    @staticmethod
+    def add_outbox_message(
+        db_session: Session,
+        upstream: str,
+        method: str,
+        url: str,
+        payload: Optional[Dict] = None,
+        idempotency_key: Optional[str] = None,
+        supersede: bool = False,
+    ) -> OutboxMessage:
+        """
+        Добавляет исходящий запрос в текущую транзакцию, без фиксации.
+        При `supersede` ожидающие запросы на тот же `url` больше не доставляются: новый
+        запрос их заменяет. Запросы, взятые в доставку или ожидающие повтора, не заменяются -
+        они будут доставлены раньше нового (см. `lock_pending_outbox_messages`).
+        """
+        now = datetime.now()
+        if supersede:
+            db_session.execute(
+                update(OutboxMessage)
+                .where(
+                    OutboxMessage.url == url,
+                    OutboxMessage.status == OutboxMessageStatus.PENDING.value,
+                    OutboxMessage.next_attempt_ts <= now,
+                )
+                .values(status=OutboxMessageStatus.SUPERSEDED.value)
+                .execution_options(synchronize_session=False)
+            )
+
+        message = OutboxMessage(
+            upstream=upstream,
+            method=method,
+            url=url,
+            payload=payload,
+            idempotency_key=idempotency_key or uuid.uuid4().hex,
+            status=OutboxMessageStatus.PENDING.value,
+            attempts=0,
+            next_attempt_ts=now,
+        )
+        db_session.add(message)
+        return message
+
+    @staticmethod
+    def lock_pending_outbox_messages(
+        db_session: Session, limit: int, now: Optional[datetime] = None
+    ) -> List[OutboxMessage]:
+        """
+        Блокирует до конца транзакции исходящие запросы, время доставки которых наступило.
+        Запросы, заблокированные другой репликой, пропускаются.
+        Запросы на один `url` доставляются по очереди, в порядке добавления: запрос не выдается,
+        пока не доставлен (или не отброшен) более ранний запрос на тот же `url`, чтобы
+        устаревшее изменение не перезаписало более новое.
+        """
+        earlier = aliased(OutboxMessage)
+        return (
+            db_session.query(OutboxMessage)
+            .filter(
+                OutboxMessage.status == OutboxMessageStatus.PENDING.value,
+                OutboxMessage.next_attempt_ts <= (now or datetime.now()),
+                ~exists().where(
+                    earlier.url == OutboxMessage.url,
+                    earlier.status == OutboxMessageStatus.PENDING.value,
+                    earlier.id < OutboxMessage.id,
+                ),
+            )
+            .order_by(OutboxMessage.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+
     @staticmethod
     def get_etl_project_version(
         db_session: Session, etl_project_id: int, etl_project_version: str
@@ -172,7 +566,13 @@ class MetadataStorageGeneral(MetadataStorage):
         new_etl_version_id: int,
         etl_project_id: int,
         author_name: str,
+        history: Optional[HistoryRecorder] = None,
     ) -> Optional[EtlProjectVersion]:
+        """
+        Выключает действующую production-версию ETL-проекта.
+        При переданном `history` изменения не фиксируются: событие истории копится в нем,
+        а коммит выполняет вызывающий код.
+        """
         active_version: EtlProjectVersion = (
             db_session.query(EtlProjectVersion)
             .filter(
@@ -183,6 +583,152 @@ class MetadataStorageGeneral(MetadataStorage):
             .first()
         )
 
+        if not active_version:
+            return
+
+        if history is None:
+            with HistoryRecorder.unit_of_work(db_session) as history:
+                return self.turn_off_active_project_version(
+                    db_session,
+                    new_etl_version_id=new_etl_version_id,
+                    etl_project_id=etl_project_id,
+                    author_name=author_name,
+                    history=history,
+                )
+
+        new_status = EtlProjectStatus.TURNED_OFF
+        history.add_status_change(
+            active_version, status=new_status, author_name=author_name
+        )
+        active_version.status = new_status
+        db_session.add(active_version)
+        refresh_versions(db_session, [active_version])
+
+        return active_version
+
+    async def update_etl_project_status(
+        self,
+        db_session: Session,
+        etl_project_version: EtlProjectVersion,
+        etl_run: InternalPdtEtlRun,
+        status: EtlProjectStatus,
+        author_name: str,
+        history: Optional[HistoryRecorder] = None,
+    ):
+        """
+        Переводит версию ETL-проекта в новый статус.
+        При переданном `history` изменения не фиксируются: событие истории копится в нем,
+        а коммит выполняет вызывающий код.
+        """
+        self.update_etl_project_statuses(
+            db_session,
+            [(etl_project_version, etl_run, status)],
+            author_name=author_name,
+            history=history,
+        )
+
+        return etl_project_version
+
+    def update_etl_project_statuses(
+        self,
+        db_session: Session,
+        transitions: List[
+            Tuple[EtlProjectVersion, InternalPdtEtlRun, EtlProjectStatus]
+        ],
+        author_name: Optional[str] = None,
+        history: Optional[HistoryRecorder] = None,
+    ) -> List[EtlProjectVersion]:
+        """
+        Пакетный перевод версий ETL-проектов в новые статусы: события истории всех переходов
+        записываются одним INSERT, изменения фиксируются одним коммитом.
+
+        Args:
+            transitions: список (версия, запуск, новый статус)
+            author_name: автор событий, по умолчанию автор версии
+            history: единица работы вызывающего кода; если не передана, создается своя
+        """
+        if history is None:
+            with HistoryRecorder.unit_of_work(db_session) as history:
+                return self.update_etl_project_statuses(
+                    db_session, transitions, author_name=author_name, history=history
+                )
+
+        for etl_project_version, etl_run, status in transitions:
+            history.add_status_change(
+                etl_project_version,
+                status=status,
+                author_name=author_name or etl_project_version.author_name,
+            )
+            set_etl_project_status(etl_project_version, etl_run=etl_run, status=status)
+            db_session.add(etl_project_version)
+
+        etl_project_versions = [etl_project_version for etl_project_version, _, _ in transitions]
+        refresh_versions(db_session, etl_project_versions)
+
+        return etl_project_versions
+
+
+class AsyncMetadataStorageGeneral:
+    """
+    Асинхронный аналог `MetadataStorageGeneral` для работы через `AsyncSession`
+    """
+
+    @staticmethod
+    async def get_etl_project_version(
+        db_session: AsyncSession, etl_project_id: int, etl_project_version: str
+    ) -> Optional[EtlProjectVersion]:
+        result = await db_session.execute(
+            select(EtlProjectVersion)
+            .join(EtlProjectVersion.etl_project)
+            .options(joinedload(EtlProjectVersion.etl_project))
+            .filter(
+                EtlProject.id == etl_project_id,
+                EtlProjectVersion.version == etl_project_version,
+            )
+            .limit(1)
+        )
+        return result.scalars().first()
+
+    @staticmethod
+    def add_history_event(
+        db_session: AsyncSession,
+        name: str,
+        etl_project_version_id: int,
+        author_name: Optional[str] = None,
+        old_value: Optional[str] = None,
+        new_value: Optional[str] = None,
+        extra_data: Optional[List] = None,
+    ):
+        history_event = HistoryEvent(
+            name=name,
+            old_value=old_value,
+            new_value=new_value,
+            author=author_name,
+            etl_project_version_id=etl_project_version_id,
+            extra_data=extra_data,
+        )
+
+        # фиксируется вызывающим кодом вместе с изменением, о котором событие
+        db_session.add(history_event)
+
+    async def turn_off_active_project_version(
+        self,
+        db_session: AsyncSession,
+        new_etl_version_id: int,
+        etl_project_id: int,
+        author_name: str,
+    ) -> Optional[EtlProjectVersion]:
+        result = await db_session.execute(
+            select(EtlProjectVersion)
+            .filter(
+                EtlProjectVersion.id != new_etl_version_id,
+                EtlProjectVersion.etl_project_id == etl_project_id,
+                EtlProjectVersion.status == EtlProjectStatus.PRODUCTION,
+            )
+            .limit(1)
+        )
+        active_version: Optional[EtlProjectVersion] = result.scalars().first()
+
         if not active_version:
             return
 
@@ -198,15 +744,15 @@ class MetadataStorageGeneral(MetadataStorage):
 
         active_version.status = new_status
 
-        with db_session.begin_nested():
-            db_session.add(active_version)
-            db_session.commit()
+        db_session.add(active_version)
+        await db_session.run_sync(refresh_versions, [active_version])
+        await db_session.commit()
 
         return active_version
 
     async def update_etl_project_status(
         self,
-        db_session: Session,
+        db_session: AsyncSession,
         etl_project_version: EtlProjectVersion,
         etl_run: InternalPdtEtlRun,
         status: EtlProjectStatus,
@@ -220,38 +766,225 @@ class MetadataStorageGeneral(MetadataStorage):
             new_value=status.value,
             author_name=author_name
         )
-        etl_project_version.status = status
-
-        if status == EtlProjectStatus.TESTING:
-            etl_project_version.moved_to_testing_timestamp = etl_run.run_ts
-        elif status == EtlProjectStatus.PROD_RELEASE:
-            etl_project_version.moved_to_prod_release_timestamp = etl_run.run_ts
-        elif status == EtlProjectStatus.PRODUCTION:
-            etl_project_version.moved_to_prod_release_timestamp = etl_run.run_ts
-            etl_project_version.moved_to_production_timestamp = etl_run.run_ts
-        else:
-            raise NotImplementedError(f"Updating for status={status} is not implemented!")
+        set_etl_project_status(etl_project_version, etl_run=etl_run, status=status)
 
-        with db_session.begin_nested():
-            db_session.add(etl_project_version)
-            db_session.commit()
+        db_session.add(etl_project_version)
+        await db_session.run_sync(refresh_versions, [etl_project_version])
+        await db_session.commit()
 
         return etl_project_version
 
 
+def set_etl_project_status(
+    etl_project_version: EtlProjectVersion,
+    etl_run: InternalPdtEtlRun,
+    status: EtlProjectStatus,
+) -> None:
+    etl_project_version.status = status
+
+    if status == EtlProjectStatus.TESTING:
+        etl_project_version.moved_to_testing_timestamp = etl_run.run_ts
+    elif status == EtlProjectStatus.PROD_RELEASE:
+        etl_project_version.moved_to_prod_release_timestamp = etl_run.run_ts
+    elif status == EtlProjectStatus.PRODUCTION:
+        etl_project_version.moved_to_prod_release_timestamp = etl_run.run_ts
+        etl_project_version.moved_to_production_timestamp = etl_run.run_ts
+    else:
+        raise NotImplementedError(f"Updating for status={status} is not implemented!")
+
+
+class AsyncDatabase:
+    """
+    Асинхронное подключение к БД (asyncpg), используется при `settings.db_async_mode`.
+    Движок создается при первом обращении.
+    """
+
+    def __init__(self):
+        self._engine: Optional[AsyncEngine] = None
+
+    @property
+    def engine(self) -> AsyncEngine:
+        if self._engine is None:
+            server_settings = {"search_path": settings.schema_name}
+            if settings.db_statement_timeout:
+                server_settings["statement_timeout"] = str(
+                    settings.db_statement_timeout
+                )
+
+            self._engine = create_async_engine(
+                settings.async_connection_uri,
+                connect_args={"server_settings": server_settings},
+                pool_size=settings.db_pool_size,
+                max_overflow=settings.db_max_overflow,
+                pool_timeout=settings.db_pool_timeout,
+                pool_recycle=settings.db_pool_recycle,
+                pool_pre_ping=settings.db_pool_pre_ping,
+            )
+        return self._engine
+
+    async def get_session(self) -> AsyncGenerator[AsyncSession, None]:
+        async with AsyncSession(self.engine, expire_on_commit=False) as session:
+            yield session
+
+    async def dispose(self) -> None:
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+
+
 data_storage = MetadataStorageGeneral()
+async_data_storage = AsyncMetadataStorageGeneral()
+
+class MeteredQueuePool(QueuePool):
+    """
+    Пул соединений, замеряющий время ожидания свободного соединения
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sqlalchemy_exc.TimeoutError:
+            metrics.inc("db_pool_checkout_timeouts")
+            raise
+        finally:
+            metrics.observe(
+                "db_pool_checkout_wait_seconds", time.perf_counter() - started
+            )
 
-db = Database()
-db.engine = create_engine(
-    settings.connection_uri,
-    connect_args={"options": f"-csearch_path={settings.schema_name}"},
-)
+
+def create_db_engine() -> Engine:
+    options = f"-csearch_path={settings.schema_name}"
+
+    if settings.db_statement_timeout:
+        options += f" -cstatement_timeout={settings.db_statement_timeout}"
+
+    return create_engine(
+        settings.connection_uri,
+        connect_args={"options": options},
+        poolclass=MeteredQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+
+
+class GeneralDatabase(Database):
+    """
+    Подключение к БД с ленивым созданием движка.
+
+    Сессии выдает `Database.get_session` из fs_db, обращаясь к движку через свойство `engine`.
+    Движок создается при первом обращении, а в дочернем процессе после fork
+    унаследованный пул отпускается без закрытия соединений (они принадлежат родителю)
+    и при следующем обращении создается новый движок.
+    """
+
+    def __init__(self):
+        self._engine: Optional[Engine] = None
+        self._engine_lock = Lock()
+        self._inherited_engines: List[Engine] = []
+        Database.__init__(self)
+        os.register_at_fork(after_in_child=self._after_fork_in_child)
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            with self._engine_lock:
+                if self._engine is None:
+                    self._engine = create_db_engine()
+        return self._engine
+
+    @engine.setter
+    def engine(self, engine: Optional[Engine]) -> None:
+        self._engine = engine
+
+    def _after_fork_in_child(self) -> None:
+        self._engine_lock = Lock()
+
+        if self._engine is None:
+            return
+
+        try:
+            self._engine.dispose(close=False)
+        except TypeError:
+            # SQLAlchemy < 1.4.33 не умеет отпускать пул без закрытия соединений,
+            # поэтому просто не даем сборщику мусора закрыть сокеты родителя
+            self._inherited_engines.append(self._engine)
+        self._engine = None
+
+    def pool_status(self) -> Dict[str, int]:
+        pool = self.engine.pool
+        return {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        }
+
+
+db = GeneralDatabase()
+metrics.register_gauge("db_pool", db.pool_status)
+
+
+async_db = AsyncDatabase()
+
+
+T = TypeVar("T")
+
+
+class EndpointSession:
+    """
+    Сессия БД асинхронного обработчика.
+
+    При `db_async_mode` ORM-код обработчика выполняется через `AsyncSession.run_sync`:
+    запросы идут через asyncpg и не блокируют event loop. Иначе используется обычная
+    синхронная сессия. Вне `run` ленивая загрузка связей в асинхронном режиме недоступна,
+    поэтому код, передаваемый в `run`, должен загрузить все связи, нужные после него.
+    """
+
+    def __init__(self, session: Union[Session, AsyncSession]):
+        self.session = session
+
+    @property
+    def is_async(self) -> bool:
+        return isinstance(self.session, AsyncSession)
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Выполняет `fn(session, *args, **kwargs)` с синхронной сессией
+        """
+        if isinstance(self.session, AsyncSession):
+            return await self.session.run_sync(fn, *args, **kwargs)
+        return fn(self.session, *args, **kwargs)
+
+
+async def get_endpoint_session() -> AsyncGenerator[EndpointSession, None]:
+    """
+    FastAPI-зависимость асинхронных обработчиков: асинхронная сессия при `db_async_mode`,
+    иначе синхронная
+    """
+    if settings.db_async_mode:
+        async with AsyncSession(async_db.engine, expire_on_commit=False) as session:
+            yield EndpointSession(session)
+        return
+
+    db_session_gen = db.get_session()
+    try:
+        yield EndpointSession(next(db_session_gen))
+    finally:
+        next(db_session_gen, None)
 
 
 def get_data_storage() -> MetadataStorageGeneral:
     return data_storage
 
 
+def get_async_data_storage() -> AsyncMetadataStorageGeneral:
+    return async_data_storage
+
+
 def task_db_session(func_):
     is_coroutine = asyncio.iscoroutinefunction(func_)
 
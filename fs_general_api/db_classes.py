@@ -0,0 +1,235 @@
+"""
+Таблицы, которые принадлежат только сервису fs_general_api.
+
+Общие сущности (ETL-проекты, версии, проверки и т.д.) описаны в `fs_db.db_classes_general`,
+здесь же находятся служебные таблицы сервиса. Они регистрируются в той же `Base.metadata`,
+поэтому создаются вместе с остальной схемой.
+"""
+import enum
+
+from sqlalchemy import (
+    DDL,
+    BigInteger,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    event,
+    func,
+    text,
+)
+from sqlalchemy.dialects.postgresql import JSONB
+from fs_db.db_classes_general import (
+    Base,
+    EtlProject,
+    EtlProjectVersion,
+    HistoryEvent,
+)
+
+
+class EtlRunCursor(Base):
+    """
+    Позиция опроса запусков ETL-проектов для backend-а (dev/prod): последний обработанный запуск
+    """
+
+    __tablename__ = "etl_run_cursors"
+
+    backend = Column(String, primary_key=True)
+    last_run_id = Column(BigInteger, nullable=True)
+    last_run_ts = Column(DateTime, nullable=True)
+    updated_timestamp = Column(
+        DateTime, server_default=func.now(), onupdate=func.now()
+    )
+
+
+class EtlScheduleIndex(Base):
+    """
+    Состояние материализованного расписания production-версии ETL-проекта:
+    для какого cron-выражения и за какой интервал рассчитаны запуски в `etl_schedule_fire_times`
+    """
+
+    __tablename__ = "etl_schedule_index"
+
+    etl_project_version_id = Column(
+        Integer,
+        ForeignKey(EtlProjectVersion.id, ondelete="CASCADE"),
+        primary_key=True,
+    )
+    schedule_interval = Column(String, nullable=False)
+    materialized_from = Column(DateTime, nullable=False, index=True)
+    materialized_until = Column(DateTime, nullable=False, index=True)
+
+
+class EtlScheduleFireTime(Base):
+    """
+    Плановое время запуска production-версии ETL-проекта
+    """
+
+    __tablename__ = "etl_schedule_fire_times"
+
+    etl_project_version_id = Column(
+        Integer,
+        ForeignKey(EtlProjectVersion.id, ondelete="CASCADE"),
+        primary_key=True,
+    )
+    fire_ts = Column(DateTime, primary_key=True, index=True)
+
+
+class CheckResultCache(Base):
+    """
+    Результат проверок исходного кода ETL-проекта для конкретного коммита.
+    Повторная проверка того же дерева (тот же коммит, проект и набор проверок) берет результат отсюда.
+    """
+
+    __tablename__ = "check_result_cache"
+
+    git_repo = Column(String, primary_key=True)
+    commit_sha = Column(String, primary_key=True)
+    etl_project_name = Column(String, primary_key=True)
+    project_type = Column(String, primary_key=True)
+    check_set_version = Column(Integer, primary_key=True)
+    result = Column(String, nullable=False)
+    checks = Column(JSONB, nullable=False)
+    created_timestamp = Column(DateTime, server_default=func.now(), index=True)
+
+
+class OutboxMessageStatus(enum.Enum):
+    PENDING = "pending"
+    DELIVERED = "delivered"
+    FAILED = "failed"
+    SUPERSEDED = "superseded"
+
+
+class OutboxMessage(Base):
+    """
+    Исходящий запрос к внешнему сервису (transactional outbox).
+
+    Запрос сохраняется в той же транзакции, что и изменение, о котором он сообщает,
+    и доставляется `OutboxDispatcher` с повторами. Заголовок `Idempotency-Key` позволяет
+    получателю отбросить повторную доставку.
+    """
+
+    __tablename__ = "outbox_messages"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    upstream = Column(String, nullable=False)
+    method = Column(String, nullable=False)
+    url = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=True)
+    idempotency_key = Column(String, nullable=False, unique=True)
+    status = Column(
+        String, nullable=False, default=OutboxMessageStatus.PENDING.value
+    )
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_ts = Column(DateTime, nullable=False, server_default=func.now())
+    last_error = Column(String, nullable=True)
+    created_timestamp = Column(DateTime, server_default=func.now())
+    delivered_timestamp = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_outbox_messages_pending_next_attempt_ts",
+            next_attempt_ts,
+            postgresql_where=text(f"status = '{OutboxMessageStatus.PENDING.value}'"),
+        ),
+        Index(
+            "ix_outbox_messages_pending_url",
+            url,
+            id,
+            postgresql_where=text(f"status = '{OutboxMessageStatus.PENDING.value}'"),
+        ),
+    )
+
+
+class JobStatus(enum.Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DEAD = "dead"
+
+
+class Job(Base):
+    """
+    Задание в очереди фоновой обработки (проверки, синхронизация, обработка их результатов).
+
+    Задание выдается одному обработчику (`FOR UPDATE SKIP LOCKED`) на время аренды
+    `lease_expires_at`, которую обработчик продлевает, пока выполняет задание. Если обработчик
+    не завершил задание до окончания аренды, оно выдается повторно; после исчерпания попыток
+    задание остается в таблице со статусом `dead`. Выполненные задания удаляются.
+
+    Задания выдаются по убыванию `priority`. Ожидающее задание удаляется, если в очередь
+    добавлено новое с тем же `supersede_key`.
+    """
+
+    __tablename__ = "jobs"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    queue = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=False)
+    status = Column(String, nullable=False, default=JobStatus.PENDING.value)
+    attempts = Column(Integer, nullable=False, default=0)
+    priority = Column(Integer, nullable=False, default=0, server_default="0")
+    fairness_key = Column(String, nullable=True)
+    supersede_key = Column(String, nullable=True)
+    available_at = Column(DateTime, nullable=False, server_default=func.now())
+    lease_expires_at = Column(DateTime, nullable=True)
+    locked_by = Column(String, nullable=True)
+    last_error = Column(String, nullable=True)
+    created_timestamp = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        Index(
+            "ix_jobs_queue_pending_available_at",
+            queue,
+            available_at,
+            postgresql_where=text(f"status = '{JobStatus.PENDING.value}'"),
+        ),
+        Index(
+            "ix_jobs_queue_running_lease_expires_at",
+            queue,
+            lease_expires_at,
+            postgresql_where=text(f"status = '{JobStatus.RUNNING.value}'"),
+        ),
+        Index(
+            "ix_jobs_queue_pending_supersede_key",
+            queue,
+            supersede_key,
+            postgresql_where=text(
+                f"status = '{JobStatus.PENDING.value}' AND supersede_key IS NOT NULL"
+            ),
+        ),
+    )
+
+
+# Триграммные индексы для поиска ETL-проектов по вхождению подстроки (`ILIKE '%q%'`),
+# по префиксу и по похожести (`similarity`). Таблица `etl_projects` описана в fs_db,
+# поэтому индексы и расширение pg_trgm также должны быть добавлены миграцией fs_db.
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(
+        dialect="postgresql"
+    ),
+)
+
+Index(
+    "ix_etl_projects_name_trgm",
+    EtlProject.name,
+    postgresql_using="gin",
+    postgresql_ops={"name": "gin_trgm_ops"},
+)
+
+Index(
+    "ix_etl_projects_description_trgm",
+    EtlProject.description,
+    postgresql_using="gin",
+    postgresql_ops={"description": "gin_trgm_ops"},
+)
+
+# Выборка истории версии ETL-проекта по ключу (created_timestamp, id)
+Index(
+    "ix_history_events_version_id_created_timestamp",
+    HistoryEvent.etl_project_version_id,
+    HistoryEvent.created_timestamp,
+)
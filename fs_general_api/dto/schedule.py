@@ -0,0 +1,10 @@
+import datetime
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+
+class ScheduleLoadBucketPdt(BaseModel):
+    start: datetime.datetime
+    count: int
+    hubs: Optional[Dict[Optional[int], int]] = None
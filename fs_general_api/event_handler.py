@@ -1,9 +1,7 @@
-import time
 import traceback
-from multiprocessing import Queue
-from queue import Empty
+from collections import OrderedDict
 from threading import Thread
-from typing import Union, Generator
+from typing import Any, Dict, Generator, List, Optional, Tuple, Union
 
 from sqlalchemy.orm import Session
 from fs_common_lib.fs_general_api.data_types import (
@@ -25,15 +23,43 @@ from fs_general_api.extra_processes.synchronizer.definitions import (
 from fs_general_api.extra_processes.checker.check import CheckEventResponse
 from fs_general_api.config import settings
 from fs_general_api.db import get_data_storage, db
+from fs_general_api.http_clients import Upstream
+from fs_general_api.job_queue import ClaimedJob, JobQueue
+from fs_general_api.metrics import metrics
+from fs_general_api.schedule_index import refresh_versions
+
+
+EventResponse = Union[CheckEventResponse, SynchronizeEventResponse]
 
 
 class EventHandler(Thread):
-    """Класс для обработки результатов проверки в отдельном потоке и записи их в БД"""
+    """
+    Класс для обработки результатов проверки в отдельном потоке и записи их в БД.
+
+    Поток ждет ответы на очереди блокирующе и забирает накопившиеся ответы пачкой
+    (до `batch_size`), которая применяется в одной транзакции. Ответы группируются по версии
+    ETL-проекта, поэтому версия загружается один раз на группу. Если пачку применить не удалось,
+    ответы применяются по одному, чтобы ошибочный ответ не мешал остальным. Задания с ответами
+    завершаются в той же транзакции, в которой применяются ответы.
 
-    def __init__(self, ctrl_queue: Queue):
+    При `use_outbox` изменения расписания передаются в backend_api через outbox: запрос
+    сохраняется в той же транзакции и доставляется `OutboxDispatcher`, поэтому поток не ждет
+    ответа backend_api. Иначе запросы отправляются после фиксации транзакции, без повторов:
+    ошибка одного запроса только записывается в лог.
+    """
+
+    def __init__(
+        self,
+        ctrl_queue: JobQueue,
+        batch_size: int = settings.event_handler_batch_size,
+        queue_timeout: float = settings.event_handler_queue_timeout,
+    ):
         Thread.__init__(self)
         self.is_started: bool = True
-        self.ctrl_queue: Queue = ctrl_queue
+        self.ctrl_queue: JobQueue = ctrl_queue
+        self.batch_size: int = max(1, batch_size)
+        self.queue_timeout: float = queue_timeout
+        self.last_batch_size: int = 0
         self.data_storage = get_data_storage()
         self.logger = FsLoggerHandler(
             __name__,
@@ -44,145 +70,307 @@ class EventHandler(Thread):
 
     def run(self) -> None:
         while self.is_started:
-            db_session_gen: Generator[Session, None, None] = db.get_session()
+            jobs = self.drain()
+            if not jobs:
+                continue
+
             try:
-                session = next(db_session_gen, None)
-                response: Union[
-                    CheckEventResponse, SynchronizeEventResponse
-                ] = self.ctrl_queue.get_nowait()
-
-                if isinstance(response, CheckEventResponse):
-                    self.handle_check_event_response(
-                        session=session, response=response
-                    )
-                elif isinstance(response, SynchronizeEventResponse):
-                    self.handle_synchronize_event_response(
-                        session=session, response=response
-                    )
+                with metrics.timer("event_handler_batch"):
+                    self.handle_responses(jobs)
+            except Exception as e:
+                self.logger.error(f"{e}\n{traceback.format_exc()}")
+
+    def drain(self) -> List[ClaimedJob]:
+        """
+        Ждет первый ответ не дольше `queue_timeout` и забирает без ожидания накопившиеся,
+        всего не больше `batch_size`
+        """
+        jobs = self.ctrl_queue.claim_batch(self.batch_size, self.queue_timeout)
+        if not jobs:
+            return []
 
-            except Empty:
-                pass
+        self.last_batch_size = len(jobs)
+        metrics.inc("event_handler_responses", len(jobs))
+        return jobs
 
+    def stats(self) -> Dict[str, Any]:
+        try:
+            backlog: Optional[int] = self.ctrl_queue.qsize()
+        except Exception:
+            # размер очереди в БД недоступен, если недоступна БД
+            backlog = None
+
+        return {"backlog": backlog, "last_batch_size": self.last_batch_size}
+
+    def handle_responses(self, jobs: List[ClaimedJob]) -> None:
+        for job in jobs:
+            self.observe_checkout(job.item)
+            self.observe_checks(job.item)
+
+        schedule_updates: List[Tuple[int, str, str]] = []
+        db_session_gen: Generator[Session, None, None] = db.get_session()
+        try:
+            session = next(db_session_gen)
+            try:
+                schedule_updates = self.apply_responses(session, jobs)
             except Exception as e:
-                self.logger.error(f"{e}\n{traceback.format_exc()}")
-            finally:
-                next(db_session_gen, None)
-            time.sleep(1)
+                session.rollback()
+                if len(jobs) == 1:
+                    self.logger.error(f"{e}\n{traceback.format_exc()}")
+                    self.ctrl_queue.fail(jobs[0], str(e))
+                    return
 
-    def handle_synchronize_event_response(
-        self, session: Session, response: SynchronizeEventResponse
-    ) -> None:
-        self.logger.info(f"Received synchronize response: {response}")
+                self.logger.error(
+                    f"Cant apply batch of {len(jobs)} responses, applying one by one: {e}"
+                )
+                for job in jobs:
+                    try:
+                        schedule_updates.extend(self.apply_responses(session, [job]))
+                    except Exception as e:
+                        session.rollback()
+                        self.logger.error(f"{e}\n{traceback.format_exc()}")
+                        self.ctrl_queue.fail(job, str(e))
+        finally:
+            next(db_session_gen, None)
 
-        if response.error_message:
-            self.logger.error(response.error_message)
-            return
+        for etl_project_id, version, schedule_interval in schedule_updates:
+            try:
+                self.update_backend_schedule_interval(
+                    etl_project_id, version, schedule_interval
+                )
+            except Exception as e:
+                self.logger.error(
+                    f"Cant update schedule_interval for ETL-project version with id={etl_project_id}, "
+                    f"version={version} in backend_api schema: {e}\n{traceback.format_exc()}"
+                )
 
-        with self.data_storage.check_lock:
-            etl_project_version: EtlProjectVersion = self.data_storage.get_etl_project_version(
-                db_session=session,
-                etl_project_id=response.synchronize_event_request.etl_project_id,
-                etl_project_version=response.synchronize_event_request.etl_project_version,
-            )
-            response_schedule_interval: str = response.schedule_interval
+    def apply_responses(
+        self, session: Session, jobs: List[ClaimedJob]
+    ) -> List[Tuple[int, str, str]]:
+        """
+        Применяет ответы и завершает их задания в одной транзакции.
+        Без `use_outbox` возвращает измененные расписания (etl_project_id, версия, расписание),
+        которые нужно передать в backend_api после фиксации.
+        """
+        responses: List[EventResponse] = [job.item for job in jobs]
+        groups: "OrderedDict[Tuple[int, str], List[EventResponse]]" = OrderedDict()
+        for response in responses:
+            if isinstance(response, SynchronizeEventResponse):
+                self.logger.info(f"Received synchronize response: {response}")
+                if response.error_message:
+                    self.logger.error(response.error_message)
+                    continue
+                request = response.synchronize_event_request
+            else:
+                self.logger.info(f"Received check response: {response}")
+                request = response.check_event_request
 
-            if (
-                etl_project_version.schedule_interval
-                == response_schedule_interval
-            ):
-                self.logger.info(
-                    f"Schedule interval for ETL-project with id={etl_project_version.id} didn't change"
+            groups.setdefault(
+                (request.etl_project_id, request.etl_project_version), []
+            ).append(response)
+
+        schedule_updates = []
+
+        with self.data_storage.check_lock:
+            for (etl_project_id, version), group in groups.items():
+                etl_project_version: Optional[EtlProjectVersion] = self.data_storage.get_etl_project_version(
+                    db_session=session,
+                    etl_project_id=etl_project_id,
+                    etl_project_version=version,
                 )
-                return
+                if etl_project_version is None:
+                    self.logger.error(
+                        f"ETL-project with id={etl_project_id}, version={version} not found"
+                    )
+                    continue
+
+                schedule_interval = None
+                for response in group:
+                    if isinstance(response, CheckEventResponse):
+                        self.apply_check_event_response(
+                            session, etl_project_version, response
+                        )
+                    elif self.apply_synchronize_event_response(
+                        session, etl_project_version, response
+                    ):
+                        schedule_interval = response.schedule_interval
+
+                if schedule_interval is not None and settings.use_outbox:
+                    self.add_backend_schedule_update(
+                        session, etl_project_version, schedule_interval
+                    )
+                elif schedule_interval is not None:
+                    schedule_updates.append(
+                        (etl_project_id, version, schedule_interval)
+                    )
 
-            etl_project_version.schedule_interval = response_schedule_interval
-            session.add(etl_project_version)
+            self.ctrl_queue.complete(jobs, db_session=session)
             session.commit()
 
+        return schedule_updates
+
+    @staticmethod
+    def observe_checkout(response: EventResponse) -> None:
+        """
+        Учитывает время получения исходного кода проекта в метриках по способу получения
+        """
+        if response.checkout_seconds is not None:
+            metrics.observe(
+                f"git_checkout_{response.checkout_mode}",
+                response.checkout_seconds,
+            )
+
+    @staticmethod
+    def observe_checks(response: EventResponse) -> None:
+        """
+        Учитывает время выполнения проверок исходного кода в метриках по имени проверки
+        """
+        if not isinstance(response, CheckEventResponse) or response.cached:
+            return
+
+        for check in response.checks:
+            if check.name and check.duration_seconds is not None:
+                metrics.observe(f"check_{check.name}", check.duration_seconds)
+
+    def apply_synchronize_event_response(
+        self,
+        session: Session,
+        etl_project_version: EtlProjectVersion,
+        response: SynchronizeEventResponse,
+    ) -> bool:
+        """
+        Обновляет расписание версии. Возвращает True, если расписание изменилось.
+        """
+        response_schedule_interval: str = response.schedule_interval
+
+        if etl_project_version.schedule_interval == response_schedule_interval:
+            self.logger.info(
+                f"Schedule interval for ETL-project with id={etl_project_version.id} didn't change"
+            )
+            return False
+
+        etl_project_version.schedule_interval = response_schedule_interval
+        session.add(etl_project_version)
+        refresh_versions(session, [etl_project_version])
+        return True
+
+    def update_backend_schedule_interval(
+        self, etl_project_id: int, version: str, schedule_interval: str
+    ) -> None:
         url = join_urls(
             settings.backend_uri_prod,
             "internal",
             "etl",
-            str(etl_project_version.etl_project_id),
+            str(etl_project_id),
         )
         response = _post(
             url=url,
             json={
-                "data": {"cron": response_schedule_interval},
-                "general_etl_project_version": etl_project_version.version,
+                "data": {"cron": schedule_interval},
+                "general_etl_project_version": version,
             },
         )
 
         if not (200 <= response.status_code < 300):
             self.logger.error(
-                f"Cant update schedule_interval for ETL-project version with id={etl_project_version.etl_project_id}, "
-                f"version={etl_project_version.version} in backend_api schema.\n"
+                f"Cant update schedule_interval for ETL-project version with id={etl_project_id}, "
+                f"version={version} in backend_api schema.\n"
                 f"Error on dev backend:\n{response.text}"
             )
 
-    def handle_check_event_response(
-        self, session: Session, response: CheckEventResponse
+    def add_backend_schedule_update(
+        self,
+        session: Session,
+        etl_project_version: EtlProjectVersion,
+        schedule_interval: str,
     ) -> None:
-        self.logger.info(f"Received check response: {response}")
+        url = join_urls(
+            settings.backend_uri_prod,
+            "internal",
+            "etl",
+            str(etl_project_version.etl_project_id),
+        )
+        message = self.data_storage.add_outbox_message(
+            db_session=session,
+            upstream=Upstream.BACKEND_PROD.value,
+            method="POST",
+            url=url,
+            payload={
+                "data": {"cron": schedule_interval},
+                "general_etl_project_version": etl_project_version.version,
+            },
+            supersede=True,
+        )
+        self.logger.info(
+            f"Schedule update for ETL-project with id={etl_project_version.etl_project_id}, "
+            f"version={etl_project_version.version} queued with key {message.idempotency_key}"
+        )
 
-        with self.data_storage.check_lock:
-            etl_project_version: EtlProjectVersion = self.data_storage.get_etl_project_version(
-                db_session=session,
-                etl_project_id=response.check_event_request.etl_project_id,
-                etl_project_version=response.check_event_request.etl_project_version,
+    def apply_check_event_response(
+        self,
+        session: Session,
+        etl_project_version: EtlProjectVersion,
+        response: CheckEventResponse,
+    ) -> None:
+        for gen_check in etl_project_version.checks:
+            if (
+                gen_check.id
+                == response.check_event_request.general_check_id
+            ):
+                general_check = gen_check
+                break
+
+        # проверка заменена более новой, пока запрос на нее выполнялся
+        if general_check.result != ProjectCheckResult.PROCESSING:
+            self.logger.info(
+                f"Check {response.check_event_request.general_check_id} is superseded, "
+                f"response is ignored"
             )
+            metrics.inc("check_superseded_responses")
+            return
 
-            for gen_check in etl_project_version.checks:
-                if (
-                    gen_check.id
-                    == response.check_event_request.general_check_id
-                ):
-                    general_check = gen_check
-                    break
-
-            checks = []
-            for check in response.checks:
-                checks.append(
-                    SimpleCheck(
-                        description=check.description, result=check.result
-                    )
+        checks = []
+        for check in response.checks:
+            checks.append(
+                SimpleCheck(
+                    description=check.description, result=check.result
                 )
+            )
 
-            general_check.result = response.result
-            general_check.checks = checks
+        general_check.result = response.result
+        general_check.checks = checks
 
-            """
-            Отправляем запрос на перемещение исходников проекта в git_manger в случае когда проверка 
-            производится перед REVIEW
-            """
-            if (
-                response.check_event_request.check_type == CheckType.REVIEW
-                and response.result == ProjectCheckResult.SUCCESS
-                and response.check_event_request.user_data is not None
-            ):
+        """
+        Отправляем запрос на перемещение исходников проекта в git_manger в случае когда проверка 
+        производится перед REVIEW
+        """
+        if (
+            response.check_event_request.check_type == CheckType.REVIEW
+            and response.result == ProjectCheckResult.SUCCESS
+            and response.check_event_request.user_data is not None
+        ):
 
-                reviewers = []
-                comment = None
-
-                if etl_project_version.etl_project.project_type == ProjectType.TARGETS.value:
-                    reviewers = settings.pr_target_project_reviewers
-                    users_str = ", ".join([f"@{rev}" for rev in reviewers])
-                    comment = f"Перед мерджем данного pull request-a необходимо, чтобы пользователи {users_str} проверили код"
-
-                transfer_request = ProjectTransferRequest(
-                    user_name=response.check_event_request.user_data.user_name,
-                    author_email=response.check_event_request.user_data.author_email,
-                    author_name=response.check_event_request.user_data.author_name,
-                    etl_project_version_id=etl_project_version.id,
-                    pr_reviewer_usernames=reviewers,
-                    pr_comment=comment
-                )
+            reviewers = []
+            comment = None
 
-                self.logger.info(
-                    f"Creating transfer request: {transfer_request}"
-                )
-                session.add(transfer_request)
+            if etl_project_version.etl_project.project_type == ProjectType.TARGETS.value:
+                reviewers = settings.pr_target_project_reviewers
+                users_str = ", ".join([f"@{rev}" for rev in reviewers])
+                comment = f"Перед мерджем данного pull request-a необходимо, чтобы пользователи {users_str} проверили код"
 
-            session.add(general_check)
-            session.add(etl_project_version)
-            session.commit()
+            transfer_request = ProjectTransferRequest(
+                user_name=response.check_event_request.user_data.user_name,
+                author_email=response.check_event_request.user_data.author_email,
+                author_name=response.check_event_request.user_data.author_name,
+                etl_project_version_id=etl_project_version.id,
+                pr_reviewer_usernames=reviewers,
+                pr_comment=comment
+            )
+
+            self.logger.info(
+                f"Creating transfer request: {transfer_request}"
+            )
+            session.add(transfer_request)
+
+        session.add(general_check)
+        session.add(etl_project_version)
@@ -20,3 +20,7 @@ class ProjectModificationError(Exception):
 
 class NotEnoughDataException(Exception):
     pass
+
+
+class InvalidRequestParamsError(Exception):
+    pass
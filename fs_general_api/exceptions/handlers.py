@@ -9,6 +9,7 @@ from fs_general_api.exceptions import (
     RecordAlreadyExistsException,
     ProjectModificationError,
     NotEnoughDataException,
+    InvalidRequestParamsError,
 )
 
 
@@ -56,3 +57,11 @@ def add_exception_handlers(_app: FastAPI):
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND, content=str(exc)
         )
+
+    @_app.exception_handler(InvalidRequestParamsError)
+    async def invalid_request_params_error(
+        request: Request, exc: InvalidRequestParamsError
+    ):
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST, content=str(exc)
+        )
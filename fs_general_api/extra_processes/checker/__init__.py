@@ -1 +1 @@
-from .etl_project_checker import EtlProjectChecker
+from .etl_project_checker import EtlProjectChecker, EtlProjectCheckerPool
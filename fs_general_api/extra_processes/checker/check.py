@@ -1,8 +1,8 @@
-import mmap
 import os
 from abc import abstractmethod, ABC
 from dataclasses import dataclass
 from pathlib import Path
+from threading import Event
 from typing import List, Optional
 
 from fs_common_lib.fs_general_api.data_types import (
@@ -12,6 +12,8 @@ from fs_common_lib.fs_general_api.data_types import (
     SimpleCheckResult,
 )
 
+from fs_general_api.extra_processes.checker.scanner import ContentScanner
+
 
 @dataclass
 class UserRequestData:
@@ -24,6 +26,8 @@ class UserRequestData:
 class CheckResult:
     description: str
     result: SimpleCheckResult = SimpleCheckResult.FAILED
+    name: Optional[str] = None
+    duration_seconds: Optional[float] = None
 
 
 @dataclass
@@ -45,12 +49,39 @@ class CheckEventResponse:
     result: ProjectCheckResult
     checks: List[CheckResult]
     check_event_request: CheckEventRequest
+    checkout_mode: Optional[str] = None
+    checkout_seconds: Optional[float] = None
+    commit_sha: Optional[str] = None
+    cached: bool = False
 
 
 class CheckInterface(ABC):
-    def __init__(self, path: Path, project_type: ProjectType):
+    # имя проверки в реестре (`check_registry`) и в настройке `checker_checks`
+    name: str = ""
+    # версия логики проверки, входит в ключ сохраненных результатов проверок
+    version: int = 1
+    # таймаут проверки в секундах, по умолчанию `checker_check_timeout`
+    timeout: Optional[float] = None
+
+    def __init__(
+        self,
+        path: Path,
+        project_type: ProjectType,
+        cancel_event: Optional[Event] = None,
+    ):
         self.path: Path = path
         self.project_type: ProjectType = project_type
+        self.cancel_event: Event = (
+            cancel_event if cancel_event is not None else Event()
+        )
+
+    @property
+    def cancelled(self) -> bool:
+        """
+        Проверка отменена по таймауту: длительные проверки должны периодически
+        проверять флаг и завершаться
+        """
+        return self.cancel_event.is_set()
 
     def run(self) -> CheckResult:
         """
@@ -85,6 +116,8 @@ class RequiredFilesCheck(CheckInterface):
     Проверка на наличие необходимых файлов в ETL-проекте
     """
 
+    name = "required_files"
+
     def _process_check(self) -> CheckResult:
         res = CheckResult(
             description="Структура ETL-проекта корректна",
@@ -116,46 +149,31 @@ class RequiredFilesCheck(CheckInterface):
 
 class ToPandasFilesContentCheck(CheckInterface):
     """
-    Проверка на наличие метода `to_pandas` в исходном коде ETL-проекта
+    Проверка на наличие метода `to_pandas` в исходном коде ETL-проекта (файлы .py и ноутбуки)
 
-    NB: При необходимости добавить доп. проверку контенка файлов ETL-проекта можно
-        преобразовать текущий класс в общий интерфейс `FilesContentCheckInterface`.
-        Добавить больше абстракции в `_process_check`, а `_process_find` преобразовать в
-        абстрактный NotImplemented метод.
+    NB: Для проверки на другие подстроки достаточно создать свой `ContentScanner`
+        со списком подстрок и нужными расширениями файлов.
     """
 
-    SEARCHED_FILE_CONTENT = (".toPandas()",)
-
-    def _process_find(self, filename: str) -> bool:
-        with open(
-            os.path.join(self.path, filename), "rb", 0
-        ) as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as s:
-            for token in self.SEARCHED_FILE_CONTENT:
-                if s.find(token.encode()) != -1:
-                    return True
+    name = "to_pandas_files_content"
+    version = 3
 
-            return False
+    SEARCHED_FILE_CONTENT = (".toPandas()",)
+    SCANNER = ContentScanner(SEARCHED_FILE_CONTENT, suffixes=(".py", ".ipynb"))
 
     def _process_check(self) -> CheckResult:
-        # ищем рекурсивно, пропускаем скрытые файлы и папки, в т.ч. .ipynb_checkpoints, пропускаем __pycache__
-        # и пропускаем пустые файлы, чтобы mmap не поплохело
-        python_files = [
-            file_path
-            for file_path in self.path.rglob("*.py")
-            if str(file_path.absolute()).find("/.") < 0
-            and str(file_path.absolute()).find("/__pycache__/") < 0
-            and file_path.stat().st_size > 0
-        ]
-
-        files_with_match = []
-        for python_file_path in python_files:
-            if self._process_find(str(python_file_path.absolute())):
-                files_with_match.append(str(python_file_path))
-
-        if files_with_match:
+        matches = self.SCANNER.scan(self.path, cancel_event=self.cancel_event)
+
+        if matches:
+            locations = [
+                f"{match.path.relative_to(self.path)}:{match.line}"
+                if match.cell is None
+                else f"{match.path.relative_to(self.path)} (ячейка {match.cell}):{match.line}"
+                for match in matches
+            ]
             result = CheckResult(
                 description=(
-                    f"В исходном коде ETL-проекта (файлы: {', '.join(item for item in files_with_match)})"
+                    f"В исходном коде ETL-проекта ({', '.join(locations)}) "
                     f"обнаружено использование методов: {', '.join(item for item in self.SEARCHED_FILE_CONTENT)}. "
                     "Обращаем ваше внимание на то, что использование этих методов является нежелательным и "
                     "может привести к непредвиденным ошибкам при работе DAG."
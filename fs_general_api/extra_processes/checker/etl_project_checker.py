@@ -1,104 +1,545 @@
 import time
 import traceback
-from collections import defaultdict
-from multiprocessing import Process, Queue, Event
-from pathlib import Path
-from queue import Empty
-from tempfile import TemporaryDirectory
-from typing import List
+import zlib
+from collections import OrderedDict
+from contextlib import ExitStack
+from dataclasses import replace
+from multiprocessing import Process, Event, Value
+from multiprocessing.sharedctypes import Synchronized
+from threading import Thread
+from typing import Any, Dict, Generator, List, Optional, Sequence, Tuple, Union
 
 from fs_common_lib.fs_general_api.data_types import (
     ProjectCheckResult,
+    ProjectType,
     SimpleCheckResult,
 )
+from fs_common_lib.fs_logger.fs_logger import FsLoggerHandler
+from git.exc import GitCommandError
+from sqlalchemy.orm import Session
 
 from fs_general_api.extra_processes.checker.check import (
-    RequiredFilesCheck,
     CheckResult,
     CheckEventRequest,
     CheckEventResponse,
-    ToPandasFilesContentCheck,
 )
-from fs_general_api.extra_processes.mixins import GitProjectClonerMixin
-from fs_general_api.config import GitConnProtocol
+from fs_general_api.extra_processes.checker.registry import check_registry
+from fs_general_api.extra_processes.checker.runner import CheckRun, CheckRunner
+from fs_general_api.extra_processes.coalescing import (
+    coalesce_jobs,
+    group_by_branch,
+)
+from fs_general_api.extra_processes.synchronizer.definitions import (
+    SynchronizeEventRequest,
+    SynchronizeEventResponse,
+)
+from fs_general_api.extra_processes.synchronizer.synchronizer import (
+    EtlProjectSynchronizer,
+)
+from fs_general_api.extra_processes.mixins import (
+    GitProjectClonerMixin,
+    GitTimeoutError,
+)
+from fs_general_api.config import GitCheckoutMode, GitConnProtocol, settings
+from fs_general_api.db import db, get_data_storage
+from fs_general_api.job_queue import ClaimedJob, JobQueue
+
+EventResponse = Union[CheckEventResponse, SynchronizeEventResponse]
+
+logger = FsLoggerHandler(
+    __name__,
+    level=settings.log_level,
+    log_format=settings.log_format,
+    datefmt=settings.datefmt,
+).get_logger()
 
 
 class EtlProjectChecker(GitProjectClonerMixin, Process):
-    """Класс для запуска проверок в отдельном процессе"""
+    """
+    Класс для запуска проверок в отдельном процессе.
+
+    Процесс обрабатывает до `concurrency` проверок одновременно (по потоку на проверку),
+    потоки ждут запросы на очереди блокирующе, с таймаутом для проверки сигнала остановки.
+    Если проверку не удалось выполнить за все попытки очереди, проверка завершается с ошибкой.
+
+    Проверки одного проекта выполняются параллельно (`CheckRunner`), набор проверок задается
+    настройкой `checker_checks` (см. `check_registry`).
+
+    Результаты проверок сохраняются в БД по SHA коммита: если ветка указывает на уже проверенный
+    коммит, результат берется из БД без получения исходного кода.
+
+    Ожидающие запросы разбираются пачками до `batch_size`: запросы к одной ветке репозитория
+    обслуживаются одним получением исходного кода. Если задана `sync_queue`, в том же проходе
+    выполняются и запросы на синхронизацию расписания (вместо `EtlProjectSynchronizer`).
+    """
+
+    # Версия логики проверок, входит в ключ сохраненных результатов вместе с составом
+    # и версиями проверок (`CheckRunner.signature`).
+    # Необходимо увеличить при изменении формата результатов.
+    CHECK_SET_VERSION = 1
 
     def __init__(
         self,
-        event_queue: Queue,
-        ctrl_queue: Queue,
+        event_queue: JobQueue,
+        ctrl_queue: JobQueue,
         ctrl_event: Event,
         git_conn_protocol: GitConnProtocol,
         git_username: str,
         git_password: str,
+        concurrency: int = 1,
+        in_flight: Optional[Synchronized] = None,
+        queue_timeout: float = 1,
+        git_checkout_mode: Optional[GitCheckoutMode] = None,
+        check_runner: Optional[CheckRunner] = None,
+        batch_size: int = 1,
+        sync_queue: Optional[JobQueue] = None,
     ) -> None:
         Process.__init__(self)
         GitProjectClonerMixin.__init__(
-            self, git_conn_protocol, git_username, git_password
+            self,
+            git_conn_protocol,
+            git_username,
+            git_password,
+            git_checkout_mode,
         )
 
-        self.event_queue: Queue = event_queue
-        self.ctrl_queue: Queue = ctrl_queue
+        self.event_queue: JobQueue = event_queue
+        self.ctrl_queue: JobQueue = ctrl_queue
         self.ctrl_event: Event = ctrl_event
+        self.concurrency: int = max(1, concurrency)
+        self.in_flight: Synchronized = (
+            in_flight if in_flight is not None else Value("i", 0)
+        )
+        self.queue_timeout: float = queue_timeout
+        self.batch_size: int = max(1, batch_size)
+        self.sync_queue: Optional[JobQueue] = sync_queue
+        self.check_runner: CheckRunner = (
+            check_runner
+            if check_runner is not None
+            else CheckRunner(check_registry.get_checks(settings.checker_checks))
+        )
+
+    @property
+    def check_set_version(self) -> int:
+        signature = f"{self.CHECK_SET_VERSION}:{self.check_runner.signature}"
+        return zlib.crc32(signature.encode()) & 0x7FFFFFFF
 
     def run(self) -> None:
+        if self.concurrency == 1:
+            self._consume()
+            return
+
+        threads = [
+            Thread(target=self._consume, daemon=True)
+            for _ in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _consume(self) -> None:
         while self.ctrl_event.is_set():
+            for job in self.event_queue.reap_expired():
+                self._dead_letter(job, "превышено время выполнения")
+            if self.sync_queue is not None:
+                for job in self.sync_queue.reap_expired():
+                    self._dead_letter_sync(job, "превышено время выполнения")
+
+            check_jobs = self.event_queue.claim_batch(
+                self.batch_size, timeout=self.queue_timeout
+            )
+            sync_jobs = (
+                self.sync_queue.claim_batch(self.batch_size, timeout=0)
+                if self.sync_queue is not None
+                else []
+            )
+            if not check_jobs and not sync_jobs:
+                continue
+
+            jobs_count = len(check_jobs) + len(sync_jobs)
+            with self.in_flight.get_lock():
+                self.in_flight.value += jobs_count
             try:
-                check_request: CheckEventRequest = self.event_queue.get_nowait()
-                self._process_checks(check_request=check_request)
-            except Empty:
-                pass
+                self._process_jobs(check_jobs, sync_jobs)
+            finally:
+                with self.in_flight.get_lock():
+                    self.in_flight.value -= jobs_count
 
-            time.sleep(1)
+    def _process_jobs(
+        self, check_jobs: List[ClaimedJob], sync_jobs: List[ClaimedJob]
+    ) -> None:
+        """
+        Обрабатывает пачку заданий: повторные проверки (тот же `general_check_id`) и синхронизации
+        (та же версия проекта) выполняются один раз, а задания одной ветки репозитория -
+        одним получением исходного кода
+        """
+        check_jobs, duplicate_checks = coalesce_jobs(
+            check_jobs, key=lambda request: request.general_check_id
+        )
+        self.event_queue.complete(duplicate_checks)
+        if self.sync_queue is not None:
+            sync_jobs, duplicate_syncs = coalesce_jobs(
+                sync_jobs,
+                key=lambda request: (
+                    request.etl_project_id,
+                    request.etl_project_version,
+                ),
+            )
+            self.sync_queue.complete(duplicate_syncs)
+
+        for branch_check_jobs, branch_sync_jobs in group_by_branch(
+            check_jobs, sync_jobs
+        ).values():
+            try:
+                with ExitStack() as stack:
+                    for job in branch_check_jobs:
+                        stack.enter_context(self.event_queue.lease(job))
+                    for job in branch_sync_jobs:
+                        stack.enter_context(self.sync_queue.lease(job))
+                    self._process_requests(
+                        [job.item for job in branch_check_jobs],
+                        [job.item for job in branch_sync_jobs],
+                    )
+                self.event_queue.complete(branch_check_jobs)
+                if branch_sync_jobs:
+                    self.sync_queue.complete(branch_sync_jobs)
+            except Exception as exc:
+                logger.error(f"{exc}\n{traceback.format_exc()}")
+                reason = self._get_failure_reason(
+                    exc, (branch_check_jobs + branch_sync_jobs)[0].item.branch_name
+                )
+                for job in branch_check_jobs:
+                    if self.event_queue.fail(job, reason):
+                        self._dead_letter(job, reason)
+                for job in branch_sync_jobs:
+                    if self.sync_queue.fail(job, reason):
+                        self._dead_letter_sync(job, reason)
+
+    def _get_failure_reason(self, exc: Exception, branch_name: str) -> str:
+        if isinstance(exc, GitTimeoutError):
+            return (
+                f"исходный код ветки {self._get_remote_branch(branch_name)} не получен "
+                f"за {exc.timeout} секунд"
+            )
+        return str(exc)
+
+    def _dead_letter(self, job: ClaimedJob, reason: str) -> None:
+        """
+        Завершает с ошибкой проверку, которую не удалось выполнить, чтобы она не осталась
+        в статусе PROCESSING
+        """
+        check_request: CheckEventRequest = job.item
+        self.ctrl_queue.put(
+            CheckEventResponse(
+                result=ProjectCheckResult.FAILED,
+                checks=[
+                    CheckResult(
+                        description=f"Проверка не выполнена за {job.attempts} попыток: {reason}",
+                        result=SimpleCheckResult.FAILED,
+                    )
+                ],
+                check_event_request=check_request,
+            )
+        )
+
+    def _dead_letter_sync(self, job: ClaimedJob, reason: str) -> None:
+        self.ctrl_queue.put(
+            EtlProjectSynchronizer.dead_letter_response(job, reason)
+        )
 
     def _process_checks(self, check_request: CheckEventRequest) -> None:
-        checks_res: List[CheckResult] = []
+        self._process_requests([check_request], [])
 
-        checks_classes = (
-            RequiredFilesCheck,
-            ToPandasFilesContentCheck,
+    def _process_requests(
+        self,
+        check_requests: Sequence[CheckEventRequest],
+        sync_requests: Sequence[SynchronizeEventRequest],
+    ) -> None:
+        """
+        Выполняет проверки и синхронизации проектов одной ветки репозитория одним получением
+        исходного кода. Проверки одного проекта выполняются один раз, результат отправляется
+        каждому запросу.
+        """
+        first_request = (list(check_requests) + list(sync_requests))[0]
+        git_repo, branch_name = first_request.git_repo, first_request.branch_name
+
+        projects: Dict[Tuple[str, str], List[CheckEventRequest]] = OrderedDict()
+        for check_request in check_requests:
+            project_key = (
+                check_request.etl_project_name,
+                ProjectType(check_request.project_type).value,
+            )
+            projects.setdefault(project_key, []).append(check_request)
+
+        commit_sha = (
+            self._resolve_commit_sha(git_repo, branch_name) if projects else None
         )
-        checks_statuses_count_mapping = defaultdict(int)
+        responses: List[EventResponse] = []
 
-        try:
-            with TemporaryDirectory() as tempdir:
-                git_path = Path(tempdir)
-                project_path = git_path / check_request.etl_project_name
-                repo = self._clone_project(
-                    project_path=git_path, git_repo_url=check_request.git_repo
+        if commit_sha is not None:
+            for project_key, project_requests in list(projects.items()):
+                cached_response = self._get_cached_response(
+                    project_requests[-1], commit_sha
                 )
-                repo.git.checkout(check_request.branch_name)
+                if cached_response is not None:
+                    responses.extend(
+                        replace(cached_response, check_event_request=request)
+                        for request in project_requests
+                    )
+                    del projects[project_key]
+
+        project_names = sorted(
+            {project_name for project_name, _ in projects}
+            | {request.etl_project_name for request in sync_requests}
+        )
+        if project_names:
+            responses.extend(
+                self._checkout_and_process(
+                    git_repo=git_repo,
+                    branch_name=branch_name,
+                    project_names=project_names,
+                    projects=projects,
+                    sync_requests=sync_requests,
+                    commit_sha=commit_sha,
+                )
+            )
 
-                # Здесь добавляем необходимые проверки для исходного кода ETL проектов
-                for check_cls in checks_classes:
-                    check_result = check_cls(
-                        path=project_path,
-                        project_type=check_request.project_type,
-                    ).run()
-                    checks_statuses_count_mapping[check_result.result] += 1
-                    checks_res.append(check_result)
+        for response in responses:
+            self.ctrl_queue.put(response)
 
+    def _checkout_and_process(
+        self,
+        git_repo: str,
+        branch_name: str,
+        project_names: List[str],
+        projects: Dict[Tuple[str, str], List[CheckEventRequest]],
+        sync_requests: Sequence[SynchronizeEventRequest],
+        commit_sha: Optional[str],
+    ) -> List[EventResponse]:
+        check_results: Dict[Tuple[str, str], CheckRun] = {}
+        sync_responses: List[SynchronizeEventResponse] = []
+        checkout_seconds: Optional[float] = None
+        error: Optional[CheckResult] = None
+
+        try:
+            started = time.perf_counter()
+            with self._checkout_projects(
+                git_repo_url=git_repo,
+                branch_name=branch_name,
+                project_names=project_names,
+                # для синхронизации расписания достаточно settings.yaml
+                paths=(
+                    None
+                    if projects
+                    else [EtlProjectSynchronizer.SETTINGS_FILE_NAME]
+                ),
+            ) as checkout:
+                checkout_seconds = time.perf_counter() - started
+                commit_sha = checkout.commit_sha
+                for project_key, project_requests in projects.items():
+                    check_results[project_key] = self.check_runner.run(
+                        path=checkout.project_path(project_key[0]),
+                        project_type=project_requests[-1].project_type,
+                    )
+                for sync_request in sync_requests:
+                    sync_responses.append(
+                        EtlProjectSynchronizer.synchronize_project(
+                            synchronize_request=sync_request,
+                            project_path=checkout.project_path(
+                                sync_request.etl_project_name
+                            ),
+                        )
+                    )
+
+        except GitCommandError:
+            # ошибки git (недоступный репозиторий, таймаут) обычно временные: задания
+            # возвращаются в очередь, а FAILED отправляется, только когда попытки исчерпаны
+            raise
         except Exception as exc:
-            checks_statuses_count_mapping[SimpleCheckResult.FAILED] += 1
-            checks_res.append(
-                CheckResult(
-                    description=f"{exc}\n{traceback.format_exc()}",
-                    result=SimpleCheckResult.FAILED,
+            error = CheckResult(
+                description=f"{exc}\n{traceback.format_exc()}",
+                result=SimpleCheckResult.FAILED,
+            )
+            sync_responses = [
+                SynchronizeEventResponse(
+                    synchronize_event_request=request,
+                    error_message=f"{exc} for ETL-project with id={request.etl_project_id}\n{traceback.format_exc()}",
                 )
+                for request in sync_requests
+            ]
+
+        responses: List[EventResponse] = []
+        for project_key, project_requests in projects.items():
+            check_run = check_results.get(project_key)
+            checks = check_run.results if check_run is not None else [error]
+
+            if any(check.result == SimpleCheckResult.FAILED for check in checks):
+                event_result = ProjectCheckResult.FAILED
+            else:
+                event_result = ProjectCheckResult.SUCCESS
+
+            response = CheckEventResponse(
+                result=event_result,
+                checks=checks,
+                check_event_request=project_requests[-1],
+                commit_sha=commit_sha,
+            )
+            if check_run is not None and check_run.completed:
+                self._save_result(response)
+
+            responses.extend(
+                replace(response, check_event_request=request)
+                for request in project_requests
             )
+        responses.extend(sync_responses)
+
+        for response in responses:
+            response.checkout_mode = self.git_checkout_mode.value
+        # время общего получения исходного кода учитывается один раз
+        if responses:
+            responses[0].checkout_seconds = checkout_seconds
+
+        return responses
+
+    def _resolve_commit_sha(
+        self, git_repo: str, branch_name: str
+    ) -> Optional[str]:
+        try:
+            return self._resolve_branch_sha(
+                git_repo_url=git_repo, branch_name=branch_name
+            )
+        except Exception as exc:
+            logger.warning(f"Cant resolve branch `{branch_name}` head: {exc}")
+            return None
+
+    def _get_cached_response(
+        self, check_request: CheckEventRequest, commit_sha: str
+    ) -> Optional[CheckEventResponse]:
+        db_session_gen: Generator[Session, None, None] = db.get_session()
+        try:
+            session = next(db_session_gen)
+            cached_result = get_data_storage().get_cached_check_result(
+                db_session=session,
+                git_repo=check_request.git_repo,
+                commit_sha=commit_sha,
+                etl_project_name=check_request.etl_project_name,
+                project_type=ProjectType(check_request.project_type).value,
+                check_set_version=self.check_set_version,
+            )
+        except Exception as exc:
+            logger.warning(f"Cant read cached check result: {exc}")
+            return None
+        finally:
+            next(db_session_gen, None)
 
-        if checks_statuses_count_mapping[SimpleCheckResult.FAILED]:
-            event_result = ProjectCheckResult.FAILED
-        else:
-            event_result = ProjectCheckResult.SUCCESS
+        if cached_result is None:
+            return None
 
-        response = CheckEventResponse(
-            result=event_result,
-            checks=checks_res,
+        return CheckEventResponse(
+            result=ProjectCheckResult(cached_result.result),
+            checks=[
+                CheckResult(
+                    description=check["description"],
+                    result=SimpleCheckResult(check["result"]),
+                    name=check.get("name"),
+                    duration_seconds=check.get("duration_seconds"),
+                )
+                for check in cached_result.checks
+            ],
             check_event_request=check_request,
+            commit_sha=commit_sha,
+            cached=True,
         )
 
-        self.ctrl_queue.put(response)
+    def _save_result(self, response: CheckEventResponse) -> None:
+        check_request = response.check_event_request
+        db_session_gen: Generator[Session, None, None] = db.get_session()
+        try:
+            get_data_storage().save_check_result(
+                db_session=next(db_session_gen),
+                git_repo=check_request.git_repo,
+                commit_sha=response.commit_sha,
+                etl_project_name=check_request.etl_project_name,
+                project_type=ProjectType(check_request.project_type).value,
+                check_set_version=self.check_set_version,
+                result=response.result.value,
+                checks=[
+                    {
+                        "description": check.description,
+                        "result": check.result.value,
+                        "name": check.name,
+                        "duration_seconds": check.duration_seconds,
+                    }
+                    for check in response.checks
+                ],
+            )
+        except Exception as exc:
+            logger.warning(f"Cant save check result: {exc}")
+        finally:
+            next(db_session_gen, None)
+
+
+class EtlProjectCheckerPool:
+    """
+    Пул процессов `EtlProjectChecker`, разбирающих общую очередь запросов на проверку
+    """
+
+    def __init__(
+        self,
+        event_queue: JobQueue,
+        ctrl_queue: JobQueue,
+        ctrl_event: Event,
+        git_conn_protocol: GitConnProtocol,
+        git_username: str,
+        git_password: str,
+        workers: int = settings.checker_workers,
+        concurrency: int = settings.checker_worker_concurrency,
+        queue_timeout: float = settings.checker_queue_timeout,
+        git_checkout_mode: Optional[GitCheckoutMode] = None,
+        batch_size: int = settings.checker_batch_size,
+        sync_queue: Optional[JobQueue] = None,
+    ) -> None:
+        self.event_queue: JobQueue = event_queue
+        self.in_flight: Synchronized = Value("i", 0)
+        self.concurrency: int = max(1, concurrency)
+        self.workers: List[EtlProjectChecker] = [
+            EtlProjectChecker(
+                event_queue=event_queue,
+                ctrl_queue=ctrl_queue,
+                ctrl_event=ctrl_event,
+                git_conn_protocol=git_conn_protocol,
+                git_username=git_username,
+                git_password=git_password,
+                concurrency=self.concurrency,
+                in_flight=self.in_flight,
+                queue_timeout=queue_timeout,
+                git_checkout_mode=git_checkout_mode,
+                batch_size=batch_size,
+                sync_queue=sync_queue,
+            )
+            for _ in range(max(1, workers))
+        ]
+
+    def start(self) -> None:
+        for worker in self.workers:
+            worker.start()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        for worker in self.workers:
+            worker.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            queued: Optional[int] = self.event_queue.qsize()
+        except Exception:
+            # размер очереди в БД недоступен, если недоступна БД
+            queued = None
+
+        return {
+            "workers": len(self.workers),
+            "alive_workers": sum(worker.is_alive() for worker in self.workers),
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight.value,
+            "queued": queued,
+        }
@@ -0,0 +1,98 @@
+"""
+Реестр проверок исходного кода ETL-проектов.
+
+Встроенные проверки регистрируются здесь, дополнительные подключаются пакетами через
+entry points группы `fs_general_api.checks`:
+
+    [options.entry_points]
+    fs_general_api.checks =
+        yaml_schema = my_checks.yaml_schema:YamlSchemaCheck
+
+Набор выполняемых проверок задается настройкой `checker_checks` (по умолчанию - все).
+"""
+from typing import Dict, List, Sequence, Type
+
+from fs_common_lib.fs_logger.fs_logger import FsLoggerHandler
+
+from fs_general_api.config import settings
+from fs_general_api.extra_processes.checker.check import (
+    CheckInterface,
+    RequiredFilesCheck,
+    ToPandasFilesContentCheck,
+)
+
+try:
+    from importlib.metadata import entry_points
+except ImportError:  # Python < 3.8
+    entry_points = None
+
+logger = FsLoggerHandler(
+    __name__,
+    level=settings.log_level,
+    log_format=settings.log_format,
+    datefmt=settings.datefmt,
+).get_logger()
+
+ENTRY_POINTS_GROUP = "fs_general_api.checks"
+
+
+class UnknownCheckError(ValueError):
+    pass
+
+
+class CheckRegistry:
+    def __init__(self):
+        self._checks: Dict[str, Type[CheckInterface]] = {}
+        self._entry_points_loaded = False
+
+    def register(self, check_cls: Type[CheckInterface]) -> Type[CheckInterface]:
+        if not check_cls.name:
+            raise ValueError(f"Check `{check_cls.__name__}` has no name")
+        self._checks[check_cls.name] = check_cls
+        return check_cls
+
+    def load_entry_points(self) -> None:
+        if self._entry_points_loaded:
+            return
+        self._entry_points_loaded = True
+
+        for entry_point in self._iter_entry_points():
+            try:
+                check_cls = entry_point.load()
+                if not check_cls.name:
+                    check_cls.name = entry_point.name
+                self.register(check_cls)
+            except Exception as e:
+                logger.error(f"Cant load check `{entry_point.name}`: {e}")
+
+    @staticmethod
+    def _iter_entry_points():
+        if entry_points is not None:
+            eps = entry_points()
+            if hasattr(eps, "select"):
+                return eps.select(group=ENTRY_POINTS_GROUP)
+            return eps.get(ENTRY_POINTS_GROUP, [])
+
+        import pkg_resources
+
+        return pkg_resources.iter_entry_points(ENTRY_POINTS_GROUP)
+
+    def get_checks(
+        self, names: Sequence[str] = ()
+    ) -> List[Type[CheckInterface]]:
+        """
+        Возвращает проверки с указанными именами или все зарегистрированные, если имена не заданы
+        """
+        self.load_entry_points()
+        if not names:
+            return list(self._checks.values())
+
+        unknown = [name for name in names if name not in self._checks]
+        if unknown:
+            raise UnknownCheckError(f"Unknown checks: {', '.join(unknown)}")
+        return [self._checks[name] for name in names]
+
+
+check_registry = CheckRegistry()
+check_registry.register(RequiredFilesCheck)
+check_registry.register(ToPandasFilesContentCheck)
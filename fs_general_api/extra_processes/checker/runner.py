@@ -0,0 +1,173 @@
+import os
+import time
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Event, Lock
+from typing import List, Optional, Sequence, Tuple, Type
+
+from fs_common_lib.fs_general_api.data_types import (
+    ProjectType,
+    SimpleCheckResult,
+)
+
+from fs_general_api.config import settings
+from fs_general_api.extra_processes.checker.check import (
+    CheckInterface,
+    CheckResult,
+)
+
+
+class CheckDeadline:
+    """
+    Срок выполнения проверки, отсчитываемый с момента начала ее выполнения
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.started = Event()
+        self.started_at: Optional[float] = None
+
+    def start(self) -> None:
+        self.started_at = time.monotonic()
+        self.started.set()
+
+    def remaining(self) -> float:
+        return max(self.started_at + self.timeout - time.monotonic(), 0)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at if self.started_at is not None else 0
+
+
+@dataclass
+class CheckRun:
+    """
+    Результаты проверок. `completed` - все проверки выполнены (без таймаутов и ошибок),
+    только такие результаты сохраняются по SHA коммита.
+    """
+
+    results: List[CheckResult]
+    completed: bool
+
+
+class CheckRunner:
+    """
+    Параллельный запуск проверок в пуле потоков.
+
+    Проверки одного проекта запускаются одновременно, результат каждой ждется не дольше
+    ее таймаута, отсчитываемого с начала ее выполнения в пуле, а не с постановки в очередь пула.
+    Проверка, не уложившаяся в таймаут, завершается с ошибкой, а ее поток получает сигнал
+    отмены (`CheckInterface.cancelled`). Проверка, которая не начала выполняться за свой
+    таймаут (все потоки пула заняты), тоже завершается с ошибкой.
+
+    Пул создается при первом запуске в процессе, поэтому объект можно создать до fork.
+
+    Args:
+        check_classes: проверки
+        max_workers: количество потоков пула
+        default_timeout: таймаут проверки, если он не задан в классе проверки
+    """
+
+    def __init__(
+        self,
+        check_classes: Sequence[Type[CheckInterface]],
+        max_workers: int = settings.checker_check_threads,
+        default_timeout: float = settings.checker_check_timeout,
+    ):
+        self.check_classes = list(check_classes)
+        self.max_workers = max(1, max_workers)
+        self.default_timeout = default_timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._executor_lock = Lock()
+
+    @property
+    def signature(self) -> str:
+        """
+        Состав и версии проверок: входит в ключ сохраненных результатов проверок
+        """
+        return ",".join(
+            f"{check_cls.name}:{check_cls.version}"
+            for check_cls in sorted(self.check_classes, key=lambda cls: cls.name)
+        )
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._executor_lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="check",
+                    )
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def run(self, path: Path, project_type: ProjectType) -> CheckRun:
+        submitted: List[Tuple[CheckInterface, CheckDeadline, Future]] = []
+        for check_cls in self.check_classes:
+            check = check_cls(
+                path=path, project_type=project_type, cancel_event=Event()
+            )
+            deadline = CheckDeadline(
+                check_cls.timeout
+                if check_cls.timeout is not None
+                else self.default_timeout
+            )
+            submitted.append(
+                (
+                    check,
+                    deadline,
+                    self.executor.submit(self._run_check, check, deadline),
+                )
+            )
+
+        results = []
+        completed = True
+        for check, deadline, future in submitted:
+            try:
+                if not deadline.started.wait(deadline.timeout):
+                    check.cancel_event.set()
+                    future.cancel()
+                    completed = False
+                    result = CheckResult(
+                        description=(
+                            f"Проверка `{check.name}` не запущена за {deadline.timeout} с.: "
+                            f"все потоки проверок заняты"
+                        ),
+                        result=SimpleCheckResult.FAILED,
+                        name=check.name,
+                    )
+                else:
+                    result = future.result(timeout=deadline.remaining())
+            except FutureTimeoutError:
+                check.cancel_event.set()
+                future.cancel()
+                completed = False
+                result = CheckResult(
+                    description=f"Проверка `{check.name}` не завершилась за {deadline.timeout} с.",
+                    result=SimpleCheckResult.FAILED,
+                    name=check.name,
+                    duration_seconds=deadline.elapsed(),
+                )
+            except Exception as exc:
+                completed = False
+                result = CheckResult(
+                    description=f"{exc}\n{traceback.format_exc()}",
+                    result=SimpleCheckResult.FAILED,
+                    name=check.name,
+                )
+            results.append(result)
+
+        return CheckRun(results=results, completed=completed)
+
+    @staticmethod
+    def _run_check(check: CheckInterface, deadline: CheckDeadline) -> CheckResult:
+        deadline.start()
+        started = time.perf_counter()
+        result = check.run()
+        result.name = check.name
+        result.duration_seconds = time.perf_counter() - started
+        return result
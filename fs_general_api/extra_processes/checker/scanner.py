@@ -0,0 +1,164 @@
+"""
+Поиск подстрок в исходном коде ETL-проекта.
+
+Все искомые подстроки объединяются в одно регулярное выражение, поэтому каждый файл
+читается и просматривается один раз. Скрытые директории (в т.ч. `.ipynb_checkpoints`, `.git`)
+и директории кэша исключаются при обходе, а не после него. Файлы просматриваются
+параллельно в пуле потоков.
+
+В ноутбуках (`.ipynb`) просматривается исходный код ячеек с кодом, а вхождение указывается
+номером ячейки и строкой в ней, а не строкой JSON-файла.
+"""
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Event, Lock
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from fs_general_api.config import settings
+
+
+@dataclass(frozen=True)
+class ContentMatch:
+    path: Path
+    line: int
+    token: str
+    # номер ячейки ноутбука (с 1), строка в этом случае считается внутри ячейки
+    cell: Optional[int] = None
+
+
+class ContentScanner:
+    """
+    Args:
+        tokens: искомые подстроки
+        suffixes: расширения просматриваемых файлов
+        skip_dirs: имена директорий, исключаемых из обхода (кроме скрытых, которые исключаются всегда)
+        max_workers: количество потоков, просматривающих файлы
+    """
+
+    SOURCE_SUFFIXES = (".py", ".ipynb", ".sql")
+    SKIP_DIRS = ("__pycache__",)
+    # до этого количества файлов пул потоков не используется
+    MIN_PARALLEL_FILES = 8
+
+    def __init__(
+        self,
+        tokens: Sequence[str],
+        suffixes: Sequence[str] = SOURCE_SUFFIXES,
+        skip_dirs: Sequence[str] = SKIP_DIRS,
+        max_workers: int = settings.checker_scan_threads,
+    ):
+        self.tokens = list(tokens)
+        self.suffixes = tuple(suffixes)
+        self.skip_dirs = frozenset(skip_dirs)
+        self.max_workers = max(1, max_workers)
+        self._pattern = re.compile(
+            b"|".join(re.escape(token.encode()) for token in self.tokens)
+        )
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._executor_lock = Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # пул создается в процессе, который его использует, т.к. потоки не переживают fork
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._executor_lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="scan",
+                    )
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def iter_files(self, root: Path) -> Iterator[Path]:
+        for dir_path, dir_names, file_names in os.walk(root):
+            dir_names[:] = [
+                name
+                for name in dir_names
+                if not name.startswith(".") and name not in self.skip_dirs
+            ]
+            for file_name in file_names:
+                if not file_name.startswith(".") and file_name.endswith(
+                    self.suffixes
+                ):
+                    yield Path(dir_path, file_name)
+
+    def scan_file(self, path: Path) -> List[ContentMatch]:
+        content = path.read_bytes()
+
+        if path.suffix == ".ipynb":
+            cells = self._read_notebook_cells(content)
+            if cells is not None:
+                return [
+                    match
+                    for cell, source in cells
+                    for match in self._scan_content(path, source, cell)
+                ]
+
+        return self._scan_content(path, content)
+
+    def _scan_content(
+        self, path: Path, content: bytes, cell: Optional[int] = None
+    ) -> List[ContentMatch]:
+        matches = []
+        line, line_start = 1, 0
+        for match in self._pattern.finditer(content):
+            line += content.count(b"\n", line_start, match.start())
+            line_start = match.start()
+            matches.append(
+                ContentMatch(
+                    path=path, line=line, token=match.group().decode(), cell=cell
+                )
+            )
+        return matches
+
+    @staticmethod
+    def _read_notebook_cells(content: bytes) -> Optional[List[Tuple[int, bytes]]]:
+        """
+        Возвращает исходный код ячеек с кодом (номер ячейки, код) или None,
+        если файл не является ноутбуком. Такой файл просматривается целиком.
+        """
+        try:
+            cells = json.loads(content)["cells"]
+            sources = []
+            for index, cell in enumerate(cells, start=1):
+                if cell.get("cell_type", "code") != "code":
+                    continue
+                source = cell.get("source") or ""
+                if isinstance(source, list):
+                    source = "".join(source)
+                sources.append((index, source.encode()))
+            return sources
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return None
+
+    def scan(
+        self, root: Path, cancel_event: Optional[Event] = None
+    ) -> List[ContentMatch]:
+        """
+        Возвращает вхождения подстрок в файлах директории, упорядоченные по файлу и строке.
+        Если `cancel_event` установлен, необработанные файлы пропускаются.
+        """
+        if not self.tokens:
+            return []
+
+        def scan_file(path: Path) -> List[ContentMatch]:
+            if cancel_event is not None and cancel_event.is_set():
+                return []
+            return self.scan_file(path)
+
+        files = list(self.iter_files(root))
+        if len(files) < self.MIN_PARALLEL_FILES:
+            results: Iterable[List[ContentMatch]] = map(scan_file, files)
+        else:
+            results = self.executor.map(scan_file, files)
+
+        return sorted(
+            (match for file_matches in results for match in file_matches),
+            key=lambda match: (str(match.path), match.cell or 0, match.line),
+        )
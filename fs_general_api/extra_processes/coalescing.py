@@ -0,0 +1,59 @@
+"""
+Объединение заданий проверки и синхронизации, ожидающих в очереди одновременно.
+
+Задания, относящиеся к одной ветке одного репозитория, обрабатываются одним получением
+исходного кода, а повторные задания (тот же ключ) - один раз: остается последнее из них.
+"""
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Sequence, Tuple
+
+from fs_general_api.extra_processes.mixins import GitProjectClonerMixin
+from fs_general_api.job_queue import ClaimedJob
+
+BranchKey = Tuple[str, str]
+
+
+def coalesce_jobs(
+    jobs: Sequence[ClaimedJob], key: Callable[[object], Hashable]
+) -> Tuple[List[ClaimedJob], List[ClaimedJob]]:
+    """
+    Оставляет по одному заданию на ключ `key(job.item)` - последнее добавленное.
+    Возвращает оставшиеся задания (в порядке очереди) и повторные.
+    """
+    newest: Dict[Hashable, ClaimedJob] = OrderedDict()
+    duplicates = []
+    for job in jobs:
+        item_key = key(job.item)
+        if item_key in newest:
+            duplicates.append(newest.pop(item_key))
+        newest[item_key] = job
+
+    kept_ids = {id(job) for job in newest.values()}
+    return [job for job in jobs if id(job) in kept_ids], duplicates
+
+
+def branch_key(item) -> BranchKey:
+    """
+    Ветка репозитория запроса: `refs/remotes/origin/<ветка>` и `<ветка>` - одна и та же ветка
+    """
+    return (
+        item.git_repo,
+        GitProjectClonerMixin._get_remote_branch(item.branch_name),
+    )
+
+
+def group_by_branch(
+    *job_lists: Sequence[ClaimedJob],
+) -> "OrderedDict[BranchKey, Tuple[List[ClaimedJob], ...]]":
+    """
+    Группирует задания нескольких очередей по ветке репозитория.
+    Для каждой ветки возвращает списки заданий в том же порядке, что и `job_lists`.
+    """
+    groups: "OrderedDict[BranchKey, Tuple[List[ClaimedJob], ...]]" = OrderedDict()
+    for index, jobs in enumerate(job_lists):
+        for job in jobs:
+            group = groups.setdefault(
+                branch_key(job.item), tuple([] for _ in job_lists)
+            )
+            group[index].append(job)
+    return groups
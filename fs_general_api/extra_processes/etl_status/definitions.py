@@ -1,10 +1,16 @@
 import enum
 from dataclasses import dataclass
+from typing import List
 
 from pydantic import BaseModel
 from fs_common_lib.fs_backend_api.internal_dto import InternalPdtEtlRun
 
 
+class EtlRunSource(enum.Enum):
+    DEV = "dev"
+    PROD = "prod"
+
+
 class PeriodType(enum.Enum):
     hour = "hour"
     day = "day"
@@ -20,3 +26,8 @@ class LastRunsForEtlProject(BaseModel):
     etl_project_id: int
     etl_project_version: str
     etl_run: InternalPdtEtlRun
+
+
+class EtlRunEvents(BaseModel):
+    source: EtlRunSource
+    events: List[LastRunsForEtlProject]
@@ -1,18 +1,29 @@
 import asyncio
-from typing import Optional, List, Tuple
-from collections import deque
+import math
+from typing import Dict, Optional, List, Tuple
 
-import aiohttp
 from sqlalchemy import tuple_
 from sqlalchemy.orm import Session, joinedload
+from fs_common_lib.fs_backend_api.internal_dto import InternalPdtEtlRun
 from fs_common_lib.fs_registry_api import join_urls
 from fs_common_lib.fs_general_api.data_types import EtlProjectStatus
 from fs_db.db_classes_general import EtlProjectVersion
 from fs_common_lib.fs_logger.fs_logger import FsLoggerHandler
 
-from fs_general_api.extra_processes.etl_status.definitions import PeriodParams, PeriodType, LastRunsForEtlProject
+from fs_general_api.extra_processes.etl_status.definitions import (
+    EtlRunSource,
+    PeriodParams,
+    PeriodType,
+    LastRunsForEtlProject,
+)
 from fs_general_api.config import settings
 from fs_general_api.db import data_storage
+from fs_general_api.history import HistoryRecorder
+from fs_general_api.http_clients import Upstream, http_clients
+
+# результаты завершенных запусков: позиция опроса не сдвигается дальше незавершенного запуска,
+# чтобы его завершение было обработано следующим опросом
+FINISHED_RUN_RESULTS = ("SUCCESS", "FAIL")
 
 logger = FsLoggerHandler(
     __name__,
@@ -21,87 +32,207 @@ logger = FsLoggerHandler(
     datefmt=settings.datefmt).get_logger()
 
 
-async def update_etl_projects_statuses(db_session: Session, dev_used_cache: deque, prod_used_cache: deque):
-    period = PeriodParams(value=1, type=PeriodType.hour)
+async def update_etl_projects_statuses(db_session: Session):
+    period = get_reconciliation_period()
     logger.info(f"start updating etl project statuses")
 
-    await _update_etl_projects_from_dev(db_session, period, dev_used_cache)
-    await _update_etl_projects_status_from_prod(db_session, period, prod_used_cache)
+    await _update_etl_projects_from_dev(db_session, period)
+    await _update_etl_projects_status_from_prod(db_session, period)
+
+
+def get_etl_status_update_timeout() -> int:
+    """
+    Период (в минутах) опроса backend-ов. При включенном приеме событий о запусках
+    опрос служит лишь редкой сверкой статусов.
+    """
+    if settings.use_etl_run_events:
+        return settings.etl_status_reconciliation_timeout
+
+    return settings.etl_status_update_timeout
+
+
+def get_reconciliation_period() -> PeriodParams:
+    return PeriodParams(
+        value=max(1, math.ceil(get_etl_status_update_timeout() / 60)),
+        type=PeriodType.hour,
+    )
+
+
+async def apply_etl_run_events(
+    db_session: Session, source: EtlRunSource, events: List[LastRunsForEtlProject]
+) -> int:
+    """
+    Применяет переходы статусов по событиям о завершенных запусках, присланным backend-ом.
+    Возвращает количество версий ETL-проектов, по которым были учтены запуски.
+    """
+    last_runs_by_project = _dedupe_etl_runs(events)
+
+    if source == EtlRunSource.DEV:
+        await _apply_etl_runs_from_dev(db_session, last_runs_by_project)
+    else:
+        await _apply_etl_runs_from_prod(db_session, last_runs_by_project)
+
+    return len(last_runs_by_project)
+
+
+async def _update_etl_projects_from_dev(db_session: Session, period: PeriodParams) -> None:
+    await _update_etl_projects_from_backend(
+        db_session, period, EtlRunSource.DEV, settings.backend_uri_dev, Upstream.BACKEND_DEV
+    )
+
+
+async def _update_etl_projects_status_from_prod(db_session: Session, period: PeriodParams) -> None:
+    await _update_etl_projects_from_backend(
+        db_session, period, EtlRunSource.PROD, settings.backend_uri_prod, Upstream.BACKEND_PROD
+    )
+
+
+async def _update_etl_projects_from_backend(
+    db_session: Session,
+    period: PeriodParams,
+    source: EtlRunSource,
+    backend_uri: str,
+    upstream: Upstream,
+) -> None:
+    """
+    Обрабатывает запуски backend-а, появившиеся после сохраненной в БД позиции опроса.
+
+    Запуски запрашиваются до блокировки позиции, чтобы не держать блокировку во время
+    запроса к backend-у. Затем позиция блокируется на время обработки, поэтому при нескольких
+    репликах запуски одного backend-а обрабатывает только одна из них. Предполагается, что
+    идентификаторы запусков на стороне backend-а монотонно возрастают. Позиция сдвигается
+    только за завершенные запуски, идущие до первого незавершенного.
+    """
+    since_run_id = data_storage.get_etl_run_cursor_position(db_session, backend=source.value)
+
+    last_runs = await _get_last_etl_runs_from_backend_api(
+        period, backend_uri, upstream, since_run_id=since_run_id
+    )
+
+    cursor = data_storage.lock_etl_run_cursor(db_session, backend=source.value)
+
+    if cursor is None:
+        logger.info(f"ETL runs from {source.value} backend are processed by another replica")
+        return
+
+    # позиция могла сдвинуться другой репликой, пока запрашивались запуски
+    new_runs = [
+        run for run in last_runs
+        if cursor.last_run_id is None or run.etl_run.id is None or run.etl_run.id > cursor.last_run_id
+    ]
+    last_runs_by_project = _dedupe_etl_runs(new_runs)
 
+    if source == EtlRunSource.DEV:
+        await _apply_etl_runs_from_dev(db_session, last_runs_by_project)
+    else:
+        await _apply_etl_runs_from_prod(db_session, last_runs_by_project)
 
-async def _update_etl_projects_from_dev(db_session: Session, period: PeriodParams, used_cache: deque) -> None:
-    projects_versions, last_runs_by_project = await _get_last_etl_project_runs(
-        db_session, period, used_cache, settings.backend_uri_dev
+    last_run = _get_last_finished_run(
+        [run.etl_run for run in new_runs if run.etl_run.id is not None]
     )
+    with db_session.begin_nested():
+        if last_run is not None:
+            cursor.last_run_id = last_run.id
+            cursor.last_run_ts = last_run.run_ts
+        db_session.add(cursor)
+        db_session.commit()
+
+
+def _get_last_finished_run(etl_runs: List[InternalPdtEtlRun]) -> Optional[InternalPdtEtlRun]:
+    """
+    Последний запуск, до которого включительно все запуски завершены
+    """
+    unfinished_ids = [
+        etl_run.id for etl_run in etl_runs if etl_run.result not in FINISHED_RUN_RESULTS
+    ]
+    finished_runs = [
+        etl_run
+        for etl_run in etl_runs
+        if etl_run.result in FINISHED_RUN_RESULTS
+        and (not unfinished_ids or etl_run.id < min(unfinished_ids))
+    ]
+    if not finished_runs:
+        return None
+
+    return max(finished_runs, key=lambda etl_run: etl_run.id)
+
+
+async def _apply_etl_runs_from_dev(
+    db_session: Session, last_runs_by_project: Dict[Tuple[int, str], InternalPdtEtlRun]
+) -> None:
+    projects_versions = _get_projects_versions(db_session, last_runs_by_project)
 
     logger.info(
         f"Projects versions for try updating status in dev: {[version.id for version in projects_versions]}, "
         f"with last runs: {last_runs_by_project}")
 
-    tasks_for_update = []
+    transitions = []
 
     for version in projects_versions:
         project_run = last_runs_by_project[(version.etl_project_id, version.version)]
 
         if version.status == EtlProjectStatus.DEVELOPING and project_run.result == "SUCCESS":
-            tasks_for_update.append(
-                data_storage.update_etl_project_status(
-                    db_session=db_session, etl_project_version=version, etl_run=project_run,
-                    status=EtlProjectStatus.TESTING, author_name=version.author_name)
-            )
+            transitions.append((version, project_run, EtlProjectStatus.TESTING))
 
-    await asyncio.gather(*tasks_for_update)
+    if transitions:
+        data_storage.update_etl_project_statuses(db_session, transitions)
 
-    used_cache.extend([etl_run.id for etl_run in last_runs_by_project.values()])
 
-
-async def _update_etl_projects_status_from_prod(db_session: Session, period: PeriodParams, used_cache: deque) -> None:
-    projects_versions, last_runs_by_project = await _get_last_etl_project_runs(
-        db_session, period, used_cache, settings.backend_uri_prod,
-    )
+async def _apply_etl_runs_from_prod(
+    db_session: Session, last_runs_by_project: Dict[Tuple[int, str], InternalPdtEtlRun]
+) -> None:
+    projects_versions = _get_projects_versions(db_session, last_runs_by_project)
 
     logger.info(
         f"Projects for try updating status in prod: {[version.id for version in projects_versions]}, "
         f"with last runs: {last_runs_by_project}")
 
-    tasks_for_update = []
+    transitions = []
 
     for version in projects_versions:
         project_run = last_runs_by_project[(version.etl_project_id, version.version)]
 
         if project_run.result == "FAIL" and version.status == EtlProjectStatus.PROD_REVIEW:
-            tasks_for_update.append(
-                data_storage.update_etl_project_status(
-                    db_session=db_session, etl_project_version=version, etl_run=project_run,
-                    status=EtlProjectStatus.PROD_RELEASE, author_name=version.author_name)
-            )
+            transitions.append((version, project_run, EtlProjectStatus.PROD_RELEASE))
         elif project_run.result == "SUCCESS" and version.status in [
             EtlProjectStatus.PROD_REVIEW, EtlProjectStatus.PROD_RELEASE
         ]:
-            tasks_for_update.append(
-                data_storage.update_etl_project_status(
-                    db_session=db_session, etl_project_version=version, etl_run=project_run,
-                    status=EtlProjectStatus.PRODUCTION, author_name=version.author_name)
-            )
-            tasks_for_update.append(
-                _turn_off_active_project_version(db_session=db_session, etl_project_version=version)
-            )
+            transitions.append((version, project_run, EtlProjectStatus.PRODUCTION))
 
-    await asyncio.gather(*tasks_for_update)
+    if not transitions:
+        return
 
-    used_cache.extend([etl_run.id for etl_run in last_runs_by_project.values()])
+    with HistoryRecorder.unit_of_work(db_session) as history:
+        data_storage.update_etl_project_statuses(db_session, transitions, history=history)
 
+        turned_off_versions = [
+            data_storage.turn_off_active_project_version(
+                db_session,
+                new_etl_version_id=version.id,
+                etl_project_id=version.etl_project_id,
+                author_name=version.author_name,
+                history=history,
+            )
+            for version, _, status in transitions
+            if status == EtlProjectStatus.PRODUCTION
+        ]
+
+    # Мониторинг отключается только после успешного коммита: при ошибке unit_of_work
+    # исключение выходит из блока выше и задачи не создаются
+    if settings.use_metric_manager:
+        for turned_off_version in turned_off_versions:
+            if turned_off_version:
+                # Monitoring disabling is optional process, so we don`t need to wait for the task to complete
+                asyncio.create_task(_disable_project_version_monitoring(turned_off_version))
 
-async def _get_last_etl_project_runs(db_session: Session, period: PeriodParams, used_cache: deque, backend_uri: str):
-    last_runs = await _get_last_etl_runs_from_backend_api(period, backend_uri)
-    ids_projects_for_update = [
-        (run.etl_project_id, run.etl_project_version) for run in last_runs
-        if run.etl_run.id not in used_cache
-    ]
 
-    last_runs_by_project = _to_dict_view(last_runs, ids_projects_for_update)
+def _get_projects_versions(
+    db_session: Session, last_runs_by_project: Dict[Tuple[int, str], InternalPdtEtlRun]
+) -> List[EtlProjectVersion]:
+    if not last_runs_by_project:
+        return []
 
-    projects_versions: List[EtlProjectVersion] = (
+    return (
         db_session.query(EtlProjectVersion)
         .options(joinedload(EtlProjectVersion.etl_project))
         .filter(
@@ -112,27 +243,46 @@ async def _get_last_etl_project_runs(db_session: Session, period: PeriodParams,
         .all()
     )
 
-    return projects_versions, last_runs_by_project
 
+def _dedupe_etl_runs(runs: List[LastRunsForEtlProject]) -> Dict[Tuple[int, str], InternalPdtEtlRun]:
+    """
+    Убирает повторно присланные запуски и оставляет по одному, самому позднему, запуску на версию ETL-проекта
+    """
+    seen_run_ids = set()
+    last_runs_by_project = {}
+
+    for run in runs:
+        if run.etl_run.id is not None:
+            if run.etl_run.id in seen_run_ids:
+                continue
+            seen_run_ids.add(run.etl_run.id)
 
-def _to_dict_view(runs: List[LastRunsForEtlProject], include: List[Tuple[int, str]]):
-    return {
-        (run.etl_project_id, run.etl_project_version): run.etl_run for run in runs
-        if (run.etl_project_id, run.etl_project_version) in include
-    }
+        version_identifier = (run.etl_project_id, run.etl_project_version)
+        last_run = last_runs_by_project.get(version_identifier)
 
+        if last_run is None or (run.etl_run.id or 0) >= (last_run.id or 0):
+            last_runs_by_project[version_identifier] = run.etl_run
 
-async def _get_last_etl_runs_from_backend_api(period: PeriodParams, backend_uri: str) -> List[LastRunsForEtlProject]:
+    return last_runs_by_project
+
+
+async def _get_last_etl_runs_from_backend_api(
+    period: PeriodParams, backend_uri: str, upstream: Upstream, since_run_id: Optional[int] = None
+) -> List[LastRunsForEtlProject]:
     url = join_urls(backend_uri, "internal", "etl", "get_last_etl_runs_for_projects")
+    params = {"period": period.value, "period_type": period.type.value}
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, params={"period": period.value, "period_type": period.type.value}) as response:
-            if not (200 <= response.status < 300):
-                logger.error(f"Bad response from backend uri {backend_uri}: {response.status}")
-                raise Exception(f"can not get etl runs from backend_api: {url}")
-            result = await response.json()
+    if since_run_id is not None:
+        params["since_run_id"] = since_run_id
+
+    session = http_clients.get(upstream)
+    async with session.get(url, params=params) as response:
+        if not (200 <= response.status < 300):
+            logger.error(f"Bad response from backend uri {backend_uri}: {response.status}")
+            raise Exception(f"can not get etl runs from backend_api: {url}")
+        result = await response.json()
 
-        last_runs = [LastRunsForEtlProject.parse_obj(run) for run in result]
+    last_runs = [LastRunsForEtlProject.parse_obj(run) for run in result]
 
     logger.info(f"last runs from backend_api: {backend_uri}: {result}")
 
@@ -145,15 +295,13 @@ async def _disable_project_version_monitoring(etl_project_version: EtlProjectVer
         "internal", "datamart", "monitoring", "disable",
     )
 
-    async with aiohttp.ClientSession() as session:
-        response = await session.post(
-            url,
-            json={
-                "general_etl_project_id": etl_project_version.etl_project_id,
-                "general_etl_project_version": etl_project_version.version,
-            },
-        )
-
+    async with http_clients.get(Upstream.METRIC_MANAGER).post(
+        url,
+        json={
+            "general_etl_project_id": etl_project_version.etl_project_id,
+            "general_etl_project_version": etl_project_version.version,
+        },
+    ) as response:
         if not (200 <= response.status < 300):
             response_text = await response.text()
             logger.error(
@@ -163,21 +311,3 @@ async def _disable_project_version_monitoring(etl_project_version: EtlProjectVer
             )
 
         return await response.json()
-
-
-async def _turn_off_active_project_version(
-    etl_project_version: EtlProjectVersion,
-    db_session: Session,
-):
-    turned_off_version: Optional[EtlProjectVersion] = data_storage.turn_off_active_project_version(
-        db_session,
-        new_etl_version_id=etl_project_version.id,
-        etl_project_id=etl_project_version.etl_project_id,
-        author_name=etl_project_version.author_name,
-    )
-    if not turned_off_version:
-        return None
-
-    if settings.use_metric_manager:
-        # Monitoring disabling is optional process, so we don`t need to wait for the task to complete
-        asyncio.create_task(_disable_project_version_monitoring(turned_off_version))
@@ -1,64 +1,498 @@
+import fcntl
+import hashlib
+import os
 import re
+import signal
+import subprocess
+import tarfile
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Union, Optional
+from tempfile import TemporaryDirectory
+from threading import Event, Timer
+from typing import Dict, Iterator, List, Optional
 
 from git import Repo
+from git.exc import GitCommandError
 
-from fs_general_api.config import GitConnProtocol
+from fs_general_api.config import GitCheckoutMode, GitConnProtocol, settings
+
+
+class GitTimeoutError(GitCommandError):
+    """
+    Команда git не завершилась за `git_timeout` секунд и была остановлена
+    """
+
+    def __init__(self, command: List[str], timeout: float):
+        super().__init__(
+            command, "timeout", f"git command timed out after {timeout} seconds"
+        )
+        self.timeout = timeout
+
+
+@dataclass
+class ProjectCheckout:
+    """
+    Выгруженная директория ETL-проекта и коммит, из которого она выгружена
+    """
+
+    path: Path
+    commit_sha: str
+
+
+@dataclass
+class ProjectsCheckout:
+    """
+    Директории нескольких ETL-проектов, выгруженные из одного коммита
+    """
+
+    root: Path
+    commit_sha: str
+
+    def project_path(self, project_name: str) -> Path:
+        return self.root / project_name
 
 
 class GitProjectClonerMixin:
+    # Префиксы, с которыми ветка может быть указана в запросе:
+    # `refs/remotes/origin/<ветка>` подходит для `git checkout` в полном клоне
+    BRANCH_REF_PREFIXES = ("refs/remotes/origin/", "refs/heads/")
+    # Credential helper, отдающий git логин и пароль из окружения процесса команды
+    CREDENTIAL_HELPER = (
+        '!f() { test "$1" = get || return 0; '
+        'echo "username=${FS_GIT_USERNAME}"; echo "password=${FS_GIT_PASSWORD}"; }; f'
+    )
+
     def __init__(
         self,
         git_conn_protocol: GitConnProtocol,
         git_username: str,
         git_password: str,
+        git_checkout_mode: Optional[GitCheckoutMode] = None,
     ):
         self.git_conn_protocol: GitConnProtocol = git_conn_protocol
         self.git_username: str = git_username
         self.git_password: str = git_password
+        self.git_checkout_mode: GitCheckoutMode = (
+            git_checkout_mode or settings.git_checkout_mode
+        )
+
+    @contextmanager
+    def _checkout_project(
+        self,
+        git_repo_url: str,
+        branch_name: str,
+        project_name: str,
+        paths: Optional[List[str]] = None,
+    ) -> Iterator[ProjectCheckout]:
+        """
+        Выгружает директорию ETL-проекта из ветки `branch_name` во временную директорию.
+        Директория удаляется при выходе из контекста.
+
+        Args:
+            paths: пути внутри директории проекта, которые нужны потребителю. В режиме
+                `GitCheckoutMode.SPARSE` выгружаются только они, в остальных режимах игнорируются
+        """
+        with self._checkout_projects(
+            git_repo_url=git_repo_url,
+            branch_name=branch_name,
+            project_names=[project_name],
+            paths=paths,
+        ) as checkout:
+            yield ProjectCheckout(
+                path=checkout.project_path(project_name),
+                commit_sha=checkout.commit_sha,
+            )
+
+    @contextmanager
+    def _checkout_projects(
+        self,
+        git_repo_url: str,
+        branch_name: str,
+        project_names: List[str],
+        paths: Optional[List[str]] = None,
+    ) -> Iterator[ProjectsCheckout]:
+        """
+        Выгружает директории нескольких ETL-проектов из ветки `branch_name` одним получением
+        исходного кода во временную директорию. Директория удаляется при выходе из контекста.
+
+        Args:
+            paths: пути внутри директорий проектов, которые нужны потребителю. В режиме
+                `GitCheckoutMode.SPARSE` выгружаются только они, в остальных режимах игнорируются
+        """
+        with TemporaryDirectory() as tempdir:
+            git_path = Path(tempdir)
+
+            if self.git_checkout_mode == GitCheckoutMode.MIRROR:
+                commit_sha = self._export_from_mirror(
+                    git_repo_url=git_repo_url,
+                    branch_name=branch_name,
+                    project_names=project_names,
+                    to_path=git_path,
+                )
+            elif self.git_checkout_mode == GitCheckoutMode.SPARSE:
+                commit_sha = self._sparse_clone_project(
+                    git_repo_url=git_repo_url,
+                    branch_name=branch_name,
+                    project_names=project_names,
+                    to_path=git_path,
+                    paths=paths,
+                )
+            else:
+                self._clone_project(
+                    project_path=git_path, git_repo_url=git_repo_url
+                )
+                self._run_git(["checkout", branch_name], cwd=git_path)
+                commit_sha = self._run_git(
+                    ["rev-parse", "HEAD"], cwd=git_path
+                ).strip()
+
+            yield ProjectsCheckout(root=git_path, commit_sha=commit_sha)
+
+    def _resolve_branch_sha(
+        self, git_repo_url: str, branch_name: str
+    ) -> Optional[str]:
+        """
+        Возвращает SHA последнего коммита ветки в удаленном репозитории (`git ls-remote`)
+        без загрузки объектов, или None, если ветки нет
+        """
+        self._check_credentials()
+        branch_name = self._get_remote_branch(branch_name)
+
+        output = self._run_remote_git(
+            [
+                "ls-remote",
+                self._build_repo_url(git_repo_url, self.git_conn_protocol),
+                f"refs/heads/{branch_name}",
+            ]
+        )
+        for line in output.splitlines():
+            commit_sha, ref = line.split()
+            if ref == f"refs/heads/{branch_name}":
+                return commit_sha
+
+        return None
 
     def _clone_project(self, project_path: Path, git_repo_url: str) -> Repo:
-        if (
-            self.git_conn_protocol == GitConnProtocol.HTTP
-            or self.git_conn_protocol == GitConnProtocol.HTTPS
-        ):
+        self._check_credentials()
+
+        project_path = Path(project_path).absolute()
+        self._run_remote_git(
+            [
+                "clone",
+                self._build_repo_url(git_repo_url, self.git_conn_protocol),
+                str(project_path),
+            ]
+        )
+        return Repo(project_path)
+
+    def _check_credentials(self) -> None:
+        if self._uses_credentials():
             if self.git_username is None or self.git_password is None:
                 raise ValueError(
                     f"settings git_username and git_password should be set"
                 )
 
-        return self._clone_repo_to_path(
-            to_path=project_path,
-            repo_url=git_repo_url,
-            conn_protocol=self.git_conn_protocol,
-            username=self.git_username,
-            password=self.git_password,
+    def _uses_credentials(self) -> bool:
+        return (
+            self.git_conn_protocol == GitConnProtocol.HTTP
+            or self.git_conn_protocol == GitConnProtocol.HTTPS
         )
 
     @staticmethod
-    def _clone_repo_to_path(
-        to_path: Union[str, Path],
-        repo_url: str,
-        conn_protocol: GitConnProtocol,
-        username: Optional[str] = None,
-        password: Optional[str] = None,
-    ) -> Repo:
+    def _build_repo_url(repo_url: str, conn_protocol: GitConnProtocol) -> str:
+        """
+        URL репозитория без учетных данных: он сохраняется в конфигурации клона или зеркала
+        """
         if (
             conn_protocol == GitConnProtocol.HTTP
             or conn_protocol == GitConnProtocol.HTTPS
         ):
-            assert username is not None
-            assert password is not None
-            password = re.escape(password)
-            repo_url = (
-                f"{conn_protocol.value}://{username}:{password}@{repo_url}"
-            )
+            return f"{conn_protocol.value}://{repo_url}"
         elif conn_protocol == GitConnProtocol.SSH:
-            repo_url = f"ssh://{repo_url}"
+            return f"ssh://{repo_url}"
         else:
             assert False
 
-        to_path = Path(to_path).absolute()
-        repo = Repo.clone_from(url=repo_url, to_path=to_path)
-        return repo
+    def _run_remote_git(self, args: List[str], cwd: Optional[Path] = None) -> str:
+        """
+        Выполняет команду git, которая обращается к удаленному репозиторию. Для HTTP(S)
+        логин и пароль передаются через `CREDENTIAL_HELPER` и окружение процесса,
+        поэтому не попадают ни в URL репозитория, ни в аргументы команды
+        """
+        if not self._uses_credentials():
+            return self._run_git(args, cwd=cwd)
+
+        return self._run_git(
+            [
+                "-c",
+                "credential.helper=",
+                "-c",
+                f"credential.helper={self.CREDENTIAL_HELPER}",
+                *args,
+            ],
+            cwd=cwd,
+            env={
+                "FS_GIT_USERNAME": self.git_username,
+                "FS_GIT_PASSWORD": self.git_password,
+            },
+        )
+
+    def _sparse_clone_project(
+        self,
+        git_repo_url: str,
+        branch_name: str,
+        project_names: List[str],
+        to_path: Path,
+        paths: Optional[List[str]] = None,
+    ) -> str:
+        """
+        Клонирует только последний коммит ветки `branch_name` без содержимого файлов
+        (partial clone) и выгружает в рабочую копию директории проектов или,
+        если заданы `paths`, только указанные пути внутри них.
+        Содержимое файлов дозагружается только для выгружаемых путей.
+        Возвращает SHA выгруженного коммита.
+        """
+        self._check_credentials()
+        branch_name = self._get_remote_branch(branch_name)
+
+        self._run_remote_git(
+            [
+                "clone",
+                "--filter=blob:none",
+                "--depth=1",
+                "--single-branch",
+                f"--branch={branch_name}",
+                "--no-checkout",
+                self._build_repo_url(git_repo_url, self.git_conn_protocol),
+                str(to_path),
+            ]
+        )
+
+        patterns = [
+            f"/{project_name}/{path.lstrip('/')}"
+            for project_name in project_names
+            for path in paths or [""]
+        ]
+        # Содержимое файлов дозагружается из удаленного репозитория при выгрузке
+        self._run_remote_git(
+            ["sparse-checkout", "set", "--no-cone", *patterns], cwd=to_path
+        )
+        self._run_remote_git(["checkout", branch_name], cwd=to_path)
+
+        return self._run_git(["rev-parse", "HEAD"], cwd=to_path).strip()
+
+    @classmethod
+    def _get_remote_branch(cls, branch_name: str) -> str:
+        """
+        Имя ветки в удаленном репозитории
+        """
+        for prefix in cls.BRANCH_REF_PREFIXES:
+            if branch_name.startswith(prefix):
+                return branch_name[len(prefix):]
+        return branch_name
+
+    @staticmethod
+    def _git_env(extra_env: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """
+        Окружение команд git: без интерактивных запросов учетных данных, с таймаутом
+        подключения по ssh и прерыванием передачи данных, скорость которой ниже
+        `git_low_speed_limit` байт/с дольше `git_low_speed_time` секунд
+        """
+        env = dict(os.environ)
+        env.update(
+            GIT_TERMINAL_PROMPT="0",
+            GCM_INTERACTIVE="never",
+            GIT_HTTP_LOW_SPEED_LIMIT=str(settings.git_low_speed_limit),
+            GIT_HTTP_LOW_SPEED_TIME=str(settings.git_low_speed_time),
+        )
+        env.setdefault(
+            "GIT_SSH_COMMAND",
+            "ssh -o BatchMode=yes"
+            f" -o ConnectTimeout={settings.git_connect_timeout}"
+            f" -o ServerAliveInterval={max(1, settings.git_low_speed_time // 3)}"
+            " -o ServerAliveCountMax=3",
+        )
+        env.update(extra_env or {})
+        return env
+
+    @staticmethod
+    def _kill_process_group(process: subprocess.Popen) -> None:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    @classmethod
+    @contextmanager
+    def _git_process(
+        cls,
+        args: List[str],
+        cwd: Optional[Path] = None,
+        timeout: Optional[float] = None,
+        env: Optional[Dict[str, str]] = None,
+    ) -> Iterator[subprocess.Popen]:
+        """
+        Запускает команду git в отдельной группе процессов. Если команда не завершилась
+        за `timeout` секунд (по умолчанию `git_timeout`), группа процессов (git и запущенные
+        им ssh, git-remote-https и т.д.) останавливается, а ошибка при работе
+        с процессом заменяется на `GitTimeoutError`.
+        """
+        timeout = settings.git_timeout if timeout is None else timeout
+        command = ["git", *args]
+        process = subprocess.Popen(
+            command,
+            cwd=cwd,
+            env=cls._git_env(env),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+
+        expired = Event()
+
+        def kill_expired() -> None:
+            if process.poll() is None:
+                expired.set()
+                cls._kill_process_group(process)
+
+        timer = Timer(timeout, kill_expired)
+        timer.daemon = True
+        timer.start()
+        try:
+            yield process
+        except Exception:
+            if expired.is_set():
+                raise GitTimeoutError(command, timeout) from None
+            raise
+        finally:
+            timer.cancel()
+            if process.poll() is None:
+                cls._kill_process_group(process)
+            process.wait()
+            for stream in (process.stdout, process.stderr):
+                stream.close()
+
+        if expired.is_set():
+            raise GitTimeoutError(command, timeout)
+
+    @classmethod
+    def _run_git(
+        cls,
+        args: List[str],
+        cwd: Optional[Path] = None,
+        timeout: Optional[float] = None,
+        env: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """
+        Выполняет команду git и возвращает ее stdout.
+        `env` дополняет окружение команды (`_git_env`)
+        """
+        with cls._git_process(args, cwd=cwd, timeout=timeout, env=env) as process:
+            stdout, stderr = process.communicate()
+            if process.returncode != 0:
+                raise GitCommandError(
+                    process.args, process.returncode, stderr, stdout
+                )
+
+        return stdout.decode()
+
+    @staticmethod
+    def _get_mirror_path(git_repo_url: str) -> Path:
+        repo_name = re.sub(r"[^\w.-]", "_", git_repo_url.rsplit("/", 1)[-1])
+        url_hash = hashlib.sha1(git_repo_url.encode()).hexdigest()[:12]
+
+        return Path(settings.git_mirror_cache_dir) / f"{repo_name}-{url_hash}"
+
+    @staticmethod
+    @contextmanager
+    def _mirror_lock(mirror_path: Path, exclusive: bool) -> Iterator[None]:
+        """
+        Межпроцессная блокировка зеркала: обновление зеркала - эксклюзивно,
+        чтение из него - совместно
+        """
+        mirror_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+
+        with open(f"{mirror_path}.lock", "w") as lock_file:
+            fcntl.flock(
+                lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            )
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _update_mirror(self, git_repo_url: str, branch_name: str) -> Path:
+        """
+        Создает локальное зеркало репозитория при первом обращении и дозагружает
+        в него ветку `branch_name`. Возвращает путь к зеркалу.
+        """
+        self._check_credentials()
+        branch_name = self._get_remote_branch(branch_name)
+        mirror_path = self._get_mirror_path(git_repo_url)
+
+        repo_url = self._build_repo_url(git_repo_url, self.git_conn_protocol)
+
+        with self._mirror_lock(mirror_path, exclusive=True):
+            if not (mirror_path / "HEAD").exists():
+                self._run_remote_git(
+                    ["clone", "--mirror", repo_url, str(mirror_path)]
+                )
+            else:
+                # Зеркала, созданные ранее, хранили URL с логином и паролем
+                self._run_git(
+                    ["remote", "set-url", "origin", repo_url], cwd=mirror_path
+                )
+                self._run_remote_git(
+                    [
+                        "fetch",
+                        "--prune",
+                        "origin",
+                        f"+refs/heads/{branch_name}:refs/heads/{branch_name}",
+                    ],
+                    cwd=mirror_path,
+                )
+
+        return mirror_path
+
+    def _export_from_mirror(
+        self,
+        git_repo_url: str,
+        branch_name: str,
+        project_names: List[str],
+        to_path: Path,
+    ) -> str:
+        """
+        Выгружает директории проектов из ветки зеркала в `to_path` одним `git archive`,
+        без рабочей копии всего репозитория. Директории, которых нет в ветке, не выгружаются.
+        Возвращает SHA выгруженного коммита.
+        """
+        mirror_path = self._update_mirror(git_repo_url, branch_name)
+
+        with self._mirror_lock(mirror_path, exclusive=False):
+            ref = f"refs/heads/{self._get_remote_branch(branch_name)}"
+            commit_sha = self._run_git(
+                ["rev-parse", "--verify", f"{ref}^{{commit}}"], cwd=mirror_path
+            ).strip()
+
+            existing_projects = self._run_git(
+                ["ls-tree", "-d", "--name-only", commit_sha, "--", *project_names],
+                cwd=mirror_path,
+            ).splitlines()
+
+            if not existing_projects:
+                return commit_sha
+
+            with self._git_process(
+                ["archive", "--format=tar", commit_sha, "--", *existing_projects],
+                cwd=mirror_path,
+            ) as process:
+                with tarfile.open(fileobj=process.stdout, mode="r|") as archive:
+                    archive.extractall(path=to_path)
+                process.stdout.close()
+                stderr = process.stderr.read()
+                if process.wait() != 0:
+                    raise GitCommandError(process.args, process.returncode, stderr)
+
+        return commit_sha
@@ -0,0 +1,23 @@
+from sqlalchemy.orm import Session
+from fastapi import FastAPI
+from fastapi_utils.tasks import repeat_every
+
+from fs_general_api.config import settings
+from fs_general_api.db import task_db_session
+from fs_general_api.outbox import outbox_dispatcher
+
+
+def setup_outbox_task(app: FastAPI):
+    @app.on_event("startup")
+    @repeat_every(
+        seconds=settings.outbox_dispatch_interval,
+        raise_exceptions=False,
+    )
+    @task_db_session
+    async def dispatch_outbox(db_session: Session):
+        # доставляем накопившиеся запросы пачками, пока они не закончатся
+        while (
+            await outbox_dispatcher.dispatch_pending(db_session)
+            == outbox_dispatcher.batch_size
+        ):
+            pass
@@ -0,0 +1,43 @@
+from typing import Dict, List, Type
+
+from fs_common_lib.fs_general_api.data_types import CheckType
+
+from fs_general_api.config import settings
+from fs_general_api.extra_processes.checker.check import (
+    CheckEventRequest,
+    CheckEventResponse,
+)
+from fs_general_api.extra_processes.synchronizer.definitions import (
+    SynchronizeEventRequest,
+    SynchronizeEventResponse,
+)
+from fs_general_api.job_queue import DbJobQueue, JobQueue, LocalJobQueue
+
+CHECKER_QUEUE = "checker"
+SYNCHRONIZER_QUEUE = "synchronizer"
+EVENTS_QUEUE = "events"
+
+QUEUE_ITEM_TYPES: Dict[str, List[Type]] = {
+    CHECKER_QUEUE: [CheckEventRequest],
+    SYNCHRONIZER_QUEUE: [SynchronizeEventRequest],
+    EVENTS_QUEUE: [CheckEventResponse, SynchronizeEventResponse],
+}
+
+# проверки перед переносом в production не должны ждать проверок разработчиков
+CHECK_PRIORITIES: Dict[CheckType, int] = {
+    CheckType.REVIEW: 10,
+}
+
+
+def get_check_priority(check_type: CheckType) -> int:
+    return CHECK_PRIORITIES.get(CheckType(check_type), 0)
+
+
+def create_job_queue(name: str) -> JobQueue:
+    if settings.use_db_job_queue:
+        return DbJobQueue(
+            name,
+            item_types=QUEUE_ITEM_TYPES[name],
+            fair=name == CHECKER_QUEUE and settings.checker_fair_by_hub,
+        )
+    return LocalJobQueue()
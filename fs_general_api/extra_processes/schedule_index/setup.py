@@ -0,0 +1,18 @@
+from sqlalchemy.orm import Session
+from fastapi import FastAPI
+from fastapi_utils.tasks import repeat_every
+
+from fs_general_api.config import settings
+from fs_general_api.db import task_db_session
+from fs_general_api.schedule_index import roll_schedule_index
+
+
+def setup_schedule_index_task(app: FastAPI):
+    @app.on_event("startup")
+    @repeat_every(
+        seconds=settings.schedule_index_refresh_timeout * 60,
+        raise_exceptions=False,
+    )
+    @task_db_session
+    def refresh_schedule_index(db_session: Session):
+        roll_schedule_index(db_session)
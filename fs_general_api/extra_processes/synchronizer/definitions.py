@@ -20,3 +20,5 @@ class SynchronizeEventResponse:
     synchronize_event_request: SynchronizeEventRequest
     schedule_interval: Optional[str] = None
     error_message: Optional[str] = None
+    checkout_mode: Optional[str] = None
+    checkout_seconds: Optional[float] = None
@@ -2,12 +2,13 @@ import os
 import re
 import time
 import traceback
-from multiprocessing import Process, Queue, Event
+from contextlib import ExitStack
+from multiprocessing import Process, Event
 from pathlib import Path
-from queue import Empty
-from tempfile import TemporaryDirectory
+from typing import List, Optional, Sequence
 
 import yaml
+from git.exc import GitCommandError
 
 from fs_general_api.extra_processes.synchronizer.exceptions import (
     ProjectScanSynchronizerError,
@@ -16,8 +17,13 @@ from fs_general_api.extra_processes.synchronizer.definitions import (
     SynchronizeEventRequest,
     SynchronizeEventResponse,
 )
+from fs_general_api.extra_processes.coalescing import (
+    coalesce_jobs,
+    group_by_branch,
+)
 from fs_general_api.extra_processes.mixins import GitProjectClonerMixin
-from fs_general_api.config import GitConnProtocol
+from fs_general_api.config import GitCheckoutMode, GitConnProtocol, settings
+from fs_general_api.job_queue import ClaimedJob, JobQueue
 
 
 class EtlProjectSynchronizer(GitProjectClonerMixin, Process):
@@ -27,6 +33,8 @@ class EtlProjectSynchronizer(GitProjectClonerMixin, Process):
     Синхронизация происходит между приоритетным расписанием указаным в `settings.yaml` и
     зафиксированным в таблицах `etl_projects` сервисов `fs_general_api` и `fs_backend_api`.
 
+    Ожидающие запросы разбираются пачками: повторные запросы одной версии проекта
+    выполняются один раз, а запросы к одной ветке репозитория - одним получением исходного кода.
     """
 
     SETTINGS_FILE_NAME = "settings.yaml"
@@ -39,72 +47,163 @@ class EtlProjectSynchronizer(GitProjectClonerMixin, Process):
 
     def __init__(
         self,
-        event_queue: Queue,
-        ctrl_queue: Queue,
+        event_queue: JobQueue,
+        ctrl_queue: JobQueue,
         ctrl_event: Event,
         git_conn_protocol: GitConnProtocol,
         git_username: str,
         git_password: str,
+        git_checkout_mode: Optional[GitCheckoutMode] = None,
+        queue_timeout: float = 1,
+        batch_size: int = settings.synchronizer_batch_size,
     ) -> None:
         Process.__init__(self)
         GitProjectClonerMixin.__init__(
-            self, git_conn_protocol, git_username, git_password
+            self,
+            git_conn_protocol,
+            git_username,
+            git_password,
+            git_checkout_mode,
         )
 
-        self.event_queue: Queue = event_queue
+        self.event_queue: JobQueue = event_queue
         self.ctrl_event: Event = ctrl_event
-        self.ctrl_queue: Queue = ctrl_queue
+        self.ctrl_queue: JobQueue = ctrl_queue
+        self.queue_timeout: float = queue_timeout
+        self.batch_size: int = max(1, batch_size)
 
     def run(self) -> None:
         while self.ctrl_event.is_set():
-            try:
-                synchronize_request: SynchronizeEventRequest = (
-                    self.event_queue.get_nowait()
-                )
-                self._process_synchronize(
-                    synchronize_request=synchronize_request
-                )
-            except Empty:
-                pass
+            for job in self.event_queue.reap_expired():
+                self._dead_letter(job, "превышено время выполнения")
+
+            jobs = self.event_queue.claim_batch(
+                self.batch_size, timeout=self.queue_timeout
+            )
+            if jobs:
+                self._process_jobs(jobs)
+
+    def _process_jobs(self, jobs: List[ClaimedJob]) -> None:
+        jobs, duplicates = coalesce_jobs(
+            jobs,
+            key=lambda request: (
+                request.etl_project_id,
+                request.etl_project_version,
+            ),
+        )
+        self.event_queue.complete(duplicates)
 
-            time.sleep(1)
+        for (branch_jobs,) in group_by_branch(jobs).values():
+            try:
+                with ExitStack() as stack:
+                    for job in branch_jobs:
+                        stack.enter_context(self.event_queue.lease(job))
+                    self._process_synchronize(
+                        [job.item for job in branch_jobs]
+                    )
+                self.event_queue.complete(branch_jobs)
+            except Exception as exc:
+                for job in branch_jobs:
+                    if self.event_queue.fail(job, str(exc)):
+                        self._dead_letter(
+                            job, f"{exc}\n{traceback.format_exc()}"
+                        )
+
+    def _dead_letter(self, job: ClaimedJob, reason: str) -> None:
+        self.ctrl_queue.put(self.dead_letter_response(job, reason))
+
+    @staticmethod
+    def dead_letter_response(
+        job: ClaimedJob, reason: str
+    ) -> SynchronizeEventResponse:
+        synchronize_request: SynchronizeEventRequest = job.item
+        return SynchronizeEventResponse(
+            synchronize_event_request=synchronize_request,
+            error_message=f"Synchronization failed after {job.attempts} attempts: {reason} "
+            f"for ETL-project with id={synchronize_request.etl_project_id}",
+        )
 
     def _process_synchronize(
-        self, synchronize_request: SynchronizeEventRequest
+        self, synchronize_requests: Sequence[SynchronizeEventRequest]
     ) -> None:
-        synchronize_result = SynchronizeEventResponse(
-            synchronize_event_request=synchronize_request
-        )
+        """
+        Синхронизирует расписание проектов одной ветки репозитория
+        """
+        first_request = synchronize_requests[0]
+        responses = []
 
         try:
-            with TemporaryDirectory() as tempdir:
-                git_path = Path(tempdir)
-                project_path = git_path / synchronize_request.etl_project_name
-
-                repo = self._clone_project(
-                    project_path=git_path,
-                    git_repo_url=synchronize_request.git_repo,
-                )
-                repo.git.checkout(synchronize_request.branch_name)
-
-                schedule_interval = self._scan_project_for_schedule_interval(
-                    project_path=project_path
+            started = time.perf_counter()
+            # для синхронизации расписания достаточно settings.yaml
+            with self._checkout_projects(
+                git_repo_url=first_request.git_repo,
+                branch_name=first_request.branch_name,
+                project_names=sorted(
+                    {request.etl_project_name for request in synchronize_requests}
+                ),
+                paths=[self.SETTINGS_FILE_NAME],
+            ) as checkout:
+                checkout_seconds: Optional[float] = time.perf_counter() - started
+                for request in synchronize_requests:
+                    response = self.synchronize_project(
+                        synchronize_request=request,
+                        project_path=checkout.project_path(
+                            request.etl_project_name
+                        ),
+                    )
+                    response.checkout_mode = self.git_checkout_mode.value
+                    # время общего получения исходного кода учитывается один раз
+                    response.checkout_seconds = checkout_seconds
+                    checkout_seconds = None
+                    responses.append(response)
+
+        except GitCommandError:
+            # ошибка git возвращает задания в очередь для повтора
+            raise
+        except Exception as exc:
+            responses = [
+                SynchronizeEventResponse(
+                    synchronize_event_request=request,
+                    error_message=f"{exc} for ETL-project with id={request.etl_project_id}\n{traceback.format_exc()}",
+                    checkout_mode=self.git_checkout_mode.value,
                 )
-
+                for request in synchronize_requests
+            ]
+
+        for response in responses:
+            self.ctrl_queue.put(response)
+
+    @classmethod
+    def synchronize_project(
+        cls, synchronize_request: SynchronizeEventRequest, project_path: Path
+    ) -> SynchronizeEventResponse:
+        """
+        Определяет расписание проекта по выгруженной директории проекта
+        """
+        try:
+            schedule_interval = cls._scan_project_for_schedule_interval(
+                project_path=project_path
+            )
         except Exception as exc:
-            synchronize_result.error_message = f"{exc} for ETL-project with id={synchronize_request.etl_project_id}\n{traceback.format_exc()}"
-            self.ctrl_queue.put(synchronize_result)
-
-        else:
-            synchronize_result.schedule_interval = schedule_interval
-            self.ctrl_queue.put(synchronize_result)
+            return SynchronizeEventResponse(
+                synchronize_event_request=synchronize_request,
+                error_message=f"{exc} for ETL-project with id={synchronize_request.etl_project_id}\n{traceback.format_exc()}",
+            )
+
+        return SynchronizeEventResponse(
+            synchronize_event_request=synchronize_request,
+            schedule_interval=schedule_interval,
+        )
 
-    def _scan_project_for_schedule_interval(self, project_path: Path) -> str:
-        if self.SETTINGS_FILE_NAME not in os.listdir(project_path):
+    @classmethod
+    def _scan_project_for_schedule_interval(cls, project_path: Path) -> str:
+        if not project_path.is_dir() or cls.SETTINGS_FILE_NAME not in os.listdir(
+            project_path
+        ):
             raise ProjectScanSynchronizerError
 
         with open(
-            os.path.join(project_path, self.SETTINGS_FILE_NAME), "r"
+            os.path.join(project_path, cls.SETTINGS_FILE_NAME), "r"
         ) as f:
             try:
                 settings_mapping = yaml.safe_load(f)
@@ -115,7 +214,7 @@ class EtlProjectSynchronizer(GitProjectClonerMixin, Process):
             "schedule_interval", ""
         )
 
-        if not re.search(self.CRON_EXPRESSION_PATTERN, schedule_interval):
+        if not re.search(cls.CRON_EXPRESSION_PATTERN, schedule_interval):
             raise ProjectScanSynchronizerError
 
         return schedule_interval
@@ -0,0 +1,85 @@
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from fs_common_lib.fs_general_api.data_types import EtlProjectStatus
+from fs_db.db_classes_general import EtlProjectVersion, HistoryEvent
+from sqlalchemy import inspect, insert
+from sqlalchemy.orm import Session
+
+STATUS_CHANGE_EVENT_NAME = "Изменение статуса"
+
+
+class HistoryRecorder:
+    """
+    Накапливает события истории ETL-проектов в рамках одного действия (запроса, цикла опроса)
+    и записывает их одним многострочным INSERT в транзакции вызывающего кода.
+    """
+
+    def __init__(self):
+        self._events: List[Dict[str, Any]] = []
+        self._columns: Dict[str, str] = {
+            attr.key: attr.columns[0].key
+            for attr in inspect(HistoryEvent).column_attrs
+        }
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def add(
+        self,
+        name: str,
+        etl_project_version_id: int,
+        author_name: Optional[str] = None,
+        old_value: Optional[str] = None,
+        new_value: Optional[str] = None,
+        extra_data: Optional[List] = None,
+    ) -> None:
+        self._events.append(
+            {
+                self._columns["name"]: name,
+                self._columns["etl_project_version_id"]: etl_project_version_id,
+                self._columns["author"]: author_name,
+                self._columns["old_value"]: old_value,
+                self._columns["new_value"]: new_value,
+                self._columns["extra_data"]: extra_data,
+            }
+        )
+
+    def add_status_change(
+        self,
+        etl_project_version: EtlProjectVersion,
+        status: EtlProjectStatus,
+        author_name: Optional[str] = None,
+    ) -> None:
+        self.add(
+            name=STATUS_CHANGE_EVENT_NAME,
+            etl_project_version_id=etl_project_version.id,
+            old_value=etl_project_version.status.value,
+            new_value=status.value,
+            author_name=author_name,
+        )
+
+    def flush(self, db_session: Session) -> int:
+        """
+        Записывает накопленные события и возвращает их количество. Транзакцию не фиксирует.
+        """
+        events, self._events = self._events, []
+
+        if events:
+            db_session.execute(insert(HistoryEvent.__table__).values(events))
+
+        return len(events)
+
+    @classmethod
+    @contextmanager
+    def unit_of_work(cls, db_session: Session) -> Iterator["HistoryRecorder"]:
+        """
+        Открывает единицу работы: изменения в сессии и накопленные события истории
+        фиксируются одним коммитом при выходе из блока, при ошибке откатываются.
+        """
+        history = cls()
+
+        with db_session.begin_nested():
+            yield history
+            history.flush(db_session)
+            db_session.commit()
@@ -0,0 +1,111 @@
+import asyncio
+import enum
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from fs_general_api.config import settings
+
+
+class Upstream(enum.Enum):
+    BACKEND_DEV = "backend_dev"
+    BACKEND_PROD = "backend_prod"
+    GIT_MANAGER = "git_manager"
+    METRIC_MANAGER = "metric_manager"
+    BACKEND_PROXY = "backend_proxy"
+
+
+class HttpClientRegistry:
+    """
+    Реестр HTTP-клиентов с временем жизни приложения.
+
+    На каждый upstream-сервис создается одна `aiohttp.ClientSession` с собственным
+    пулом keep-alive соединений и DNS-кэшем, поэтому исходящие запросы не платят
+    за новое TCP/TLS-соединение и резолв имени на каждый вызов.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[
+            Upstream, Tuple[asyncio.AbstractEventLoop, aiohttp.ClientSession]
+        ] = {}
+        # сессии, созданные в другом event loop, который сейчас не выполняется:
+        # закрываются в `close`
+        self._stale_sessions: List[aiohttp.ClientSession] = []
+
+    @staticmethod
+    def _create_session() -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=settings.http_pool_limit,
+            limit_per_host=settings.http_pool_limit_per_host,
+            keepalive_timeout=settings.http_keepalive_timeout,
+            ttl_dns_cache=settings.http_dns_cache_ttl,
+            use_dns_cache=True,
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=settings.http_request_timeout),
+        )
+
+    async def start(self) -> None:
+        for upstream in Upstream:
+            self.get(upstream)
+
+    async def close(self) -> None:
+        sessions, self._sessions = self._sessions, {}
+        stale_sessions, self._stale_sessions = self._stale_sessions, []
+
+        for _, session in sessions.values():
+            await session.close()
+
+        for session in stale_sessions:
+            try:
+                await session.close()
+            except RuntimeError:
+                # event loop сессии уже закрыт, ее соединения закрыты вместе с ним
+                pass
+
+    def _discard_session(
+        self, session_loop: asyncio.AbstractEventLoop, session: aiohttp.ClientSession
+    ) -> None:
+        """
+        Закрывает сессию, созданную в другом event loop: в ее собственном loop, если он
+        выполняется, иначе - при закрытии реестра
+        """
+        if session.closed:
+            return
+
+        if session_loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), session_loop)
+        else:
+            self._stale_sessions.append(session)
+
+    def get(self, upstream: Upstream) -> aiohttp.ClientSession:
+        """
+        Возвращает сессию для upstream-сервиса.
+
+        Сессия привязана к event loop, в котором была создана, поэтому при обращении
+        из другого loop (например, вне startup/shutdown хуков приложения) она
+        пересоздается, а прежняя сессия закрывается.
+        """
+        loop = asyncio.get_running_loop()
+        loop_session: Optional[
+            Tuple[asyncio.AbstractEventLoop, aiohttp.ClientSession]
+        ] = self._sessions.get(upstream)
+
+        if loop_session is not None:
+            session_loop, session = loop_session
+            if session_loop is loop and not session.closed:
+                return session
+            if session_loop is not loop:
+                self._discard_session(session_loop, session)
+
+        session = self._create_session()
+        self._sessions[upstream] = (loop, session)
+        return session
+
+
+http_clients = HttpClientRegistry()
+
+
+def get_http_clients() -> HttpClientRegistry:
+    return http_clients
@@ -0,0 +1,716 @@
+"""
+Очереди заданий для фоновых обработчиков (проверки и синхронизация ETL-проектов, обработка их результатов).
+
+`LocalJobQueue` - очередь `multiprocessing.Queue` внутри одного пода: задания теряются при его
+перезапуске, приоритеты и замена заданий поддерживаются, справедливая очередь - нет. `DbJobQueue` хранит задания в таблице `jobs`, поэтому они переживают перезапуск,
+а обработчики могут работать в отдельных подах (`python -m fs_general_api.worker`).
+Способ выбирается настройкой `use_db_job_queue`.
+
+Задания - dataclass-ы, в БД они сохраняются в JSON (`encode_item`/`decode_item`).
+"""
+import dataclasses
+import enum
+import hashlib
+import os
+import socket
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from multiprocessing import Array, Queue, Value
+from queue import Empty
+from threading import Event, Thread
+from typing import (
+    Any,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Type,
+    Union,
+    get_type_hints,
+)
+
+from fs_common_lib.fs_logger.fs_logger import FsLoggerHandler
+from sqlalchemy import and_, delete, func, or_, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from fs_general_api.config import settings
+from fs_general_api.db import db
+from fs_general_api.db_classes import Job, JobStatus
+from fs_general_api.metrics import metrics
+from fs_general_api.notifications import PgListener, notify
+
+logger = FsLoggerHandler(
+    __name__,
+    level=settings.log_level,
+    log_format=settings.log_format,
+    datefmt=settings.datefmt,
+).get_logger()
+
+
+class JobDecodeError(ValueError):
+    pass
+
+
+def _to_json(value: Any) -> Any:
+    if dataclasses.is_dataclass(value):
+        return {
+            field.name: _to_json(getattr(value, field.name))
+            for field in dataclasses.fields(value)
+        }
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _to_json(item) for key, item in value.items()}
+    return value
+
+
+def _from_json(tp: Any, value: Any) -> Any:
+    if value is None:
+        return None
+
+    origin = getattr(tp, "__origin__", None)
+    if origin is Union:
+        # Optional[X]: берем первый подходящий тип
+        for arg in tp.__args__:
+            if arg is type(None):
+                continue
+            try:
+                return _from_json(arg, value)
+            except (TypeError, ValueError, KeyError):
+                continue
+        return value
+    if origin in (list, List):
+        (item_tp,) = tp.__args__
+        return [_from_json(item_tp, item) for item in value]
+    if origin in (dict, Dict):
+        _, item_tp = tp.__args__
+        return {key: _from_json(item_tp, item) for key, item in value.items()}
+    if isinstance(tp, type) and dataclasses.is_dataclass(tp):
+        hints = get_type_hints(tp)
+        return tp(
+            **{
+                field.name: _from_json(hints[field.name], value[field.name])
+                for field in dataclasses.fields(tp)
+                if field.name in value
+            }
+        )
+    if isinstance(tp, type) and issubclass(tp, enum.Enum):
+        return tp(value)
+    if tp is datetime:
+        return datetime.fromisoformat(value)
+    return value
+
+
+def encode_item(item: Any) -> Dict[str, Any]:
+    return {"type": type(item).__name__, "data": _to_json(item)}
+
+
+def decode_item(payload: Dict[str, Any], item_types: Sequence[Type]) -> Any:
+    types = {item_type.__name__: item_type for item_type in item_types}
+    item_type = types.get(payload.get("type"))
+    if item_type is None:
+        raise JobDecodeError(f"Unknown job type `{payload.get('type')}`")
+
+    try:
+        return _from_json(item_type, payload["data"])
+    except (TypeError, ValueError, KeyError) as e:
+        raise JobDecodeError(
+            f"Cant decode job of type `{item_type.__name__}`: {e}"
+        ) from e
+
+
+@dataclass
+class ClaimedJob:
+    item: Any
+    id: Optional[int] = None
+    attempts: int = 1
+
+
+class JobQueue(ABC):
+    """
+    Очередь заданий: задание выдается обработчику (`claim`), который сообщает
+    о его выполнении (`complete`) или ошибке (`fail`).
+    """
+
+    @abstractmethod
+    def put(
+        self,
+        item: Any,
+        priority: int = 0,
+        fairness_key: Optional[str] = None,
+        supersede_key: Optional[str] = None,
+    ) -> None:
+        """
+        Args:
+            priority: задания с большим приоритетом выдаются раньше
+            fairness_key: ключ справедливой очереди (например, хаб): задания одного приоритета
+                с разными ключами выдаются по очереди
+            supersede_key: ожидающие задания с тем же ключом удаляются из очереди -
+                новое задание их заменяет
+        """
+
+    @abstractmethod
+    def claim_batch(self, limit: int, timeout: float) -> List[ClaimedJob]:
+        """
+        Ждет задания не дольше `timeout` секунд и выдает до `limit` заданий
+        """
+
+    def claim(self, timeout: float) -> Optional[ClaimedJob]:
+        jobs = self.claim_batch(1, timeout)
+        return jobs[0] if jobs else None
+
+    def complete(
+        self, jobs: Sequence[ClaimedJob], db_session: Optional[Session] = None
+    ) -> None:
+        """
+        Отмечает задания выполненными. Если передана сессия, изменение выполняется в ее
+        транзакции, без фиксации.
+        """
+        # очередь, не хранящая выданные задания (например, `LocalJobQueue`), отмечать нечего
+        return None
+
+    def fail(self, job: ClaimedJob, error: str) -> bool:
+        """
+        Возвращает задание в очередь для повтора.
+        Возвращает True, если попытки исчерпаны и задание больше не будет выдано.
+        """
+        return True
+
+    def reap_expired(self) -> List[ClaimedJob]:
+        """
+        Возвращает задания, обработчики которых не уложились в аренду за все попытки
+        """
+        return []
+
+    @contextmanager
+    def lease(self, job: ClaimedJob) -> Iterator[None]:
+        """
+        Продлевает аренду задания, пока оно выполняется
+        """
+        yield
+
+    @abstractmethod
+    def qsize(self) -> Optional[int]:
+        ...
+
+
+@dataclass
+class _LocalJob:
+    """
+    Задание `LocalJobQueue`, которое может быть заменено более новым (`supersede_key`)
+    """
+
+    item: Any
+    supersede_hash: int
+    seq: int
+
+
+class LocalJobQueue(JobQueue):
+    """
+    Очередь внутри пода. Выданное задание считается выполненным, повторов нет.
+
+    Задания с приоритетом больше 0 кладутся в отдельную очередь, которая разбирается первой,
+    а в основную очередь добавляется пустая отметка, чтобы разбудить ожидающий обработчик.
+    Замена заданий (`supersede_key`) учитывается в общей для процессов таблице: для ключа
+    хранится номер последнего добавленного задания, более ранние задания с этим ключом
+    пропускаются при выдаче. Таблица фиксированного размера, поэтому при совпадении ячейки
+    у разных ключей замена может не сработать - задание тогда просто выполнится.
+    Справедливая очередь (`fairness_key`) не поддерживается.
+    """
+
+    SUPERSEDE_SLOTS = 4096
+
+    def __init__(
+        self, queue: Optional[Queue] = None, priority_queue: Optional[Queue] = None
+    ):
+        self.queue = queue if queue is not None else Queue()
+        self.priority_queue = priority_queue if priority_queue is not None else Queue()
+        self._seq = Value("q", 0)
+        self._supersede_hashes = Array("Q", self.SUPERSEDE_SLOTS, lock=False)
+        self._supersede_seqs = Array("q", self.SUPERSEDE_SLOTS, lock=False)
+
+    @staticmethod
+    def _hash_key(supersede_key: str) -> int:
+        # hash() строк отличается в разных процессах
+        return int.from_bytes(
+            hashlib.blake2b(supersede_key.encode(), digest_size=8).digest(), "big"
+        )
+
+    def put(
+        self,
+        item: Any,
+        priority: int = 0,
+        fairness_key: Optional[str] = None,
+        supersede_key: Optional[str] = None,
+    ) -> None:
+        if supersede_key is not None:
+            supersede_hash = self._hash_key(supersede_key)
+            slot = supersede_hash % self.SUPERSEDE_SLOTS
+            with self._seq.get_lock():
+                self._seq.value += 1
+                item = _LocalJob(item, supersede_hash, self._seq.value)
+                self._supersede_hashes[slot] = supersede_hash
+                self._supersede_seqs[slot] = item.seq
+
+        if priority > 0:
+            self.priority_queue.put(item)
+            self.queue.put(None)
+        else:
+            self.queue.put(item)
+
+    def _is_superseded(self, job: _LocalJob) -> bool:
+        slot = job.supersede_hash % self.SUPERSEDE_SLOTS
+        with self._seq.get_lock():
+            return (
+                self._supersede_hashes[slot] == job.supersede_hash
+                and self._supersede_seqs[slot] != job.seq
+            )
+
+    def _accept(self, entry: Any, jobs: List[ClaimedJob]) -> None:
+        if entry is None:
+            # отметка о задании с приоритетом, само задание берется из `priority_queue`
+            return
+        if isinstance(entry, _LocalJob):
+            if self._is_superseded(entry):
+                return
+            entry = entry.item
+        jobs.append(ClaimedJob(item=entry))
+
+    def _drain(self, queue: Queue, jobs: List[ClaimedJob], limit: int) -> None:
+        while len(jobs) < limit:
+            try:
+                self._accept(queue.get_nowait(), jobs)
+            except Empty:
+                break
+
+    def claim_batch(self, limit: int, timeout: float) -> List[ClaimedJob]:
+        deadline = time.monotonic() + timeout
+        jobs: List[ClaimedJob] = []
+        while True:
+            self._drain(self.priority_queue, jobs, limit)
+            self._drain(self.queue, jobs, limit)
+            remaining = deadline - time.monotonic()
+            if jobs or remaining <= 0:
+                return jobs
+
+            try:
+                self._accept(self.queue.get(timeout=remaining), jobs)
+            except Empty:
+                return jobs
+
+    def qsize(self) -> Optional[int]:
+        try:
+            # приблизительно: отметки о заданиях с приоритетом учитываются вместо самих заданий
+            return self.queue.qsize()
+        except NotImplementedError:
+            # multiprocessing.Queue.qsize не поддерживается на macOS
+            return None
+
+
+class DbJobQueue(JobQueue):
+    """
+    Очередь в таблице `jobs`.
+
+    Args:
+        name: имя очереди
+        item_types: типы заданий очереди (dataclass-ы)
+        lease_timeout: время аренды задания в секундах
+        max_attempts: количество попыток выполнения задания
+        poll_interval: период опроса таблицы при ожидании заданий
+        use_notify: будить обработчики уведомлениями (LISTEN/NOTIFY) о новых заданиях.
+            Таблица при этом опрашивается только раз в `notify_fallback_interval`, чтобы выдать
+            задания, отложенные после ошибки или с истекшей арендой
+        notify_fallback_interval: период опроса таблицы при получении уведомлений
+        fair: выдавать задания одного приоритета с разными `fairness_key` по очереди,
+            а не в порядке добавления
+    """
+
+    def __init__(
+        self,
+        name: str,
+        item_types: Sequence[Type],
+        lease_timeout: float = settings.job_lease_timeout,
+        max_attempts: int = settings.job_max_attempts,
+        poll_interval: float = settings.job_poll_interval,
+        use_notify: bool = settings.job_notify,
+        notify_fallback_interval: float = settings.job_notify_fallback_interval,
+        fair: bool = False,
+    ):
+        self.name = name
+        self.item_types = list(item_types)
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.notify_fallback_interval = notify_fallback_interval
+        self.fair = fair
+        self.listener = PgListener([self.channel]) if use_notify else None
+        self._next_poll = 0.0
+        self._next_reap = 0.0
+
+    @property
+    def channel(self) -> str:
+        return f"jobs_{self.name}"
+
+    @property
+    def worker_id(self) -> str:
+        # очередь создается до запуска процессов обработчиков, поэтому pid берется при обращении
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    @staticmethod
+    @contextmanager
+    def _session() -> Iterator[Session]:
+        db_session_gen: Generator[Session, None, None] = db.get_session()
+        try:
+            yield next(db_session_gen)
+        finally:
+            next(db_session_gen, None)
+
+    def _lease_until(self):
+        return func.now() + timedelta(seconds=self.lease_timeout)
+
+    def _owned(self, jobs: Sequence[ClaimedJob]):
+        """
+        Условие на задания, которые все еще выполняет этот обработчик: если аренда истекла
+        и задание выдано повторно, номер попытки или обработчик уже другие
+        """
+        return and_(
+            tuple_(Job.id, Job.attempts).in_([(job.id, job.attempts) for job in jobs]),
+            Job.status == JobStatus.RUNNING.value,
+            Job.locked_by == self.worker_id,
+        )
+
+    def put(
+        self,
+        item: Any,
+        priority: int = 0,
+        fairness_key: Optional[str] = None,
+        supersede_key: Optional[str] = None,
+    ) -> None:
+        with self._session() as session:
+            superseded = 0
+            if supersede_key is not None:
+                superseded = session.execute(
+                    delete(Job)
+                    .where(
+                        Job.queue == self.name,
+                        Job.supersede_key == supersede_key,
+                        Job.status == JobStatus.PENDING.value,
+                    )
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+
+            session.add(
+                Job(
+                    queue=self.name,
+                    payload=encode_item(item),
+                    status=JobStatus.PENDING.value,
+                    attempts=0,
+                    priority=priority,
+                    fairness_key=fairness_key,
+                    supersede_key=supersede_key,
+                )
+            )
+            notify(session, self.channel)
+            session.commit()
+
+        metrics.inc(f"jobs_{self.name}_put")
+        if superseded:
+            metrics.inc(f"jobs_{self.name}_superseded", superseded)
+
+    def claim_batch(self, limit: int, timeout: float) -> List[ClaimedJob]:
+        deadline = time.monotonic() + timeout
+
+        while True:
+            # подписка оформляется до запроса, чтобы не пропустить задания, добавленные между ними
+            listening = self.listener is not None and self.listener.listen()
+            poll_interval = (
+                self.notify_fallback_interval if listening else self.poll_interval
+            )
+
+            # уведомления проверяются и без ожидания: очередь, которую опрашивают с timeout=0
+            # (например, синхронизации в обработчике проверок), не ждет периода опроса
+            if (
+                listening
+                and time.monotonic() < self._next_poll
+                and self.listener.wait(0)
+            ):
+                self._next_poll = 0.0
+
+            if time.monotonic() >= self._next_poll:
+                jobs = self._claim(limit)
+                # выданы не все готовые задания - следующий вызов сразу запрашивает остальные
+                self._next_poll = (
+                    0.0
+                    if len(jobs) >= limit
+                    else time.monotonic() + poll_interval
+                )
+                if jobs:
+                    return jobs
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+
+            wait = max(min(self._next_poll - time.monotonic(), remaining), 0)
+            if listening:
+                if self.listener.wait(wait):
+                    self._next_poll = 0.0
+            else:
+                time.sleep(wait)
+
+    def _claim(self, limit: int) -> List[ClaimedJob]:
+        """
+        Выдает задания, время выполнения которых наступило, и задания, аренда которых истекла
+        (обработчик завис или завершился), если у них остались попытки
+        """
+        conditions = (
+            Job.queue == self.name,
+            or_(
+                and_(
+                    Job.status == JobStatus.PENDING.value,
+                    Job.available_at <= func.now(),
+                ),
+                and_(
+                    Job.status == JobStatus.RUNNING.value,
+                    Job.lease_expires_at < func.now(),
+                    Job.attempts < self.max_attempts,
+                ),
+            ),
+        )
+
+        if self.fair:
+            # номер задания среди заданий того же приоритета и ключа: сначала выдаются
+            # первые задания каждого ключа, затем вторые и т.д.
+            # Блокировки несовместимы с оконными функциями, поэтому нумерация - в подзапросе
+            ranked = (
+                select(
+                    Job.id,
+                    Job.priority,
+                    func.row_number()
+                    .over(
+                        partition_by=(
+                            Job.priority,
+                            func.coalesce(Job.fairness_key, ""),
+                        ),
+                        order_by=Job.id,
+                    )
+                    .label("fair_rank"),
+                )
+                .where(*conditions)
+                .subquery()
+            )
+            claimable = (
+                select(Job.id)
+                .join(ranked, ranked.c.id == Job.id)
+                .order_by(ranked.c.priority.desc(), ranked.c.fair_rank, Job.id)
+                .limit(limit)
+                .with_for_update(of=Job, skip_locked=True)
+            )
+        else:
+            claimable = (
+                select(Job.id)
+                .where(*conditions)
+                .order_by(Job.priority.desc(), Job.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+
+        with self._session() as session:
+            rows = session.execute(
+                update(Job)
+                .where(Job.id.in_(claimable.scalar_subquery()))
+                .values(
+                    status=JobStatus.RUNNING.value,
+                    attempts=Job.attempts + 1,
+                    lease_expires_at=self._lease_until(),
+                    locked_by=self.worker_id,
+                )
+                .returning(Job.id, Job.payload, Job.attempts, Job.priority)
+                .execution_options(synchronize_session=False)
+            ).all()
+            session.commit()
+
+        jobs = []
+        for job_id, payload, attempts, _ in sorted(
+            rows, key=lambda row: (-row.priority, row.id)
+        ):
+            try:
+                item = decode_item(payload, self.item_types)
+            except JobDecodeError as e:
+                logger.error(f"Job {job_id} in queue `{self.name}` is dead: {e}")
+                self._set_dead(ClaimedJob(item=None, id=job_id, attempts=attempts), str(e))
+                continue
+            jobs.append(ClaimedJob(item=item, id=job_id, attempts=attempts))
+
+        if jobs:
+            metrics.inc(f"jobs_{self.name}_claimed", len(jobs))
+        return jobs
+
+    def complete(
+        self, jobs: Sequence[ClaimedJob], db_session: Optional[Session] = None
+    ) -> None:
+        if not jobs:
+            return
+
+        statement = delete(Job).where(self._owned(jobs))
+        if db_session is not None:
+            completed = db_session.execute(statement).rowcount
+        else:
+            with self._session() as session:
+                completed = session.execute(statement).rowcount
+                session.commit()
+
+        if completed < len(jobs):
+            logger.warning(
+                f"{len(jobs) - completed} jobs in queue `{self.name}` were not completed: "
+                f"their leases expired and they were claimed again"
+            )
+        metrics.inc(f"jobs_{self.name}_completed", completed)
+
+    def fail(self, job: ClaimedJob, error: str) -> bool:
+        if job.attempts >= self.max_attempts:
+            if not self._set_dead(job, error):
+                return False
+            logger.error(
+                f"Job {job.id} in queue `{self.name}` is dead after {job.attempts} attempts: {error}"
+            )
+            return True
+
+        delay = settings.job_backoff_base * 2 ** (job.attempts - 1)
+        with self._session() as session:
+            retried = session.execute(
+                update(Job)
+                .where(self._owned([job]))
+                .values(
+                    status=JobStatus.PENDING.value,
+                    available_at=func.now() + timedelta(seconds=delay),
+                    lease_expires_at=None,
+                    locked_by=None,
+                    last_error=error,
+                )
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            session.commit()
+
+        if retried:
+            metrics.inc(f"jobs_{self.name}_retried")
+        else:
+            logger.warning(
+                f"Job {job.id} in queue `{self.name}` was not retried: its lease expired and it was claimed again"
+            )
+        return False
+
+    def _set_dead(self, job: ClaimedJob, error: str) -> bool:
+        """
+        Отмечает задание, которое выполняет этот обработчик, как недоставленное.
+        Возвращает False, если задание уже выдано другому обработчику
+        """
+        with self._session() as session:
+            dead = session.execute(
+                update(Job)
+                .where(self._owned([job]))
+                .values(
+                    status=JobStatus.DEAD.value,
+                    lease_expires_at=None,
+                    last_error=error,
+                )
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            session.commit()
+
+        if dead:
+            metrics.inc(f"jobs_{self.name}_dead")
+        return bool(dead)
+
+    def reap_expired(self) -> List[ClaimedJob]:
+        # аренды истекают не чаще периода опроса, проверять их при каждом ожидании не нужно
+        if time.monotonic() < self._next_reap:
+            return []
+        self._next_reap = time.monotonic() + (
+            self.notify_fallback_interval
+            if self.listener is not None
+            else self.poll_interval
+        )
+
+        with self._session() as session:
+            rows = session.execute(
+                update(Job)
+                .where(
+                    Job.queue == self.name,
+                    Job.status == JobStatus.RUNNING.value,
+                    Job.lease_expires_at < func.now(),
+                    Job.attempts >= self.max_attempts,
+                )
+                .values(
+                    status=JobStatus.DEAD.value,
+                    lease_expires_at=None,
+                    last_error="Lease expired",
+                )
+                .returning(Job.id, Job.payload, Job.attempts)
+                .execution_options(synchronize_session=False)
+            ).all()
+            session.commit()
+
+        jobs = []
+        for job_id, payload, attempts in rows:
+            logger.error(
+                f"Job {job_id} in queue `{self.name}` is dead: lease expired {attempts} times"
+            )
+            try:
+                item = decode_item(payload, self.item_types)
+            except JobDecodeError:
+                continue
+            jobs.append(ClaimedJob(item=item, id=job_id, attempts=attempts))
+
+        if rows:
+            metrics.inc(f"jobs_{self.name}_dead", len(rows))
+        return jobs
+
+    def heartbeat(self, job: ClaimedJob) -> None:
+        with self._session() as session:
+            session.execute(
+                update(Job)
+                .where(self._owned([job]))
+                .values(lease_expires_at=self._lease_until())
+                .execution_options(synchronize_session=False)
+            )
+            session.commit()
+
+    @contextmanager
+    def lease(self, job: ClaimedJob) -> Iterator[None]:
+        stopped = Event()
+
+        def extend_lease():
+            while not stopped.wait(self.lease_timeout / 3):
+                try:
+                    self.heartbeat(job)
+                except Exception as e:
+                    logger.warning(f"Cant extend lease of job {job.id}: {e}")
+
+        thread = Thread(target=extend_lease, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    def qsize(self) -> Optional[int]:
+        with self._session() as session:
+            return (
+                session.query(func.count(Job.id))
+                .filter(
+                    Job.queue == self.name,
+                    Job.status == JobStatus.PENDING.value,
+                )
+                .scalar()
+            )
@@ -0,0 +1,76 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator
+
+
+@dataclass
+class TimingStats:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "max": self.max,
+            "avg": self.total / self.count if self.count else 0.0,
+        }
+
+
+class MetricsRegistry:
+    """
+    Простой реестр метрик процесса: счетчики, длительности и вычисляемые показатели (gauges).
+    Снимок метрик отдается через `GET /metrics`.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._timings: Dict[str, TimingStats] = defaultdict(TimingStats)
+        self._gauges: Dict[str, Callable[[], Any]] = {}
+
+    def inc(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._timings[name].observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def register_gauge(self, name: str, func: Callable[[], Any]) -> None:
+        with self._lock:
+            self._gauges[name] = func
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            timings = {
+                name: stats.as_dict() for name, stats in self._timings.items()
+            }
+            gauges = dict(self._gauges)
+
+        return {
+            "counters": counters,
+            "timings": timings,
+            "gauges": {name: func() for name, func in gauges.items()},
+        }
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,159 @@
+"""
+Уведомления между процессами и репликами через Postgres LISTEN/NOTIFY.
+
+`notify` отправляет уведомление в транзакции сессии: слушатели получают его только после
+фиксации транзакции и не получают при откате. `PgListener` держит отдельное соединение
+с подпиской на каналы и ждет уведомлений, не опрашивая таблицы.
+
+Каналы используются для пробуждения обработчиков очередей заданий (`job_queue`), а также
+могут использоваться для сброса кэшей на всех репликах.
+"""
+import os
+import select
+import time
+from threading import Condition, Lock
+from typing import Any, List, Optional, Sequence
+
+from fs_common_lib.fs_logger.fs_logger import FsLoggerHandler
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from fs_general_api.config import settings
+from fs_general_api.db import db
+from fs_general_api.metrics import metrics
+
+logger = FsLoggerHandler(
+    __name__,
+    level=settings.log_level,
+    log_format=settings.log_format,
+    datefmt=settings.datefmt,
+).get_logger()
+
+
+def notify(db_session: Session, channel: str, payload: str = "") -> None:
+    """
+    Отправляет уведомление при фиксации транзакции сессии
+    """
+    db_session.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": channel, "payload": payload},
+    )
+
+
+class PgListener:
+    """
+    Подписка на каналы уведомлений.
+
+    Соединение создается при первом ожидании и пересоздается после ошибки или fork
+    (соединение родителя не закрывается, т.к. оно ему и принадлежит).
+    Пока соединение недоступно, `wait` просто ждет `timeout`, поэтому обработчики
+    продолжают работать за счет периодического опроса.
+
+    Ждать уведомлений могут несколько потоков: соединение опрашивает один из них,
+    остальные получают уведомления от него.
+
+    Args:
+        channels: имена каналов
+    """
+
+    def __init__(self, channels: Sequence[str]):
+        self.channels = list(channels)
+        self._connection: Optional[Any] = None
+        self._pid: Optional[int] = None
+        self._inherited_connections: List[Any] = []
+        self._connect_lock = Lock()
+        self._wait_lock = Lock()
+        self._received = Condition()
+        self._generation = 0
+        self._last_payloads: List[str] = []
+
+    def _connect(self) -> Any:
+        if self._pid != os.getpid():
+            self.close()
+
+        if self._connection is None:
+            pool_connection = db.engine.raw_connection()
+            # соединение занято подпиской все время работы процесса, поэтому не держим его в пуле
+            pool_connection.detach()
+            connection = pool_connection.connection
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                for channel in self.channels:
+                    cursor.execute(f'LISTEN "{channel}"')
+            self._connection = connection
+            self._pid = os.getpid()
+
+        return self._connection
+
+    def listen(self) -> bool:
+        """
+        Подписывается на каналы, если подписки еще нет.
+        Возвращает False, если соединение недоступно.
+        """
+        try:
+            with self._connect_lock:
+                self._connect()
+        except Exception as e:
+            logger.warning(f"Cant listen to {self.channels}: {e}")
+            self.close()
+            return False
+        return True
+
+    def wait(self, timeout: float) -> List[str]:
+        """
+        Ждет уведомлений не дольше `timeout` секунд и возвращает их содержимое
+        """
+        if not self._wait_lock.acquire(blocking=False):
+            with self._received:
+                generation = self._generation
+                if self._received.wait_for(
+                    lambda: self._generation != generation, max(timeout, 0)
+                ):
+                    return list(self._last_payloads)
+                return []
+
+        try:
+            payloads = self._wait(timeout)
+        finally:
+            self._wait_lock.release()
+
+        if payloads:
+            with self._received:
+                self._generation += 1
+                self._last_payloads = payloads
+                self._received.notify_all()
+        return payloads
+
+    def _wait(self, timeout: float) -> List[str]:
+        if not self.listen():
+            time.sleep(max(timeout, 0))
+            return []
+
+        try:
+            connection = self._connection
+            if not connection.notifies:
+                select.select([connection], [], [], max(timeout, 0))
+            connection.poll()
+            payloads = [notification.payload for notification in connection.notifies]
+            connection.notifies.clear()
+        except Exception as e:
+            logger.warning(f"Lost connection listening to {self.channels}: {e}")
+            self.close()
+            return []
+
+        if payloads:
+            metrics.inc("pg_notifications_received", len(payloads))
+        return payloads
+
+    def close(self) -> None:
+        if self._connection is None:
+            return
+
+        if self._pid == os.getpid():
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+        else:
+            self._inherited_connections.append(self._connection)
+        self._connection = None
@@ -0,0 +1,209 @@
+"""
+Доставка исходящих запросов из `outbox_messages`.
+
+Изменение и запрос, сообщающий о нем внешнему сервису, фиксируются одной транзакцией
+(`MetadataStorageGeneral.add_outbox_message`), а доставка выполняется фоновой задачей.
+Пачка запросов берется в доставку короткой транзакцией: строки блокируются
+(`FOR UPDATE SKIP LOCKED`), время их следующей попытки сдвигается на `outbox_lease`
+и транзакция фиксируется. Поэтому во время отправки блокировки не удерживаются, а другие
+реплики не возьмут эти запросы, пока не истечет аренда. Запросы отправляются параллельно
+через общие HTTP-клиенты, результат записывается второй транзакцией. Неудачные запросы
+повторяются с экспоненциальной задержкой, а запросы на тот же `url` ждут их доставки. Работа с БД выполняется в пуле потоков,
+чтобы не блокировать цикл событий.
+"""
+import asyncio
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from fs_common_lib.fs_logger.fs_logger import FsLoggerHandler
+from sqlalchemy.orm import Session
+
+from fs_general_api.config import settings
+from fs_general_api.db import data_storage
+from fs_general_api.db_classes import OutboxMessage, OutboxMessageStatus
+from fs_general_api.http_clients import HttpClientRegistry, Upstream, http_clients
+from fs_general_api.metrics import metrics
+
+logger = FsLoggerHandler(
+    __name__,
+    level=settings.log_level,
+    log_format=settings.log_format,
+    datefmt=settings.datefmt,
+).get_logger()
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+
+
+def get_retry_delay(attempts: int) -> timedelta:
+    """
+    Задержка перед следующей попыткой: экспоненциальная, ограниченная `outbox_backoff_max`,
+    со случайным разбросом, чтобы повторы разных запросов не приходили одновременно
+    """
+    delay = min(
+        settings.outbox_backoff_base * 2 ** (attempts - 1),
+        settings.outbox_backoff_max,
+    )
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+@dataclass
+class OutboxDelivery:
+    """
+    Исходящий запрос, взятый в доставку
+    """
+
+    id: int
+    upstream: str
+    method: str
+    url: str
+    payload: Optional[Dict]
+    idempotency_key: str
+    attempts: int
+
+
+class OutboxDispatcher:
+    def __init__(
+        self,
+        clients: HttpClientRegistry = http_clients,
+        batch_size: int = settings.outbox_batch_size,
+        concurrency: int = settings.outbox_concurrency,
+        max_attempts: int = settings.outbox_max_attempts,
+        lease: float = settings.outbox_lease,
+    ):
+        self.clients = clients
+        self.batch_size = batch_size
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max_attempts
+        self.lease = timedelta(seconds=lease)
+
+    async def dispatch_pending(
+        self, db_session: Session, now: Optional[datetime] = None
+    ) -> int:
+        """
+        Доставляет пачку запросов, время доставки которых наступило.
+        Возвращает количество обработанных запросов.
+        """
+        event_loop = asyncio.get_event_loop()
+        deliveries = await event_loop.run_in_executor(
+            None, self._claim, db_session, now
+        )
+        if not deliveries:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver(delivery: OutboxDelivery) -> Optional[str]:
+            async with semaphore:
+                return await self._deliver(delivery)
+
+        errors = await asyncio.gather(
+            *(deliver(delivery) for delivery in deliveries)
+        )
+
+        await event_loop.run_in_executor(
+            None, self._record_results, db_session, deliveries, errors
+        )
+        return len(deliveries)
+
+    def _claim(
+        self, db_session: Session, now: Optional[datetime] = None
+    ) -> List[OutboxDelivery]:
+        """
+        Берет в доставку пачку запросов, время доставки которых наступило
+        """
+        messages = data_storage.lock_pending_outbox_messages(
+            db_session, limit=self.batch_size, now=now
+        )
+        deliveries = [
+            OutboxDelivery(
+                id=message.id,
+                upstream=message.upstream,
+                method=message.method,
+                url=message.url,
+                payload=message.payload,
+                idempotency_key=message.idempotency_key,
+                attempts=message.attempts,
+            )
+            for message in messages
+        ]
+
+        lease_until = datetime.now() + self.lease
+        for message in messages:
+            message.next_attempt_ts = lease_until
+
+        db_session.commit()
+        return deliveries
+
+    def _record_results(
+        self,
+        db_session: Session,
+        deliveries: List[OutboxDelivery],
+        errors: List[Optional[str]],
+    ) -> None:
+        """
+        Записывает результаты доставки. Запрос, который после истечения аренды взяла
+        в доставку другая реплика, не изменяется
+        """
+        messages = {
+            message.id: message
+            for message in db_session.query(OutboxMessage)
+            .filter(OutboxMessage.id.in_([delivery.id for delivery in deliveries]))
+            .with_for_update()
+        }
+
+        now = datetime.now()
+        for delivery, error in zip(deliveries, errors):
+            message = messages.get(delivery.id)
+            if (
+                message is None
+                or message.status != OutboxMessageStatus.PENDING.value
+                or message.attempts != delivery.attempts
+            ):
+                continue
+
+            message.attempts += 1
+
+            if error is None:
+                message.status = OutboxMessageStatus.DELIVERED.value
+                message.delivered_timestamp = now
+                message.last_error = None
+                metrics.inc("outbox_delivered")
+                continue
+
+            message.last_error = error
+            metrics.inc("outbox_delivery_errors")
+            if message.attempts >= self.max_attempts:
+                message.status = OutboxMessageStatus.FAILED.value
+                metrics.inc("outbox_failed")
+                logger.error(
+                    f"Outbox message {message.id} to {message.url} failed after {message.attempts} attempts: {error}"
+                )
+            else:
+                message.next_attempt_ts = now + get_retry_delay(message.attempts)
+                logger.warning(
+                    f"Outbox message {message.id} to {message.url} failed (attempt {message.attempts}): {error}"
+                )
+
+        db_session.commit()
+
+    async def _deliver(self, delivery: OutboxDelivery) -> Optional[str]:
+        """
+        Отправляет запрос. Возвращает описание ошибки или None, если запрос доставлен.
+        """
+        try:
+            async with self.clients.get(Upstream(delivery.upstream)).request(
+                delivery.method,
+                delivery.url,
+                json=delivery.payload,
+                headers={IDEMPOTENCY_KEY_HEADER: delivery.idempotency_key},
+            ) as response:
+                if 200 <= response.status < 300:
+                    return None
+                return f"{response.status}: {await response.text()}"
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+
+
+outbox_dispatcher = OutboxDispatcher()
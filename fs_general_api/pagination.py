@@ -0,0 +1,99 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Callable, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+from pydantic.generics import GenericModel
+from sqlalchemy import DateTime, literal, tuple_
+from sqlalchemy.orm import Query
+
+from fs_general_api.exceptions import InvalidRequestParamsError
+
+T = TypeVar("T")
+
+
+class CursorPage(GenericModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+class CursorPageWithTotal(CursorPage[T], Generic[T]):
+    total: Optional[int] = None
+
+
+def escape_like(value: str, escape: str = "\\") -> str:
+    """
+    Экранирует спецсимволы LIKE (`%`, `_` и сам символ экранирования) в пользовательском вводе
+    """
+    return (
+        value.replace(escape, escape * 2)
+        .replace("%", escape + "%")
+        .replace("_", escape + "_")
+    )
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = json.dumps(
+        [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str, columns: Sequence[Any]) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidRequestParamsError(f"Invalid cursor `{cursor}`") from None
+
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise InvalidRequestParamsError(f"Invalid cursor `{cursor}`")
+
+    try:
+        return [
+            datetime.fromisoformat(value)
+            if isinstance(column.type, DateTime) and isinstance(value, str)
+            else value
+            for value, column in zip(values, columns)
+        ]
+    except ValueError:
+        raise InvalidRequestParamsError(f"Invalid cursor `{cursor}`") from None
+
+
+def keyset_paginate(
+    query: Query,
+    columns: Sequence[Any],
+    cursor_values: Callable[[Any], Sequence[Any]],
+    limit: int,
+    cursor: Optional[str] = None,
+    descending: bool = False,
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Постраничная выборка по ключу (keyset): вместо OFFSET следующая страница начинается
+    строго после значений `columns` последней строки предыдущей страницы.
+
+    Args:
+        query: запрос с уже примененными фильтрами
+        columns: колонки сортировки, последней должна идти уникальная колонка
+        cursor_values: функция, возвращающая значения `columns` для строки результата
+        limit: размер страницы
+        cursor: непрозрачный токен, полученный в `next_cursor` предыдущей страницы
+        descending: сортировка по убыванию
+    """
+    if cursor is not None:
+        values = decode_cursor(cursor, columns)
+        key = tuple_(*columns)
+        boundary = tuple_(
+            *(literal(value, type_=column.type) for value, column in zip(values, columns))
+        )
+        query = query.filter(key < boundary if descending else key > boundary)
+
+    order_by = [column.desc() if descending else column for column in columns]
+    rows = query.order_by(*order_by).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(cursor_values(rows[-1]))
+
+    return rows, next_cursor
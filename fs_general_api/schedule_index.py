@@ -0,0 +1,227 @@
+"""
+Материализованное расписание production-версий ETL-проектов.
+
+Для каждой версии в статусе PRODUCTION с заданным `schedule_interval` плановые запуски
+рассчитываются заранее на интервал [now - lookback, now + horizon] и хранятся в
+`etl_schedule_fire_times`. Поэтому выборка проектов, которые должны были запуститься
+в заданном окне, сводится к индексному поиску по диапазону времени.
+
+Расписание версии пересчитывается явным вызовом `refresh_versions` в той же транзакции,
+что и изменение ее статуса или `schedule_interval`. Фоновая задача сдвигает окно вперед и сверяет
+индекс с каталогом production-версий, в том числе для версий, измененных в обход этих вызовов.
+"""
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+import croniter
+from fs_common_lib.fs_general_api.data_types import EtlProjectStatus
+from fs_common_lib.fs_logger.fs_logger import FsLoggerHandler
+from fs_db.db_classes_general import EtlProjectVersion
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from fs_general_api.config import settings
+from fs_general_api.db_classes import EtlScheduleFireTime, EtlScheduleIndex
+
+logger = FsLoggerHandler(
+    __name__,
+    level=settings.log_level,
+    log_format=settings.log_format,
+    datefmt=settings.datefmt,
+).get_logger()
+
+
+def get_materialization_window(now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    now = now or datetime.now()
+    return (
+        now - timedelta(hours=settings.schedule_index_lookback_hours),
+        now + timedelta(hours=settings.schedule_index_horizon_hours),
+    )
+
+
+def compute_fire_times(
+    schedule_interval: str, start: datetime, end: datetime
+) -> Tuple[List[datetime], datetime]:
+    """
+    Рассчитывает запуски в интервале (start, end].
+    Возвращает запуски и момент, до которого они рассчитаны полностью: `end` или,
+    если достигнут лимит `schedule_index_max_fire_times`, время последнего запуска.
+    """
+    cron = croniter.croniter(schedule_interval, start)
+    fire_times = []
+
+    while len(fire_times) < settings.schedule_index_max_fire_times:
+        fire_ts = cron.get_next(datetime)
+        if fire_ts > end:
+            return fire_times, end
+        fire_times.append(fire_ts)
+
+    return fire_times, fire_times[-1]
+
+
+def _is_scheduled(etl_project_version: EtlProjectVersion) -> bool:
+    return (
+        etl_project_version.status == EtlProjectStatus.PRODUCTION
+        and bool(etl_project_version.schedule_interval)
+    )
+
+
+def remove_versions(connection: Connection, version_ids: Iterable[int]) -> None:
+    version_ids = list(version_ids)
+    if not version_ids:
+        return
+
+    connection.execute(
+        delete(EtlScheduleFireTime).where(
+            EtlScheduleFireTime.etl_project_version_id.in_(version_ids)
+        )
+    )
+    connection.execute(
+        delete(EtlScheduleIndex).where(
+            EtlScheduleIndex.etl_project_version_id.in_(version_ids)
+        )
+    )
+
+
+def materialize_fire_times(
+    connection: Connection,
+    version_id: int,
+    schedule_interval: str,
+    start: datetime,
+    end: datetime,
+) -> None:
+    """
+    Добавляет запуски версии в интервале (start, end] и сдвигает границу рассчитанного интервала
+    """
+    try:
+        fire_times, materialized_until = compute_fire_times(
+            schedule_interval, start, end
+        )
+    except (croniter.CroniterBadCronError, croniter.CroniterBadDateError) as e:
+        logger.warning(
+            f"Invalid schedule interval `{schedule_interval}` for version {version_id}: {e}"
+        )
+        fire_times, materialized_until = [], end
+
+    if fire_times:
+        connection.execute(
+            insert(EtlScheduleFireTime)
+            .values(
+                [
+                    {"etl_project_version_id": version_id, "fire_ts": fire_ts}
+                    for fire_ts in fire_times
+                ]
+            )
+            .on_conflict_do_nothing()
+        )
+
+    connection.execute(
+        insert(EtlScheduleIndex)
+        .values(
+            etl_project_version_id=version_id,
+            schedule_interval=schedule_interval,
+            materialized_from=start,
+            materialized_until=materialized_until,
+        )
+        .on_conflict_do_update(
+            index_elements=[EtlScheduleIndex.etl_project_version_id],
+            set_={"materialized_until": materialized_until},
+        )
+    )
+
+
+def rebuild_versions(
+    connection: Connection,
+    versions: Iterable[EtlProjectVersion],
+    now: Optional[datetime] = None,
+) -> None:
+    """
+    Пересчитывает расписание версий заново на текущее окно
+    """
+    versions = list(versions)
+    remove_versions(connection, [version.id for version in versions])
+
+    start, end = get_materialization_window(now)
+    for version in versions:
+        if _is_scheduled(version):
+            materialize_fire_times(
+                connection, version.id, version.schedule_interval, start, end
+            )
+
+
+def refresh_versions(db_session: Session, versions: Iterable[EtlProjectVersion]) -> None:
+    """
+    Пересчитывает расписание версий после изменения их статуса или `schedule_interval`.
+    Изменения не фиксирует: коммит выполняет вызывающий код вместе с изменением версий.
+    """
+    versions = list(versions)
+    if not versions:
+        return
+
+    db_session.flush()
+    rebuild_versions(db_session.connection(), versions)
+
+
+def roll_schedule_index(db_session: Session, now: Optional[datetime] = None) -> None:
+    """
+    Сдвигает окно материализованного расписания и сверяет его с каталогом production-версий:
+    удаляет прошедшие запуски, достраивает запуски до нового горизонта и пересчитывает
+    версии, расписание которых было изменено без вызова `refresh_versions`.
+    """
+    start, end = get_materialization_window(now)
+    connection = db_session.connection()
+
+    versions = {
+        version.id: version
+        for version in db_session.query(EtlProjectVersion).filter(
+            EtlProjectVersion.status == EtlProjectStatus.PRODUCTION,
+            EtlProjectVersion.schedule_interval.isnot(None),
+        )
+    }
+    indexed = {
+        row.etl_project_version_id: row
+        for row in connection.execute(select(EtlScheduleIndex))
+    }
+
+    remove_versions(connection, set(indexed) - set(versions))
+    rebuild_versions(
+        connection,
+        [
+            version
+            for version_id, version in versions.items()
+            if version_id not in indexed
+            or indexed[version_id].schedule_interval != version.schedule_interval
+        ],
+        now=now,
+    )
+
+    for version_id, row in indexed.items():
+        version = versions.get(version_id)
+        if (
+            version is not None
+            and row.schedule_interval == version.schedule_interval
+            and row.materialized_until < end
+        ):
+            materialize_fire_times(
+                connection,
+                version_id,
+                version.schedule_interval,
+                max(row.materialized_until, start),
+                end,
+            )
+
+    connection.execute(
+        delete(EtlScheduleFireTime).where(EtlScheduleFireTime.fire_ts <= start)
+    )
+    connection.execute(
+        EtlScheduleIndex.__table__.update()
+        .where(EtlScheduleIndex.materialized_from < start)
+        .values(materialized_from=start)
+    )
+
+    db_session.commit()
+    logger.info(
+        f"Schedule index rolled to ({start}, {end}] for {len(versions)} production versions"
+    )
@@ -0,0 +1,176 @@
+"""
+Прогноз нагрузки на Airflow: количество плановых запусков production-версий ETL-проектов
+по интервалам времени.
+
+Расписания загружаются из БД сгруппированными по (schedule_interval, hub_id) и вычисляются
+пакетно (`CompiledCronSet`). Результаты кэшируются в процессе по отпечатку расписаний
+production-версий, поэтому пересчитываются только после изменения какого-либо расписания.
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+import croniter
+import numpy as np
+from sqlalchemy.orm import Session
+
+from fs_general_api.cron import CompiledCronSet
+from fs_general_api.db import data_storage
+from fs_general_api.dto.schedule import ScheduleLoadBucketPdt
+
+ScheduleLoadKey = Tuple[str, datetime, datetime, int, bool]
+
+
+class ScheduleLoadCalculator:
+    """
+    Расчет количества плановых запусков по интервалам с кэшем по отпечатку расписаний
+    """
+
+    def __init__(self, cache_size: int = 64):
+        self._lock = Lock()
+        self._cache_size = cache_size
+        self._results: "OrderedDict[ScheduleLoadKey, List[ScheduleLoadBucketPdt]]" = OrderedDict()
+        self._schedules_fingerprint: Optional[str] = None
+        self._schedules: List[Tuple[str, Optional[int], int]] = []
+
+    def get_load(
+        self,
+        db_session: Session,
+        start: datetime,
+        end: datetime,
+        bucket_minutes: int,
+        group_by_hub: bool = False,
+    ) -> List[ScheduleLoadBucketPdt]:
+        fingerprint = data_storage.get_production_schedules_fingerprint(
+            db_session
+        )
+        key = (fingerprint, start, end, bucket_minutes, group_by_hub)
+
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+
+            if fingerprint != self._schedules_fingerprint:
+                self._results.clear()
+                self._schedules = data_storage.get_production_schedules_by_hub(
+                    db_session
+                )
+                self._schedules_fingerprint = fingerprint
+            schedules = self._schedules
+
+        result = self.calculate(
+            schedules, start, end, bucket_minutes, group_by_hub
+        )
+
+        with self._lock:
+            if fingerprint == self._schedules_fingerprint:
+                self._results[key] = result
+                while len(self._results) > self._cache_size:
+                    self._results.popitem(last=False)
+
+        return result
+
+    @staticmethod
+    def calculate(
+        schedules: List[Tuple[str, Optional[int], int]],
+        start: datetime,
+        end: datetime,
+        bucket_minutes: int,
+        group_by_hub: bool = False,
+    ) -> List[ScheduleLoadBucketPdt]:
+        """
+        Args:
+            schedules: список (schedule_interval, hub_id, количество версий)
+            start: начало периода
+            end: конец периода (не включительно)
+            bucket_minutes: длина интервала в минутах
+            group_by_hub: дополнительно вернуть количество запусков по хабам
+        """
+        # Проекты без хаба (hub_id = None) идут после остальных
+        hub_ids = sorted(
+            {hub_id for _, hub_id, _ in schedules},
+            key=lambda hub_id: (hub_id is None, hub_id or 0),
+        )
+        hub_index = {hub_id: index for index, hub_id in enumerate(hub_ids)}
+
+        expressions = sorted({schedule for schedule, _, _ in schedules})
+        supported = [
+            expression
+            for expression in expressions
+            if start.tzinfo is None and CompiledCronSet.is_supported(expression)
+        ]
+        expression_index = {
+            expression: index for index, expression in enumerate(supported)
+        }
+
+        buckets_count = max(
+            0, -(-int((end - start).total_seconds()) // (bucket_minutes * 60))
+        )
+        weights = np.zeros((len(hub_ids), len(supported)))
+        counts = np.zeros((len(hub_ids), buckets_count), dtype=np.int64)
+
+        for schedule, hub_id, versions_count in schedules:
+            if schedule in expression_index:
+                weights[hub_index[hub_id], expression_index[schedule]] += versions_count
+            else:
+                counts[hub_index[hub_id]] += versions_count * _count_with_croniter(
+                    schedule, start, end, bucket_minutes, buckets_count
+                )
+
+        if supported:
+            counts += CompiledCronSet(supported).fire_counts(
+                start, end, bucket_minutes, weights=weights
+            )
+
+        totals = counts.sum(axis=0)
+        buckets = []
+        for index in range(buckets_count):
+            hubs: Optional[Dict[Optional[int], int]] = None
+            if group_by_hub:
+                hubs = {
+                    hub_id: int(counts[hub_index[hub_id], index])
+                    for hub_id in hub_ids
+                    if counts[hub_index[hub_id], index]
+                }
+
+            buckets.append(
+                ScheduleLoadBucketPdt(
+                    start=start + timedelta(minutes=bucket_minutes * index),
+                    count=int(totals[index]),
+                    hubs=hubs,
+                )
+            )
+
+        return buckets
+
+
+def _count_with_croniter(
+    schedule: str,
+    start: datetime,
+    end: datetime,
+    bucket_minutes: int,
+    buckets_count: int,
+) -> np.ndarray:
+    """
+    Построчный расчет для выражений вне синтаксиса `CompiledCronSet`
+    """
+    counts = np.zeros(buckets_count, dtype=np.int64)
+
+    try:
+        cron = croniter.croniter(schedule, start - timedelta(microseconds=1))
+    except croniter.CroniterBadCronError:
+        return counts
+
+    while True:
+        try:
+            fire_time = cron.get_next(datetime)
+        except croniter.CroniterBadDateError:
+            return counts
+        if fire_time >= end:
+            return counts
+        counts[int((fire_time - start).total_seconds() // (bucket_minutes * 60))] += 1
+
+
+schedule_load_calculator = ScheduleLoadCalculator()
@@ -1,17 +1,27 @@
 import asyncio
-from multiprocessing import Queue, Event
+from multiprocessing import Event
 
 from fastapi import FastAPI
 
 from fs_general_api.config import settings
+from fs_general_api.db import async_db
 from fs_general_api.event_handler import EventHandler
-from fs_general_api.extra_processes import (
-    EtlProjectChecker,
-    EtlProjectSynchronizer,
+from fs_general_api.extra_processes.queues import (
+    CHECKER_QUEUE,
+    EVENTS_QUEUE,
+    SYNCHRONIZER_QUEUE,
+    create_job_queue,
 )
 from fs_general_api.extra_processes.etl_status.setup import setup_etl_status_task
+from fs_general_api.extra_processes.outbox.setup import setup_outbox_task
+from fs_general_api.extra_processes.schedule_index.setup import (
+    setup_schedule_index_task,
+)
 from fs_general_api.extra_processes.ssh_executor.worker import AirflowBackfillService, SshBackfillQueueHandler
 from fs_general_api.exceptions.handlers import add_exception_handlers
+from fs_general_api.http_clients import http_clients
+from fs_general_api.metrics import metrics
+from fs_general_api.worker import create_checker, create_synchronizer
 from fs_general_api.views import BaseRouter
 from fs_general_api.views.healthcheck import healthcheck_router
 from fs_general_api.views.internal.alert_recipient import (
@@ -62,6 +72,8 @@ app.mount("/v2", v2)
 app.mount("/", root)
 
 setup_etl_status_task(app)
+setup_schedule_index_task(app)
+setup_outbox_task(app)
 
 add_exception_handlers(internal)
 add_exception_handlers(v1)
@@ -69,15 +81,15 @@ add_exception_handlers(v2)
 add_exception_handlers(root)
 
 
-checker_event_queue = Queue()
+checker_event_queue = create_job_queue(CHECKER_QUEUE)
 checker_ctrl_event = Event()
 checker_ctrl_event.set()
 
-synchronizer_event_queue = Queue()
+synchronizer_event_queue = create_job_queue(SYNCHRONIZER_QUEUE)
 synchronizer_ctrl_event = Event()
 synchronizer_ctrl_event.set()
 
-event_handler_ctrl_queue = Queue()
+event_handler_ctrl_queue = create_job_queue(EVENTS_QUEUE)
 
 ssh_backfill_request_queue = asyncio.Queue()
 
@@ -87,22 +99,19 @@ BaseRouter.backfill_request_queue = ssh_backfill_request_queue
 
 event_handler = EventHandler(ctrl_queue=event_handler_ctrl_queue)
 
-etl_project_checker = EtlProjectChecker(
+etl_project_checker = create_checker(
     event_queue=checker_event_queue,
     ctrl_queue=event_handler_ctrl_queue,
     ctrl_event=checker_ctrl_event,
-    git_conn_protocol=settings.git_conn_protocol,
-    git_username=settings.git_username,
-    git_password=settings.git_password,
+    sync_queue=(
+        synchronizer_event_queue if settings.checker_synchronizes else None
+    ),
 )
 
-etl_project_synchronizer = EtlProjectSynchronizer(
+etl_project_synchronizer = create_synchronizer(
     event_queue=synchronizer_event_queue,
     ctrl_queue=event_handler_ctrl_queue,
     ctrl_event=synchronizer_ctrl_event,
-    git_conn_protocol=settings.git_conn_protocol,
-    git_username=settings.git_username,
-    git_password=settings.git_password,
 )
 
 airflow_backfill_service = AirflowBackfillService(settings.airflow_ssh_host_prod,
@@ -114,10 +123,16 @@ airflow_backfill_service = AirflowBackfillService(settings.airflow_ssh_host_prod
 backfill_executor = SshBackfillQueueHandler(airflow_backfill_service)
 
 
-etl_project_synchronizer.start()
-etl_project_checker.start()
+# при очередях в БД обработчики могут работать в отдельных подах (fs_general_api.worker)
+if settings.embedded_workers:
+    if not settings.checker_synchronizes:
+        etl_project_synchronizer.start()
+    etl_project_checker.start()
+    metrics.register_gauge("etl_project_checker", etl_project_checker.stats)
 event_handler.start()
 
+metrics.register_gauge("event_handler", event_handler.stats)
+
 
 def shutdown_processes():
     synchronizer_ctrl_event.clear()
@@ -129,10 +144,13 @@ def shutdown_processes():
 async def shutdown_event():
     shutdown_processes()
     await backfill_executor.stop_workers()
+    await http_clients.close()
+    await async_db.dispose()
 
 
 @app.on_event("startup")
 async def startup_event():
+    await http_clients.start()
     await backfill_executor.start_workers(settings.backfill_ssh_session_max_number, ssh_backfill_request_queue)
 
 
@@ -9,9 +9,10 @@ from fs_db.db_classes_general import User
 from sqlalchemy.orm import Session
 
 from fs_general_api.config import settings
-from fs_general_api.db import get_data_storage
+from fs_general_api.db import get_async_data_storage, get_data_storage
 from fs_general_api.dto.user import PdtUser
-from multiprocessing import Queue
+from fs_general_api.http_clients import get_http_clients
+from fs_general_api.job_queue import JobQueue
 
 if TYPE_CHECKING:
     from fs_general_api.extra_processes.checker.check import CheckEventRequest
@@ -36,9 +37,11 @@ class BaseRouter(ABC):
 
     def __init__(self):
         self.data_storage = get_data_storage()
+        self.async_data_storage = get_async_data_storage()
         self.settings = settings
         self.logger = logger
         self.tpe = ThreadPoolExecutor()
+        self.http_clients = get_http_clients()
         self.backend_proxy_client = BackendProxyClient(
             base_url=settings.backend_proxy_url
         )
@@ -100,7 +103,15 @@ class BaseRouter(ABC):
 
     @staticmethod
     def put_msg(
-        event_queue: Queue,
+        event_queue: JobQueue,
         data: Union["CheckEventRequest", "SynchronizeEventRequest"],
+        priority: int = 0,
+        fairness_key: Optional[str] = None,
+        supersede_key: Optional[str] = None,
     ) -> None:
-        event_queue.put(data)
+        event_queue.put(
+            data,
+            priority=priority,
+            fairness_key=fairness_key,
+            supersede_key=supersede_key,
+        )
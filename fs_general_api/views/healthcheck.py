@@ -5,6 +5,7 @@ from fastapi_utils.cbv import cbv
 from fastapi_utils.inferring_router import InferringRouter
 
 from fs_general_api.config import settings
+from fs_general_api.metrics import metrics
 
 healthcheck_router = InferringRouter()
 
@@ -20,3 +21,7 @@ class HealthCheck:
             "stand": settings.schema_name,
             "dt": f"{datetime.now()}",
         }
+
+    @healthcheck_router.get(path="/metrics", status_code=status.HTTP_200_OK)
+    def get_metrics(self):
+        return metrics.snapshot()
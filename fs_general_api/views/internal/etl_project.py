@@ -1,10 +1,9 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from itertools import chain
 from typing import Iterable, List, Optional, Tuple
 
-import aiohttp
 import croniter
-from fastapi import Body, Depends
+from fastapi import Body, Depends, Query
 from fastapi_utils.cbv import cbv
 from fastapi_utils.inferring_router import InferringRouter
 from fs_common_lib.fs_general_api.data_types import (
@@ -23,7 +22,16 @@ from fs_db.db_classes_general import EtlProject, EtlProjectVersion
 from more_itertools import first
 from sqlalchemy.orm import Session
 
+from fs_general_api.cron import CompiledCronSet
 from fs_general_api.db import db
+from fs_general_api.dto.schedule import ScheduleLoadBucketPdt
+from fs_general_api.exceptions import InvalidRequestParamsError
+from fs_general_api.extra_processes.etl_status.definitions import EtlRunEvents
+from fs_general_api.extra_processes.etl_status.etl_status_checker import (
+    apply_etl_run_events,
+)
+from fs_general_api.http_clients import Upstream
+from fs_general_api.schedule_load import schedule_load_calculator
 from fs_general_api.views import BaseRouter
 from fs_general_api.views.v2.etl_project import BASE_MODEL_VERSION
 
@@ -227,12 +235,10 @@ class InternalEtlProjectServer(BaseRouter):
             "etl",
             "get_projects_by_general_list_id",
         )
-        async with aiohttp.ClientSession() as session:
-            response = await session.get(
-                get_url,
-                json={"general_versions_data": list(versions_data)},
-            )
-
+        async with self.http_clients.get(Upstream.BACKEND_DEV).get(
+            get_url,
+            json={"general_versions_data": list(versions_data)},
+        ) as response:
             if not (200 <= response.status < 300):
                 response_text = await response.text()
                 self.logger.error(f"Error on dev backend:\n{response_text}")
@@ -252,12 +258,10 @@ class InternalEtlProjectServer(BaseRouter):
             "etl",
             "multiple_creation",
         )
-        async with aiohttp.ClientSession() as session:
-            response = await session.post(
-                send_url,
-                json={"pdt_etl_projects_versions": etl_projects_versions},
-            )
-
+        async with self.http_clients.get(Upstream.BACKEND_PROD).post(
+            send_url,
+            json={"pdt_etl_projects_versions": etl_projects_versions},
+        ) as response:
             if not (200 <= response.status < 300):
                 response_text = await response.text()
                 self.logger.error(f"Error on prod backend:\n{response_text}")
@@ -265,6 +269,66 @@ class InternalEtlProjectServer(BaseRouter):
 
         return True
 
+    @internal_etl_project_router.post(path=route + "run_events")
+    async def ingest_run_events(
+        self,
+        data: EtlRunEvents,
+        db_session: Session = Depends(db.get_session),
+    ) -> None:
+        """
+        Принимает от backend-а пачку событий о завершенных запусках ETL-проектов и сразу применяет
+        переходы статусов DEVELOPING -> TESTING и PROD_REVIEW -> PRODUCTION/PROD_RELEASE
+        Args:
+            data: источник событий (dev/prod) и список запусков
+            db_session: сессия базы данных
+        """
+        processed_count = await apply_etl_run_events(
+            db_session, source=data.source, events=data.events
+        )
+        self.logger.info(
+            f"Applied {processed_count} run events from {data.source.value} backend"
+        )
+
+    @internal_etl_project_router.get(path=route + "schedule_load")
+    def get_schedule_load(
+        self,
+        start: datetime,
+        end: datetime,
+        bucket: int = Query(60, ge=1, description="Длина интервала в минутах"),
+        group_by_hub: bool = False,
+        db_session: Session = Depends(db.get_session),
+    ) -> List[ScheduleLoadBucketPdt]:
+        """
+        Возвращает количество плановых запусков production-версий ETL-проектов по интервалам
+        длиной `bucket` минут в периоде [start, end)
+        Args:
+            start: начало периода
+            end: конец периода (не включительно)
+            bucket: длина интервала в минутах
+            group_by_hub: дополнительно вернуть количество запусков по хабам
+            db_session: сессия базы данных
+        """
+        if (start.tzinfo is None) != (end.tzinfo is None):
+            raise InvalidRequestParamsError(
+                "`start` and `end` must both be either timezone-aware or naive"
+            )
+
+        if end <= start:
+            raise InvalidRequestParamsError("`end` must be greater than `start`")
+
+        if end - start > timedelta(days=self.settings.schedule_load_max_window_days):
+            raise InvalidRequestParamsError(
+                f"Period must not exceed {self.settings.schedule_load_max_window_days} days"
+            )
+
+        return schedule_load_calculator.get_load(
+            db_session,
+            start=start,
+            end=end,
+            bucket_minutes=bucket,
+            group_by_hub=group_by_hub,
+        )
+
     @internal_etl_project_router.get(
         path=route + "get_production_projects_for_interval"
     )
@@ -282,6 +346,23 @@ class InternalEtlProjectServer(BaseRouter):
             datetime_end: Конечный диапозон, для которого необходимо найти проекты, которые должны были запуститься
             db_session: сессия базы данных
         """
+        if datetime_start.tzinfo is None and datetime_end.tzinfo is None:
+            fire_times = self.data_storage.get_production_projects_fire_times(
+                db_session, datetime_start, datetime_end
+            )
+
+            if fire_times is not None:
+                pdt_projects_versions = []
+                for version, run_ts in fire_times:
+                    pdt_project_version = (
+                        InternalPdtEtlVersionPreviewMonitoring.get_entity(version)
+                    )
+                    pdt_project_version.run_ts = run_ts
+                    pdt_projects_versions.append(pdt_project_version)
+
+                return pdt_projects_versions
+
+        # интервал вне материализованного расписания: расчет по всем production-версиям
         projects_versions_list = (
             self.data_storage.get_projects_with_schedule_in_production(
                 db_session
@@ -291,8 +372,19 @@ class InternalEtlProjectServer(BaseRouter):
         if not projects_versions_list:
             return []
 
+        # пакетный расчет работает с локальным временем без часового пояса
+        use_compiled_cron = (
+            datetime_start.tzinfo is None and datetime_end.tzinfo is None
+        )
+        supported_versions = []
         pdt_projects_versions = []
         for version in projects_versions_list:
+            if use_compiled_cron and CompiledCronSet.is_supported(
+                version.schedule_interval
+            ):
+                supported_versions.append(version)
+                continue
+
             cron = croniter.croniter(version.schedule_interval, datetime_start)
             next_run_time = cron.get_next(datetime)
 
@@ -303,4 +395,16 @@ class InternalEtlProjectServer(BaseRouter):
                 pdt_project_version.run_ts = next_run_time
                 pdt_projects_versions.append(pdt_project_version)
 
+        next_run_times = CompiledCronSet(
+            [version.schedule_interval for version in supported_versions]
+        ).next_fire_times(datetime_start, before=datetime_end)
+
+        for version, next_run_time in zip(supported_versions, next_run_times):
+            if next_run_time is not None:
+                pdt_project_version = (
+                    InternalPdtEtlVersionPreviewMonitoring.get_entity(version)
+                )
+                pdt_project_version.run_ts = next_run_time
+                pdt_projects_versions.append(pdt_project_version)
+
         return pdt_projects_versions
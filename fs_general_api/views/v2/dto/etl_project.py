@@ -1,4 +1,5 @@
 import datetime
+from enum import Enum
 from typing import Optional, List
 
 from pydantic import BaseModel, Field
@@ -45,6 +46,16 @@ class EtlProjectPreviewPdt(BasePdt):
     versions: List[EtlProjectVersionPreviewPdt]
 
 
+class EtlProjectSuggestPdt(BaseModel):
+    id: int
+    name: str
+
+
+class EtlProjectListOrder(Enum):
+    NAME = "name"
+    ID = "id"
+
+
 class EtlProjectVersionFullPdt(BasePdt):
     version: Optional[str]
     status: Optional[str]
@@ -1,11 +1,10 @@
 import asyncio
-from typing import Any, List, Optional, Tuple
+from typing import Any, List, Optional, Tuple, Union
 
-import aiohttp
 import asyncssh
 from fs_common_lib.utils.pagination import LimitOffsetPage
 from more_itertools import first
-from fastapi import Body, Depends
+from fastapi import Body, Depends, Query
 from fastapi.encoders import jsonable_encoder
 from fastapi.params import Cookie
 from fastapi_utils.cbv import cbv
@@ -43,9 +42,11 @@ from fs_db.db_classes_general import (
     User,
 )
 from more_itertools import first
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Query as SAQuery, Session, selectinload
 
-from fs_general_api.db import db
+from fs_general_api.db import EndpointSession, db, get_endpoint_session
 from fs_general_api.dto.check import (
     PdtGeneralCheck,
     PdtGitStatus,
@@ -69,19 +70,30 @@ from fs_general_api.extra_processes.checker.check import (
     CheckEventRequest,
     UserRequestData,
 )
+from fs_general_api.extra_processes.queues import get_check_priority
 from fs_general_api.extra_processes.ssh_executor.worker import (
     SshBackfillRequest,
 )
 from fs_general_api.extra_processes.synchronizer.definitions import (
     SynchronizeEventRequest,
 )
+from fs_general_api.history import HistoryRecorder
+from fs_general_api.http_clients import Upstream
+from fs_general_api.pagination import (
+    CursorPage,
+    CursorPageWithTotal,
+    escape_like,
+    keyset_paginate,
+)
 from fs_general_api.permissions import get_permissions_for_user_with_project
 from fs_general_api.views import BaseRouter
 from fs_general_api.views.v2.dto.etl_project import (
     DeleteEtlProjectPdt,
     EtlProjectCreatePdt,
     EtlProjectFullPdt,
+    EtlProjectListOrder,
     EtlProjectPreviewPdt,
+    EtlProjectSuggestPdt,
     EtlProjectUserPermissionsPdt,
     EtlStatusInfoPdt,
     SendEtlToProdPdt,
@@ -112,6 +124,7 @@ class EtlProjectServer(BaseRouter):
         user_id: Optional[int] = None,
         search: Optional[str] = None,
         status: Optional[EtlProjectStatus] = None,
+        ranked: bool = False,
         params: LimitOffsetParams = Depends(LimitOffsetParams),
         db_session: Session = Depends(db.get_session),
     ) -> LimitOffsetPage[EtlProjectPreviewPdt]:
@@ -123,34 +136,162 @@ class EtlProjectServer(BaseRouter):
             search: - запрос на поиск
             params: - параметры пагинации
             status: - статус по с которым необходимо вернуть проекты
+            ranked: - упорядочить найденные по `search` проекты по похожести
             db_session: - сессия базы данных
         """
-        query = (
-            db_session.query(EtlProject)
-            .join(EtlProject.versions)
-            .options(selectinload(EtlProject.versions))
-            .distinct()
+        query = self._filter_projects(
+            db_session.query(EtlProject).options(
+                selectinload(EtlProject.versions)
+            ),
+            hub_id=hub_id,
+            user_id=user_id,
+            search=search,
+            status=status,
         )
 
-        if hub_id is not None:
-            query = query.filter(EtlProject.hub_id == hub_id)
+        if ranked and search:
+            query = query.order_by(
+                func.greatest(
+                    func.similarity(EtlProject.name, search),
+                    func.similarity(
+                        func.coalesce(EtlProject.description, ""), search
+                    ),
+                ).desc(),
+                EtlProject.id,
+            )
+
+        return paginate(
+            query, params=params, response_schema=EtlProjectPreviewPdt
+        )
+
+    @etl_project_router.get(path=route + "list_by_cursor")
+    def get_list_by_cursor(
+        self,
+        hub_id: Optional[int] = None,
+        user_id: Optional[int] = None,
+        search: Optional[str] = None,
+        status: Optional[EtlProjectStatus] = None,
+        order_by: EtlProjectListOrder = EtlProjectListOrder.NAME,
+        cursor: Optional[str] = None,
+        limit: int = Query(50, ge=1, le=1000),
+        db_session: Session = Depends(db.get_session),
+    ) -> CursorPage[EtlProjectPreviewPdt]:
+        """
+        Возвращает список etl проектов с постраничной выборкой по ключу (keyset).
+        В отличие от `list` не считает общее количество и не использует OFFSET,
+        поэтому время ответа не зависит от номера страницы.
+        Args:
+            hub_id: - в каких хабах искать проекты
+            user_id: - проекты какого пользователя вернуть
+            search: - запрос на поиск
+            status: - статус по с которым необходимо вернуть проекты
+            order_by: - сортировка: по (name, id) или по id
+            cursor: - токен `next_cursor` из предыдущей страницы
+            limit: - размер страницы
+            db_session: - сессия базы данных
+        """
+        query = self._filter_projects(
+            db_session.query(EtlProject).options(
+                selectinload(EtlProject.versions)
+            ),
+            hub_id=hub_id,
+            user_id=user_id,
+            search=search,
+            status=status,
+        )
+
+        if order_by == EtlProjectListOrder.NAME:
+            columns = (EtlProject.name, EtlProject.id)
+        else:
+            columns = (EtlProject.id,)
+
+        etl_projects, next_cursor = keyset_paginate(
+            query,
+            columns=columns,
+            cursor_values=lambda etl_project: [
+                getattr(etl_project, column.key) for column in columns
+            ],
+            limit=limit,
+            cursor=cursor,
+        )
+
+        return CursorPage[EtlProjectPreviewPdt](
+            items=[
+                EtlProjectPreviewPdt.from_orm(etl_project)
+                for etl_project in etl_projects
+            ],
+            next_cursor=next_cursor,
+        )
+
+    @staticmethod
+    def _filter_projects(
+        query: SAQuery,
+        hub_id: Optional[int] = None,
+        user_id: Optional[int] = None,
+        search: Optional[str] = None,
+        status: Optional[EtlProjectStatus] = None,
+    ) -> SAQuery:
+        """
+        Применяет фильтры списка etl проектов.
+        Условия на версии проверяются через EXISTS, поэтому строки проектов не размножаются
+        join-ом и не требуют DISTINCT.
+        """
+        version_filters = []
 
         if user_id is not None:
-            query = query.filter(EtlProjectVersion.user_id == user_id)
+            version_filters.append(EtlProjectVersion.user_id == user_id)
 
         if status is not None:
-            query = query.filter(EtlProjectVersion.status == status)
+            version_filters.append(EtlProjectVersion.status == status)
 
-        if search is not None:
+        query = query.filter(
+            EtlProject.versions.any(
+                and_(*version_filters) if version_filters else None
+            )
+        )
+
+        if hub_id is not None:
+            query = query.filter(EtlProject.hub_id == hub_id)
+
+        if search:
+            pattern = f"%{escape_like(search)}%"
             query = query.filter(
-                EtlProject.name.like(f"%{search}%")
-                | EtlProject.description.like(f"%{search}%")
+                EtlProject.name.ilike(pattern, escape="\\")
+                | EtlProject.description.ilike(pattern, escape="\\")
             )
 
-        return paginate(
-            query, params=params, response_schema=EtlProjectPreviewPdt
+        return query
+
+    @etl_project_router.get(path=route + "suggest")
+    def suggest(
+        self,
+        prefix: str = Query(..., min_length=1),
+        hub_id: Optional[int] = None,
+        limit: int = Query(10, ge=1, le=50),
+        db_session: Session = Depends(db.get_session),
+    ) -> List[EtlProjectSuggestPdt]:
+        """
+        Возвращает проекты, название которых начинается с `prefix` (автодополнение в поиске).
+        Args:
+            prefix: - начало названия проекта
+            hub_id: - в каком хабе искать проекты
+            limit: - максимальное количество подсказок
+            db_session: - сессия базы данных
+        """
+        query = db_session.query(EtlProject.id, EtlProject.name).filter(
+            EtlProject.name.ilike(f"{escape_like(prefix)}%", escape="\\")
         )
 
+        if hub_id is not None:
+            query = query.filter(EtlProject.hub_id == hub_id)
+
+        return [
+            EtlProjectSuggestPdt(id=etl_id, name=name)
+            for etl_id, name in query.order_by(EtlProject.name, EtlProject.id)
+            .limit(limit)
+            .all()
+        ]
+
     def _data_enrichment(
         self, etl_project_version: EtlProjectVersion
     ) -> EtlProjectVersion:
@@ -258,6 +399,15 @@ class EtlProjectServer(BaseRouter):
 
         return etl_project
 
+    def _get_detailed_etl_project_pdt(
+        self, db_session: Session, etl_project_version: EtlProjectVersion
+    ) -> EtlProjectFullPdt:
+        return EtlProjectFullPdt.get_entity(
+            self._get_detailed_etl_project(
+                db_session, etl_project_version=etl_project_version
+            )
+        )
+
     async def _get_version_last_run(
         self, etl_project_version: EtlProjectVersion
     ):
@@ -266,8 +416,10 @@ class EtlProjectServer(BaseRouter):
             EtlProjectStatus.PROD_RELEASE,
         ):
             base_url = self.settings.backend_uri_prod
+            upstream = Upstream.BACKEND_PROD
         else:
             base_url = self.settings.backend_uri_dev
+            upstream = Upstream.BACKEND_DEV
 
         url = join_urls(
             base_url,
@@ -277,14 +429,12 @@ class EtlProjectServer(BaseRouter):
             "last_run",
         )
 
-        async with aiohttp.ClientSession() as session:
-            response = await session.get(
-                url,
-                params={
-                    "general_etl_project_version": etl_project_version.version
-                },
-            )
-
+        async with self.http_clients.get(upstream).get(
+            url,
+            params={
+                "general_etl_project_version": etl_project_version.version
+            },
+        ) as response:
             if not (200 <= response.status < 300):
                 response_text = await response.text()
                 self.logger.error(response_text)
@@ -300,15 +450,13 @@ class EtlProjectServer(BaseRouter):
             "internal", "datamart", "monitoring", "disable",
         )
 
-        async with aiohttp.ClientSession() as session:
-            response = await session.post(
-                url,
-                json={
-                    "general_etl_project_id": etl_project_version.etl_project_id,
-                    "general_etl_project_version": etl_project_version.version,
-                },
-            )
-
+        async with self.http_clients.get(Upstream.METRIC_MANAGER).post(
+            url,
+            json={
+                "general_etl_project_id": etl_project_version.etl_project_id,
+                "general_etl_project_version": etl_project_version.version,
+            },
+        ) as response:
             if not (200 <= response.status < 300):
                 response_text = await response.text()
                 self.logger.error(
@@ -323,35 +471,80 @@ class EtlProjectServer(BaseRouter):
         self,
         etl_project_version: EtlProjectVersion,
         db_session: Session,
-    ):
+        history: Optional[HistoryRecorder] = None,
+    ) -> Optional[EtlProjectVersion]:
+        """
+        Выключает активную версию ETL-проекта. Если передана единица работы `history`,
+        отключение мониторинга нужно запускать после ее коммита через `_disable_monitoring_in_background`
+        """
         turned_off_version: Optional[EtlProjectVersion] = self.data_storage.turn_off_active_project_version(
             db_session,
             new_etl_version_id=etl_project_version.id,
             etl_project_id=etl_project_version.etl_project_id,
             author_name=etl_project_version.author_name,
+            history=history,
         )
-        if not turned_off_version:
-            return None
 
-        if self.settings.use_metric_manager:
+        if history is None:
+            self._disable_monitoring_in_background(turned_off_version)
+
+        return turned_off_version
+
+    def _disable_monitoring_in_background(self, turned_off_version: Optional[EtlProjectVersion]):
+        if turned_off_version and self.settings.use_metric_manager:
             # Monitoring disabling is optional process, so we don`t need to wait for the task to complete
             asyncio.create_task(self._disable_project_version_monitoring(turned_off_version))
 
+    @staticmethod
+    def _get_status_by_last_run(
+        etl_project_version: EtlProjectVersion, last_etl_run: InternalPdtEtlRun
+    ) -> Optional[EtlProjectStatus]:
+        """
+        Возвращает статус, в который необходимо перевести версию ETL-проекта по результату последнего запуска
+        """
+        if (
+            last_etl_run.result == "SUCCESS"
+            and etl_project_version.status == EtlProjectStatus.DEVELOPING
+        ):
+            return EtlProjectStatus.TESTING
+        elif (
+            last_etl_run.result == "FAIL"
+            and etl_project_version.status == EtlProjectStatus.PROD_REVIEW
+        ):
+            return EtlProjectStatus.PROD_RELEASE
+        elif (
+            last_etl_run.result == "SUCCESS"
+            and etl_project_version.status
+            in [
+                EtlProjectStatus.PROD_REVIEW,
+                EtlProjectStatus.PROD_RELEASE,
+            ]
+        ):
+            return EtlProjectStatus.PRODUCTION
+
+        return None
+
     @etl_project_router.get(path=route + "{etl_id}")
     async def get_etl_project(
         self,
         etl_id: int,
         version: str,
-        db_session: Session = Depends(db.get_session),
+        endpoint_session: EndpointSession = Depends(get_endpoint_session),
     ) -> EtlProjectFullPdt:
         """
         Возвращает версию etl project, полученный по etl_id и version
         Args:
             etl_id: id etl_project, который необходимо получить
             version: строковое представление версии etl_project
-            session_token: токен сессии
-            db_session: сессия базы данных
+            endpoint_session: сессия базы данных (асинхронная, если включен `db_async_mode`)
         """
+        if endpoint_session.is_async:
+            return await self._get_etl_project_async(
+                endpoint_session.session, etl_id=etl_id, version=version
+            )
+
+        db_session: Session = endpoint_session.session
+
         etl_project_version: EtlProjectVersion = (
             self.data_storage.get_etl_project_version(
                 db_session,
@@ -370,54 +563,87 @@ class EtlProjectServer(BaseRouter):
 
             if last_etl_run:
                 last_etl_run = InternalPdtEtlRun.parse_obj(last_etl_run)
+                new_status = self._get_status_by_last_run(
+                    etl_project_version, last_etl_run
+                )
 
-                if (
-                    last_etl_run.result == "SUCCESS"
-                    and etl_project_version.status
-                    == EtlProjectStatus.DEVELOPING
-                ):
-                    await self.data_storage.update_etl_project_status(
-                        etl_project_version=etl_project_version,
-                        status=EtlProjectStatus.TESTING,
-                        etl_run=last_etl_run,
-                        db_session=db_session,
-                        author_name=etl_project_version.author_name,
-                    )
-                elif (
-                    last_etl_run.result == "FAIL"
-                    and etl_project_version.status
-                    == EtlProjectStatus.PROD_REVIEW
-                ):
-                    await self.data_storage.update_etl_project_status(
-                        db_session=db_session,
+                if new_status is not None:
+                    turned_off_version = None
+
+                    with HistoryRecorder.unit_of_work(db_session) as history:
+                        await self.data_storage.update_etl_project_status(
+                            db_session=db_session,
+                            etl_project_version=etl_project_version,
+                            status=new_status,
+                            etl_run=last_etl_run,
+                            author_name=etl_project_version.author_name,
+                            history=history,
+                        )
+
+                        if new_status == EtlProjectStatus.PRODUCTION:
+                            turned_off_version = await self._turn_off_active_project_version(
+                                db_session=db_session,
+                                etl_project_version=etl_project_version,
+                                history=history,
+                            )
+
+                    # Мониторинг отключается только после коммита перевода версии в PRODUCTION
+                    self._disable_monitoring_in_background(turned_off_version)
+
+        return EtlProjectFullPdt.get_entity(
+            self._get_detailed_etl_project(
+                db_session, etl_project_version=etl_project_version
+            )
+        )
+
+    async def _get_etl_project_async(
+        self, async_db_session: AsyncSession, etl_id: int, version: str
+    ) -> EtlProjectFullPdt:
+        etl_project_version: EtlProjectVersion = (
+            await self.async_data_storage.get_etl_project_version(
+                async_db_session,
+                etl_project_id=etl_id,
+                etl_project_version=version,
+            )
+        )
+
+        if not etl_project_version:
+            raise DataNotFoundException(
+                f"Etl project version by etl_id=`{etl_id}`, version=`{version}` didn't find!"
+            )
+
+        if etl_project_version.status != EtlProjectStatus.PRODUCTION:
+            last_etl_run = await self._get_version_last_run(etl_project_version)
+
+            if last_etl_run:
+                last_etl_run = InternalPdtEtlRun.parse_obj(last_etl_run)
+                new_status = self._get_status_by_last_run(
+                    etl_project_version, last_etl_run
+                )
+
+                if new_status is not None:
+                    await self.async_data_storage.update_etl_project_status(
+                        db_session=async_db_session,
                         etl_project_version=etl_project_version,
-                        status=EtlProjectStatus.PROD_RELEASE,
+                        status=new_status,
                         etl_run=last_etl_run,
                         author_name=etl_project_version.author_name,
                     )
-                elif (
-                    last_etl_run.result == "SUCCESS"
-                    and etl_project_version.status
-                    in [
-                        EtlProjectStatus.PROD_REVIEW,
-                        EtlProjectStatus.PROD_RELEASE,
-                    ]
-                ):
-                    await self.data_storage.update_etl_project_status(
-                        db_session=db_session,
-                        etl_project_version=etl_project_version,
-                        status=EtlProjectStatus.PRODUCTION,
-                        etl_run=last_etl_run,
+
+                if new_status == EtlProjectStatus.PRODUCTION:
+                    turned_off_version = await self.async_data_storage.turn_off_active_project_version(
+                        async_db_session,
+                        new_etl_version_id=etl_project_version.id,
+                        etl_project_id=etl_project_version.etl_project_id,
                         author_name=etl_project_version.author_name,
                     )
-                    await self._turn_off_active_project_version(
-                        db_session=db_session, etl_project_version=etl_project_version,
-                    )
 
-        return EtlProjectFullPdt.get_entity(
-            self._get_detailed_etl_project(
-                db_session, etl_project_version=etl_project_version
-            )
+                    self._disable_monitoring_in_background(turned_off_version)
+
+        # Сборка ответа обращается к ленивым связям, поэтому выполняется через run_sync
+        return await async_db_session.run_sync(
+            self._get_detailed_etl_project_pdt,
+            etl_project_version=etl_project_version,
         )
 
     @etl_project_router.put(path=route + "{etl_id}")
@@ -489,14 +715,12 @@ class EtlProjectServer(BaseRouter):
             "by_general_id",
         )
 
-        async with aiohttp.ClientSession() as session:
-            response = await session.delete(
-                delete_url,
-                json={
-                    "general_etl_project_version": etl_project_version.version
-                },
-            )
-
+        async with self.http_clients.get(Upstream.BACKEND_DEV).delete(
+            delete_url,
+            json={
+                "general_etl_project_version": etl_project_version.version
+            },
+        ) as response:
             if not (200 <= response.status < 300):
                 response_text = await response.text()
                 self.logger.error(response_text)
@@ -532,15 +756,13 @@ class EtlProjectServer(BaseRouter):
                 "branch",
             )
 
-        async with aiohttp.ClientSession() as session:
-            response = await session.delete(
-                url,
-                json={
-                    "jira_task": etl_project_version.jira_task,
-                    "project_name": etl_project_version.etl_project.name,
-                }
-            )
-
+        async with self.http_clients.get(Upstream.GIT_MANAGER).delete(
+            url,
+            json={
+                "jira_task": etl_project_version.jira_task,
+                "project_name": etl_project_version.etl_project.name,
+            }
+        ) as response:
             if not (200 <= response.status < 300):
                 response_text = await response.text()
                 self.logger.error(response_text)
@@ -596,25 +818,11 @@ class EtlProjectServer(BaseRouter):
             db_session.delete(etl_project_version)
             db_session.commit()
 
-    @etl_project_router.post(path=route + "{etl_id}/send_to_prod")
-    async def send_to_prod(
-        self,
-        etl_id: int,
-        data: SendEtlToProdPdt,
-        version: str = Body(),
-        session_token: Optional[str] = Cookie(default=None),
-        db_session: Session = Depends(db.get_session),
-    ) -> EtlProjectFullPdt:
+    def _get_version_for_prod_review(
+        self, db_session: Session, etl_id: int, version: str
+    ) -> EtlProjectVersion:
         """
-        Запускает проверки с типом `REVIEW` для ETL-проекта.
-        При успешном выполнении всех проверок создается соответствующая запись в таблице `project_transfer_requests`.
-
-        Args:
-            etl_id: id etl_project, который необходимо перевести в статус "Заявка на переход в прод"
-            version: версия etl_project, которыю необходимо перевести в статус "Заявка на переход в прод"
-            data: данные для отправки в прод
-            session_token: токен сессии для получения информации о пользователе
-            db_session: сессия базы данных
+        Возвращает версию ETL-проекта, которую можно отправить на проверку перед переходом в прод
         """
         etl_project_version: EtlProjectVersion = (
             self.data_storage.get_etl_project_version(
@@ -679,30 +887,55 @@ class EtlProjectServer(BaseRouter):
                 "Pre-checks already requested for this project!"
             )
 
+        return etl_project_version
+
+    @etl_project_router.post(path=route + "{etl_id}/send_to_prod")
+    async def send_to_prod(
+        self,
+        etl_id: int,
+        data: SendEtlToProdPdt,
+        version: str = Body(),
+        session_token: Optional[str] = Cookie(default=None),
+        endpoint_session: EndpointSession = Depends(get_endpoint_session),
+    ) -> EtlProjectFullPdt:
+        """
+        Запускает проверки с типом `REVIEW` для ETL-проекта.
+        При успешном выполнении всех проверок создается соответствующая запись в таблице `project_transfer_requests`.
+
+        Args:
+            etl_id: id etl_project, который необходимо перевести в статус "Заявка на переход в прод"
+            version: версия etl_project, которыю необходимо перевести в статус "Заявка на переход в прод"
+            data: данные для отправки в прод
+            session_token: токен сессии для получения информации о пользователе
+            endpoint_session: сессия базы данных (асинхронная, если включен `db_async_mode`)
+        """
+        etl_project_version = await endpoint_session.run(
+            self._get_version_for_prod_review, etl_id=etl_id, version=version
+        )
+
         user_data = UserRequestData(
             user_name=data.user_name,
             author_email=data.author_email,
             author_name=data.author_name,
         )
 
-        self._run_check_etl_project(
-            db_session=db_session,
+        await endpoint_session.run(
+            self._run_check_etl_project,
             etl_project_version=etl_project_version,
             user_data=user_data,
         )
 
         await self._apply_history_event(
-            db_session=db_session,
+            db_session=endpoint_session,
             event_name="Отправка ETL-проекта на проверку",
             etl_project_version_id=etl_project_version.id,
             old_value=etl_project_version.status.value,
             session_token=session_token,
         )
 
-        return EtlProjectFullPdt.get_entity(
-            self._get_detailed_etl_project(
-                db_session, etl_project_version=etl_project_version
-            )
+        return await endpoint_session.run(
+            self._get_detailed_etl_project_pdt,
+            etl_project_version=etl_project_version,
         )
 
     @etl_project_router.post(path=route + "{etl_id}/start_retro_calculation")
@@ -791,14 +1024,12 @@ class EtlProjectServer(BaseRouter):
             "last_successful_run",
         )
 
-        async with aiohttp.ClientSession() as session:
-            response = await session.get(
-                url,
-                params={
-                    "general_etl_project_version": etl_project_version.version
-                },
-            )
-
+        async with self.http_clients.get(Upstream.BACKEND_PROD).get(
+            url,
+            params={
+                "general_etl_project_version": etl_project_version.version
+            },
+        ) as response:
             if not (200 <= response.status < 300):
                 response_text = await response.text()
                 self.logger.error(response_text)
@@ -917,23 +1148,12 @@ class EtlProjectServer(BaseRouter):
 
         return etl_project_version
 
-    @etl_project_router.post(path=route + "create")
-    async def create(
-        self,
-        data: EtlProjectCreatePdt,
-        comment: Optional[str] = Body(default=None),
-        session_token: Optional[str] = Cookie(default=None),
-        db_session: Session = Depends(db.get_session),
-    ) -> EtlProjectFullPdt:
+    def _prepare_etl_project_creation(
+        self, db_session: Session, data: EtlProjectCreatePdt
+    ) -> Tuple[EtlProject, Optional[str], str, Optional[User]]:
         """
-        Возвращает etl project, полученный после создания
-        Args:
-            data: данные для создания ETL-проекта
-            comment: комментарий при создании новой версии
-            session_token: токен сессии
-            db_session: сессия базы данных
+        Возвращает ETL-проект, предыдущую и новую версии и автора из БД (если он в ней есть)
         """
-
         hub = self.data_storage.find_record_by_id(
             session=db_session, class_=Hub, id=data.hub_id
         )
@@ -971,18 +1191,20 @@ class EtlProjectServer(BaseRouter):
             db_session.query(User).filter(User.user_id == data.user_id).first()
         )
 
-        if user is None:
-            backend_proxy_user = await self.current_user(session_token)
-            user = User(
-                user_id=backend_proxy_user.id,
-                display_name=backend_proxy_user.display_name,
-                email=backend_proxy_user.email,
-            )
+        return etl_project, previous_version, new_version, user
 
+    def _add_etl_project_version(
+        self,
+        db_session: Session,
+        etl_project: EtlProject,
+        version: str,
+        user: User,
+        data: EtlProjectCreatePdt,
+    ) -> EtlProjectVersion:
         etl_project_version: EtlProjectVersion = (
             self._create_etl_project_version_from_pdt(
                 etl_project=etl_project,
-                version=new_version,
+                version=version,
                 user=user,
                 pdt_etl_project=data,
             )
@@ -991,6 +1213,52 @@ class EtlProjectServer(BaseRouter):
         db_session.add(etl_project_version)
         db_session.flush()
 
+        # хаб нужен в запросах к git manager и backend-у, которые выполняются вне сессии
+        db_session.refresh(etl_project, attribute_names=["hub"])
+
+        return etl_project_version
+
+    @staticmethod
+    def _commit(db_session: Session) -> None:
+        with db_session.begin_nested():
+            db_session.commit()
+
+    @etl_project_router.post(path=route + "create")
+    async def create(
+        self,
+        data: EtlProjectCreatePdt,
+        comment: Optional[str] = Body(default=None),
+        session_token: Optional[str] = Cookie(default=None),
+        endpoint_session: EndpointSession = Depends(get_endpoint_session),
+    ) -> EtlProjectFullPdt:
+        """
+        Возвращает etl project, полученный после создания
+        Args:
+            data: данные для создания ETL-проекта
+            comment: комментарий при создании новой версии
+            session_token: токен сессии
+            endpoint_session: сессия базы данных (асинхронная, если включен `db_async_mode`)
+        """
+        etl_project, previous_version, new_version, user = await endpoint_session.run(
+            self._prepare_etl_project_creation, data=data
+        )
+
+        if user is None:
+            backend_proxy_user = await self.current_user(session_token)
+            user = User(
+                user_id=backend_proxy_user.id,
+                display_name=backend_proxy_user.display_name,
+                email=backend_proxy_user.email,
+            )
+
+        etl_project_version: EtlProjectVersion = await endpoint_session.run(
+            self._add_etl_project_version,
+            etl_project=etl_project,
+            version=new_version,
+            user=user,
+            data=data,
+        )
+
         if self.settings.use_git_manager:
             await self.process_git_manager_create_project(
                 etl_project_version=etl_project_version,
@@ -1001,8 +1269,7 @@ class EtlProjectServer(BaseRouter):
             etl_project_version=etl_project_version
         )
 
-        with db_session.begin_nested():
-            db_session.commit()
+        await endpoint_session.run(self._commit)
 
         if comment:
             event_history_extra_data = generate_comment_event_data(
@@ -1012,7 +1279,7 @@ class EtlProjectServer(BaseRouter):
             event_history_extra_data = None
 
         await self._apply_history_event(
-            db_session=db_session,
+            db_session=endpoint_session,
             event_name="Создание ETL-проекта",
             etl_project_version_id=etl_project_version.id,
             old_value=None,
@@ -1021,10 +1288,9 @@ class EtlProjectServer(BaseRouter):
             extra_data=event_history_extra_data,
         )
 
-        return EtlProjectFullPdt.get_entity(
-            self._get_detailed_etl_project(
-                db_session, etl_project_version=etl_project_version
-            )
+        return await endpoint_session.run(
+            self._get_detailed_etl_project_pdt,
+            etl_project_version=etl_project_version,
         )
 
     async def process_backend_api_create_project(
@@ -1046,8 +1312,9 @@ class EtlProjectServer(BaseRouter):
             "version": etl_project_version.version,
         }
 
-        async with aiohttp.ClientSession() as session:
-            response = await session.post(url, json=json_body)
+        async with self.http_clients.get(Upstream.BACKEND_DEV).post(
+            url, json=json_body
+        ) as response:
             if not (200 <= response.status < 300):
                 response_text = await response.text()
                 self.logger.error(response_text)
@@ -1095,9 +1362,9 @@ class EtlProjectServer(BaseRouter):
             previous_project_version=previous_project_version,
         )
 
-        async with aiohttp.ClientSession() as session:
-            response = await session.post(url, json=request_data.dict())
-
+        async with self.http_clients.get(Upstream.GIT_MANAGER).post(
+            url, json=request_data.dict()
+        ) as response:
             if not (200 <= response.status < 300):
                 response_text = await response.text()
                 self.logger.error(response_text)
@@ -1172,16 +1439,14 @@ class EtlProjectServer(BaseRouter):
             "airflow",
         )
 
-        async with aiohttp.ClientSession() as session:
-            response = await session.post(
-                url,
-                json={
-                    "etl_project_version": jsonable_encoder(
-                        EtlVersionInternalPdt.get_entity(etl_project_version)
-                    )
-                },
-            )
-
+        async with self.http_clients.get(Upstream.GIT_MANAGER).post(
+            url,
+            json={
+                "etl_project_version": jsonable_encoder(
+                    EtlVersionInternalPdt.get_entity(etl_project_version)
+                )
+            },
+        ) as response:
             if not (200 <= response.status < 300):
                 response_text = await response.text()
                 self.logger.error(f"Error on git manager: {response_text}")
@@ -1314,20 +1579,31 @@ class EtlProjectServer(BaseRouter):
             db_session, etl_project_version, limit, offset
         )
 
-        return LimitOffsetPage(items=[PdtHistoryEvent.get_entity(obj=h) for h in history], total=len(history))
+        total = self.data_storage.count_etl_project_history(
+            db_session, etl_project_version
+        )
 
-    @etl_project_router.get(path=route + "{etl_id}/team")
-    async def get_etl_project_team(
+        return LimitOffsetPage(items=[PdtHistoryEvent.get_entity(obj=h) for h in history], total=total)
+
+    @etl_project_router.get(path=route + "{etl_id}/history_event/cursor")
+    def get_etl_project_history_event_by_cursor(
         self,
         etl_id: int,
         version: str,
-        session_token: str = Cookie(default=None),
+        cursor: Optional[str] = None,
+        limit: int = Query(50, ge=1, le=1000),
+        with_total: bool = False,
         db_session: Session = Depends(db.get_session),
-    ) -> Page[PdtUserWithGroups]:
+    ) -> CursorPageWithTotal[PdtHistoryEvent]:
         """
-        Метод, возвращающий список пользователей, входящих в состав команды ETL-проекта
-
-        :param etl_id: Идентификатор ETL-проекта
+        Возвращает историю версии ETL-проекта от новых событий к старым с выборкой по ключу
+        Args:
+            etl_id: - идентификатор ETL-проекта
+            version: - версия ETL-проекта
+            cursor: - токен `next_cursor` из предыдущей страницы
+            limit: - размер страницы
+            with_total: - вернуть общее количество событий версии
+            db_session: - сессия базы данных
         """
         etl_project_version: EtlProjectVersion = (
             self.data_storage.get_etl_project_version(
@@ -1336,11 +1612,39 @@ class EtlProjectServer(BaseRouter):
                 etl_project_version=version,
             )
         )
-
         if not etl_project_version:
             raise DataNotFoundException("ETL project was not founded!")
 
-        users: List[User] = etl_project_version.users
+        history, next_cursor, total = self.data_storage.get_etl_project_history_page(
+            db_session,
+            etl_project_version,
+            limit=limit,
+            cursor=cursor,
+            with_total=with_total,
+        )
+
+        return CursorPageWithTotal[PdtHistoryEvent](
+            items=[PdtHistoryEvent.get_entity(obj=h) for h in history],
+            next_cursor=next_cursor,
+            total=total,
+        )
+
+    @etl_project_router.get(path=route + "{etl_id}/team")
+    async def get_etl_project_team(
+        self,
+        etl_id: int,
+        version: str,
+        session_token: str = Cookie(default=None),
+        endpoint_session: EndpointSession = Depends(get_endpoint_session),
+    ) -> Page[PdtUserWithGroups]:
+        """
+        Метод, возвращающий список пользователей, входящих в состав команды ETL-проекта
+
+        :param etl_id: Идентификатор ETL-проекта
+        """
+        users: List[User] = await endpoint_session.run(
+            self._get_etl_project_team_users, etl_id=etl_id, version=version
+        )
 
         backend_users = await asyncio.gather(*[self.backend_proxy_client.get_user(session_token, usr.user_id) for usr in users])
 
@@ -1354,6 +1658,54 @@ class EtlProjectServer(BaseRouter):
 
         return Page(items=response_users, total=len(users))
 
+    def _get_etl_project_team_users(
+        self, db_session: Session, etl_id: int, version: str
+    ) -> List[User]:
+        etl_project_version: EtlProjectVersion = (
+            self.data_storage.get_etl_project_version(
+                db_session,
+                etl_project_id=etl_id,
+                etl_project_version=version,
+            )
+        )
+
+        if not etl_project_version:
+            raise DataNotFoundException("ETL project was not founded!")
+
+        return list(etl_project_version.users)
+
+    def _get_etl_project_team_update(
+        self, db_session: Session, etl_id: int, version: str, data: List[PdtUser]
+    ) -> Tuple[EtlProjectVersion, List[User], List[User]]:
+        """
+        Возвращает версию ETL-проекта, текущий и новый состав ее команды
+        """
+        etl_project_version: EtlProjectVersion = (
+            self.data_storage.get_etl_project_version(
+                db_session,
+                etl_project_id=etl_id,
+                etl_project_version=version,
+            )
+        )
+
+        if not etl_project_version:
+            raise DataNotFoundException("ETL project was not founded!")
+
+        new_users = self._get_users_list(db_session, users=data)
+
+        return etl_project_version, list(etl_project_version.users), new_users
+
+    @staticmethod
+    def _set_etl_project_team(
+        db_session: Session,
+        etl_project_version: EtlProjectVersion,
+        users: List[User],
+    ) -> None:
+        with db_session.begin_nested():
+            etl_project_version.users = users
+            db_session.add(etl_project_version)
+            db_session.commit()
+
     @etl_project_router.put(path=route + "{etl_id}/team")
     async def update_etl_project_team(
         self,
@@ -1361,7 +1713,7 @@ class EtlProjectServer(BaseRouter):
         data: List[PdtUser],
         version: str = Body(),
         session_token: Optional[str] = Cookie(default=None),
-        db_session: Session = Depends(db.get_session),
+        endpoint_session: EndpointSession = Depends(get_endpoint_session),
     ) -> None:
         """
         Метод, обновляющий состав команды ETL-проекта
@@ -1375,34 +1727,27 @@ class EtlProjectServer(BaseRouter):
                 "List of ETL project team cannot be empty!"
             )
 
-        etl_project_version: EtlProjectVersion = (
-            self.data_storage.get_etl_project_version(
-                db_session,
-                etl_project_id=etl_id,
-                etl_project_version=version,
-            )
+        etl_project_version, old_users, new_users = await endpoint_session.run(
+            self._get_etl_project_team_update,
+            etl_id=etl_id,
+            version=version,
+            data=data,
         )
 
-        if not etl_project_version:
-            raise DataNotFoundException("ETL project was not founded!")
-
-        new_users = self._get_users_list(db_session, users=data)
-
         await self._apply_history_event(
-            db_session=db_session,
+            db_session=endpoint_session,
             event_name="Редактирование команды",
             etl_project_version_id=etl_project_version.id,
-            old_value="\n".join(
-                u.display_name for u in etl_project_version.users
-            ),
+            old_value="\n".join(u.display_name for u in old_users),
             new_value="\n".join(u.display_name for u in new_users),
             session_token=session_token,
         )
 
-        with db_session.begin_nested():
-            etl_project_version.users = new_users
-            db_session.add(etl_project_version)
-            db_session.commit()
+        await endpoint_session.run(
+            self._set_etl_project_team,
+            etl_project_version=etl_project_version,
+            users=new_users,
+        )
 
     @etl_project_router.get(path=route + "{etl_id}/check")
     def get_etl_project_check(
@@ -1542,6 +1887,16 @@ class EtlProjectServer(BaseRouter):
         user_data: Optional[UserRequestData] = None,
     ) -> None:
         with self.data_storage.check_lock:
+            superseded = self.data_storage.supersede_processing_checks(
+                etl_project_version, check_type
+            )
+            if superseded:
+                self.logger.info(
+                    f"Checks {[check.id for check in superseded]} of ETL-project with "
+                    f"id={etl_project_version.etl_project_id}, version={etl_project_version.version} "
+                    f"are superseded by a new {CheckType(check_type).value} check"
+                )
+
             general_check = GeneralCheck(
                 check_type=check_type, result=ProjectCheckResult.PROCESSING
             )
@@ -1574,7 +1929,15 @@ class EtlProjectServer(BaseRouter):
                 project_type=etl_project_version.etl_project.project_type,
             )
 
-            self.put_msg(event_queue=self.checker_event_queue, data=check)
+            etl_project = etl_project_version.etl_project
+            self.put_msg(
+                event_queue=self.checker_event_queue,
+                data=check,
+                priority=get_check_priority(check_type),
+                fairness_key=str(etl_project.hub_id),
+                # ожидающий запрос на прежнюю проверку заменяется новым
+                supersede_key=f"{etl_project.id}:{etl_project_version.version}:{CheckType(check_type).value}",
+            )
 
     async def _delete_from_airflow_branch(
         self, etl_project_version: EtlProjectVersion
@@ -1587,16 +1950,14 @@ class EtlProjectServer(BaseRouter):
             "airflow",
         )
 
-        async with aiohttp.ClientSession() as session:
-            response = await session.delete(
-                url,
-                json={
-                    "etl_project_version": jsonable_encoder(
-                        EtlVersionInternalPdt.get_entity(etl_project_version)
-                    )
-                },
-            )
-
+        async with self.http_clients.get(Upstream.GIT_MANAGER).delete(
+            url,
+            json={
+                "etl_project_version": jsonable_encoder(
+                    EtlVersionInternalPdt.get_entity(etl_project_version)
+                )
+            },
+        ) as response:
             if not (200 <= response.status < 300):
                 response_text = await response.text()
                 self.logger.error(response_text)
@@ -1606,7 +1967,7 @@ class EtlProjectServer(BaseRouter):
 
     async def _apply_history_event(
         self,
-        db_session: Session,
+        db_session: Union[Session, EndpointSession],
         event_name: str,
         etl_project_version_id: int,
         session_token: str,
@@ -1617,8 +1978,11 @@ class EtlProjectServer(BaseRouter):
         current_user = await self.current_user(session_token)
 
         if current_user:
-            self.data_storage.add_history_event(
-                db_session=db_session,
+            if not isinstance(db_session, EndpointSession):
+                db_session = EndpointSession(db_session)
+
+            await db_session.run(
+                self.data_storage.add_history_event,
                 name=event_name,
                 etl_project_version_id=etl_project_version_id,
                 new_value=new_value,
@@ -0,0 +1,114 @@
+"""
+Отдельный процесс обработчиков проверок или синхронизации ETL-проектов.
+
+    python -m fs_general_api.worker checker
+    python -m fs_general_api.worker synchronizer
+
+Обработчики берут задания из очередей в БД, поэтому требуют `USE_DB_JOB_QUEUE=true`.
+Чтобы API не запускал собственные обработчики, ему задается `EMBEDDED_WORKERS=false`.
+При `CHECKER_SYNCHRONIZES=true` синхронизацию выполняют обработчики проверок.
+"""
+import argparse
+import signal
+from multiprocessing import Event
+from typing import Optional, Union
+
+from fs_common_lib.fs_logger.fs_logger import FsLoggerHandler
+
+from fs_general_api.config import settings
+from fs_general_api.extra_processes import (
+    EtlProjectCheckerPool,
+    EtlProjectSynchronizer,
+)
+from fs_general_api.extra_processes.queues import (
+    CHECKER_QUEUE,
+    EVENTS_QUEUE,
+    SYNCHRONIZER_QUEUE,
+    create_job_queue,
+)
+from fs_general_api.job_queue import JobQueue
+
+logger = FsLoggerHandler(
+    __name__,
+    level=settings.log_level,
+    log_format=settings.log_format,
+    datefmt=settings.datefmt,
+).get_logger()
+
+
+def create_checker(
+    event_queue: JobQueue,
+    ctrl_queue: JobQueue,
+    ctrl_event: Event,
+    sync_queue: Optional[JobQueue] = None,
+) -> EtlProjectCheckerPool:
+    return EtlProjectCheckerPool(
+        event_queue=event_queue,
+        ctrl_queue=ctrl_queue,
+        ctrl_event=ctrl_event,
+        sync_queue=sync_queue,
+        git_conn_protocol=settings.git_conn_protocol,
+        git_username=settings.git_username,
+        git_password=settings.git_password,
+        git_checkout_mode=settings.checker_git_checkout_mode,
+    )
+
+
+def create_synchronizer(
+    event_queue: JobQueue, ctrl_queue: JobQueue, ctrl_event: Event
+) -> EtlProjectSynchronizer:
+    return EtlProjectSynchronizer(
+        event_queue=event_queue,
+        ctrl_queue=ctrl_queue,
+        ctrl_event=ctrl_event,
+        git_conn_protocol=settings.git_conn_protocol,
+        git_username=settings.git_username,
+        git_password=settings.git_password,
+        git_checkout_mode=settings.synchronizer_git_checkout_mode,
+    )
+
+
+WORKERS = {
+    CHECKER_QUEUE: create_checker,
+    SYNCHRONIZER_QUEUE: create_synchronizer,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("worker", choices=sorted(WORKERS))
+    args = parser.parse_args()
+
+    if not settings.use_db_job_queue:
+        parser.error("standalone workers require USE_DB_JOB_QUEUE=true")
+
+    ctrl_event = Event()
+    ctrl_event.set()
+
+    worker_kwargs = {}
+    if args.worker == CHECKER_QUEUE and settings.checker_synchronizes:
+        worker_kwargs["sync_queue"] = create_job_queue(SYNCHRONIZER_QUEUE)
+
+    worker: Union[EtlProjectCheckerPool, EtlProjectSynchronizer] = WORKERS[
+        args.worker
+    ](
+        event_queue=create_job_queue(args.worker),
+        ctrl_queue=create_job_queue(EVENTS_QUEUE),
+        ctrl_event=ctrl_event,
+        **worker_kwargs,
+    )
+
+    def stop(signum, frame):
+        logger.info(f"Received signal {signum}, stopping {args.worker} worker")
+        ctrl_event.clear()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    logger.info(f"Starting {args.worker} worker")
+    worker.start()
+    worker.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Сравнение пакетного вычисления расписаний (`CompiledCronSet`) с построчным `croniter`.
+
+Запуск: python -m tests.benchmarks.cron_engine [количество расписаний]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import croniter
+
+from fs_general_api.cron import FIELD_RANGES, CompiledCronSet
+
+
+def _random_expression(rnd: random.Random) -> str:
+    tokens = []
+    for low, high in FIELD_RANGES:
+        kind = rnd.random()
+        if kind < 0.4:
+            tokens.append("*")
+        elif kind < 0.8:
+            tokens.append(str(rnd.randint(low, high)))
+        else:
+            tokens.append(f"*/{rnd.randint(1, high)}")
+    return " ".join(tokens)
+
+
+def _croniter_loop(expressions, start, end):
+    result = []
+    for expression in expressions:
+        next_run_time = croniter.croniter(expression, start).get_next(datetime)
+        result.append(start < next_run_time < end)
+    return result
+
+
+def main(count: int = 1000, repeat: int = 5) -> None:
+    rnd = random.Random(42)
+    # по правилам OR дня месяца и дня недели croniter не находит запуск для невыполнимых
+    # дней месяца, такие выражения в каталоге не встречаются
+    expressions = [
+        expression
+        for expression in (_random_expression(rnd) for _ in range(count * 2))
+        if CompiledCronSet([expression]).days_possible.all()
+    ][:count]
+    start = datetime.now()
+    end = start + timedelta(hours=1)
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        _croniter_loop(expressions, start, end)
+    croniter_time = (time.perf_counter() - started) / repeat
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        CompiledCronSet(expressions).fires_between(
+            start + timedelta(microseconds=1), end
+        )
+    compiled_time = (time.perf_counter() - started) / repeat
+
+    compiled = CompiledCronSet(expressions)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        compiled.fires_between(start + timedelta(microseconds=1), end)
+    precompiled_time = (time.perf_counter() - started) / repeat
+
+    print(f"schedules: {len(expressions)}")
+    print(f"croniter loop:            {croniter_time * 1000:.1f} ms")
+    print(f"compile + batched pass:   {compiled_time * 1000:.1f} ms")
+    print(f"batched pass (compiled):  {precompiled_time * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,141 @@
+import asyncio
+import re
+from datetime import datetime
+
+import pytest
+from fs_common_lib.fs_general_api.data_types import EtlProjectStatus
+from fs_common_lib.fs_registry_api import join_urls
+from fs_db.db_classes_general import EtlProjectVersion, HistoryEvent
+
+from fs_general_api.config import settings
+from fs_general_api.db_classes import EtlRunCursor
+from fs_general_api.extra_processes.etl_status.etl_status_checker import (
+    update_etl_projects_statuses,
+)
+
+
+@pytest.mark.usefixtures(
+    "etl_project_1_version_1",
+    "etl_project_1_version_2",
+    "etl_project_2_version_1",
+)
+class TestUpdateEtlProjectsStatuses:
+    @staticmethod
+    def _mock_runs(mock_aioresponse, backend_uri: str, payload: list):
+        url = join_urls(
+            backend_uri, "internal", "etl", "get_last_etl_runs_for_projects"
+        )
+        mock_aioresponse.get(re.compile(url + r".*$"), status=200, payload=payload)
+
+    def test_cursor_skips_processed_runs(
+        self,
+        db,
+        mock_aioresponse,
+        etl_project_1_version_2: EtlProjectVersion,
+    ):
+        db.add(EtlRunCursor(backend="dev", last_run_id=10))
+        db.flush()
+
+        self._mock_runs(
+            mock_aioresponse,
+            settings.backend_uri_dev,
+            [
+                {
+                    "etl_project_id": etl_project_1_version_2.etl_project_id,
+                    "etl_project_version": etl_project_1_version_2.version,
+                    "etl_run": {
+                        "id": 10,
+                        "result": "SUCCESS",
+                        "run_ts": datetime.now().isoformat(),
+                    },
+                }
+            ],
+        )
+        self._mock_runs(mock_aioresponse, settings.backend_uri_prod, [])
+
+        asyncio.run(update_etl_projects_statuses(db_session=db))
+
+        db.refresh(etl_project_1_version_2)
+        assert etl_project_1_version_2.status == EtlProjectStatus.DEVELOPING
+
+    def test_cursor_moves_forward(
+        self,
+        db,
+        mock_aioresponse,
+        etl_project_1_version_2: EtlProjectVersion,
+    ):
+        self._mock_runs(
+            mock_aioresponse,
+            settings.backend_uri_dev,
+            [
+                {
+                    "etl_project_id": etl_project_1_version_2.etl_project_id,
+                    "etl_project_version": etl_project_1_version_2.version,
+                    "etl_run": {
+                        "id": 11,
+                        "result": "SUCCESS",
+                        "run_ts": datetime.now().isoformat(),
+                    },
+                }
+            ],
+        )
+        self._mock_runs(mock_aioresponse, settings.backend_uri_prod, [])
+
+        asyncio.run(update_etl_projects_statuses(db_session=db))
+
+        db.refresh(etl_project_1_version_2)
+        assert etl_project_1_version_2.status == EtlProjectStatus.TESTING
+
+        cursor = db.query(EtlRunCursor).filter(EtlRunCursor.backend == "dev").one()
+        assert cursor.last_run_id == 11
+
+        history_events = (
+            db.query(HistoryEvent)
+            .filter(HistoryEvent.etl_project_version_id == etl_project_1_version_2.id)
+            .all()
+        )
+        assert [(event.old_value, event.new_value) for event in history_events] == [
+            (EtlProjectStatus.DEVELOPING.value, EtlProjectStatus.TESTING.value)
+        ]
+
+    def test_cursor_stops_before_unfinished_run(
+        self,
+        db,
+        mock_aioresponse,
+        etl_project_1_version_2: EtlProjectVersion,
+        etl_project_2_version_1: EtlProjectVersion,
+    ):
+        db.add(EtlRunCursor(backend="dev", last_run_id=10))
+        db.flush()
+
+        self._mock_runs(
+            mock_aioresponse,
+            settings.backend_uri_dev,
+            [
+                {
+                    "etl_project_id": etl_project_1_version_2.etl_project_id,
+                    "etl_project_version": etl_project_1_version_2.version,
+                    "etl_run": {
+                        "id": 12,
+                        "result": "RUNNING",
+                        "run_ts": datetime.now().isoformat(),
+                    },
+                },
+                {
+                    "etl_project_id": etl_project_2_version_1.etl_project_id,
+                    "etl_project_version": etl_project_2_version_1.version,
+                    "etl_run": {
+                        "id": 11,
+                        "result": "FAIL",
+                        "run_ts": datetime.now().isoformat(),
+                    },
+                },
+            ],
+        )
+        self._mock_runs(mock_aioresponse, settings.backend_uri_prod, [])
+
+        asyncio.run(update_etl_projects_statuses(db_session=db))
+
+        # незавершенный запуск 12 будет получен повторно следующим опросом
+        cursor = db.query(EtlRunCursor).filter(EtlRunCursor.backend == "dev").one()
+        assert cursor.last_run_id == 11
@@ -0,0 +1,116 @@
+from contextlib import contextmanager
+from queue import Queue
+from threading import Event
+
+import pytest
+from fs_common_lib.fs_general_api.data_types import (
+    CheckType,
+    ProjectCheckResult,
+    ProjectType,
+    SimpleCheckResult,
+)
+
+from fs_general_api.config import GitConnProtocol
+from fs_general_api.db_classes import CheckResultCache
+from fs_general_api.extra_processes.checker import EtlProjectChecker
+from fs_general_api.extra_processes.checker.check import CheckEventRequest
+from fs_general_api.extra_processes.mixins import ProjectsCheckout
+from fs_general_api.job_queue import LocalJobQueue
+
+
+@pytest.fixture
+def project_path(tmp_path):
+    path = tmp_path / "etl_project_1"
+    path.mkdir()
+    for file_name in ("settings.yaml", "requirements.txt", "features.yaml"):
+        (path / file_name).write_text("")
+    return path
+
+
+@pytest.fixture
+def checker(monkeypatch, project_path):
+    checker = EtlProjectChecker(
+        event_queue=LocalJobQueue(Queue()),
+        ctrl_queue=LocalJobQueue(Queue()),
+        ctrl_event=Event(),
+        git_conn_protocol=GitConnProtocol.SSH,
+        git_username=None,
+        git_password=None,
+    )
+    checker.branch_heads = {"feature": "sha-1"}
+    checker.checkouts = []
+
+    @contextmanager
+    def _checkout_projects(git_repo_url, branch_name, project_names, paths=None):
+        checker.checkouts.append(branch_name)
+        yield ProjectsCheckout(
+            root=project_path.parent, commit_sha=checker.branch_heads[branch_name]
+        )
+
+    monkeypatch.setattr(
+        checker,
+        "_resolve_branch_sha",
+        lambda git_repo_url, branch_name: checker.branch_heads[branch_name],
+    )
+    monkeypatch.setattr(checker, "_checkout_projects", _checkout_projects)
+    return checker
+
+
+def _check_request(branch_name: str = "feature") -> CheckEventRequest:
+    return CheckEventRequest(
+        etl_project_id=1,
+        etl_project_version="1",
+        etl_project_name="etl_project_1",
+        jira_task="TASK-1",
+        branch_name=branch_name,
+        general_check_id=1,
+        check_type=CheckType.TESTING,
+        git_repo="git.example.com/features.git",
+        project_type=ProjectType.FEATURES.value,
+    )
+
+
+def test_same_commit_is_checked_once(db, checker):
+    checker._process_checks(_check_request())
+    first = checker.ctrl_queue.queue.get_nowait()
+
+    assert not first.cached
+    assert first.commit_sha == "sha-1"
+    assert first.result == ProjectCheckResult.SUCCESS
+    assert db.query(CheckResultCache).count() == 1
+
+    checker._process_checks(_check_request())
+    second = checker.ctrl_queue.queue.get_nowait()
+
+    assert second.cached
+    assert second.result == first.result
+    assert second.checks == first.checks
+    assert checker.checkouts == ["feature"]
+
+
+def test_new_commit_is_checked_again(db, checker, project_path):
+    checker._process_checks(_check_request())
+    checker.ctrl_queue.queue.get_nowait()
+
+    checker.branch_heads["feature"] = "sha-2"
+    (project_path / "features.yaml").unlink()
+    checker._process_checks(_check_request())
+    response = checker.ctrl_queue.queue.get_nowait()
+
+    assert not response.cached
+    assert response.result == ProjectCheckResult.FAILED
+    assert SimpleCheckResult.FAILED in [check.result for check in response.checks]
+    assert checker.checkouts == ["feature", "feature"]
+
+
+def test_failed_checkout_is_not_cached(db, checker, monkeypatch):
+    @contextmanager
+    def _checkout_projects(**kwargs):
+        raise RuntimeError("git is unavailable")
+        yield
+
+    monkeypatch.setattr(checker, "_checkout_projects", _checkout_projects)
+    checker._process_checks(_check_request())
+
+    assert checker.ctrl_queue.queue.get_nowait().result == ProjectCheckResult.FAILED
+    assert db.query(CheckResultCache).count() == 0
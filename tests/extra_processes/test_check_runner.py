@@ -0,0 +1,126 @@
+import time
+
+import pytest
+from fs_common_lib.fs_general_api.data_types import (
+    ProjectType,
+    SimpleCheckResult,
+)
+
+from fs_general_api.extra_processes.checker.check import (
+    CheckInterface,
+    CheckResult,
+    RequiredFilesCheck,
+    ToPandasFilesContentCheck,
+)
+from fs_general_api.extra_processes.checker.registry import (
+    UnknownCheckError,
+    check_registry,
+)
+from fs_general_api.extra_processes.checker.runner import CheckRunner
+
+
+class SleepCheck(CheckInterface):
+    name = "sleep"
+    seconds = 0.3
+
+    def _process_check(self) -> CheckResult:
+        deadline = time.monotonic() + self.seconds
+        while time.monotonic() < deadline and not self.cancelled:
+            time.sleep(0.01)
+        return CheckResult(description="ok", result=SimpleCheckResult.SUCCESS)
+
+
+class OtherSleepCheck(SleepCheck):
+    name = "other_sleep"
+
+
+class SlowCheck(SleepCheck):
+    name = "slow"
+    seconds = 10
+    timeout = 0.1
+
+
+class QueuedCheck(SleepCheck):
+    name = "queued"
+    timeout = 0.5
+
+
+class BrokenCheck(CheckInterface):
+    name = "broken"
+
+    def _process_check(self) -> CheckResult:
+        raise RuntimeError("broken check")
+
+
+def test_checks_run_concurrently(tmp_path):
+    runner = CheckRunner([SleepCheck, OtherSleepCheck], max_workers=2)
+
+    started = time.monotonic()
+    check_run = runner.run(tmp_path, ProjectType.FEATURES)
+
+    assert time.monotonic() - started < 0.55
+    assert check_run.completed
+    assert [check.name for check in check_run.results] == ["sleep", "other_sleep"]
+    assert all(check.duration_seconds >= 0.3 for check in check_run.results)
+
+
+def test_timeout_fails_only_slow_check(tmp_path):
+    runner = CheckRunner([SlowCheck, SleepCheck], max_workers=2)
+
+    started = time.monotonic()
+    check_run = runner.run(tmp_path, ProjectType.FEATURES)
+
+    assert time.monotonic() - started < 1
+    assert not check_run.completed
+    slow, sleep = check_run.results
+    assert slow.result == SimpleCheckResult.FAILED
+    assert "0.1" in slow.description
+    assert sleep.result == SimpleCheckResult.SUCCESS
+
+
+def test_timeout_starts_when_check_runs(tmp_path):
+    # с одним потоком проверка ждет в очереди пула 0.3 с., это не входит в ее таймаут
+    runner = CheckRunner([SleepCheck, QueuedCheck], max_workers=1)
+
+    check_run = runner.run(tmp_path, ProjectType.FEATURES)
+
+    assert check_run.completed
+    assert [check.result for check in check_run.results] == [
+        SimpleCheckResult.SUCCESS,
+        SimpleCheckResult.SUCCESS,
+    ]
+
+
+def test_broken_check_is_reported(tmp_path):
+    check_run = CheckRunner([BrokenCheck, SleepCheck]).run(
+        tmp_path, ProjectType.FEATURES
+    )
+
+    assert not check_run.completed
+    assert check_run.results[0].result == SimpleCheckResult.FAILED
+    assert "broken check" in check_run.results[0].description
+    assert check_run.results[1].result == SimpleCheckResult.SUCCESS
+
+
+def test_registry_selects_checks_by_name():
+    assert check_registry.get_checks() == [
+        RequiredFilesCheck,
+        ToPandasFilesContentCheck,
+    ]
+    assert check_registry.get_checks(["to_pandas_files_content"]) == [
+        ToPandasFilesContentCheck
+    ]
+
+    with pytest.raises(UnknownCheckError):
+        check_registry.get_checks(["missing"])
+
+
+def test_signature_depends_on_check_versions():
+    runner = CheckRunner([SleepCheck, OtherSleepCheck])
+    signature = runner.signature
+
+    OtherSleepCheck.version = 2
+    try:
+        assert runner.signature != signature
+    finally:
+        OtherSleepCheck.version = 1
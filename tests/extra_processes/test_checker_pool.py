@@ -0,0 +1,77 @@
+import time
+from multiprocessing import Event, Queue
+
+from fs_common_lib.fs_general_api.data_types import CheckType, ProjectType
+
+from fs_general_api.config import GitConnProtocol
+from fs_general_api.extra_processes.checker import EtlProjectCheckerPool
+from fs_general_api.extra_processes.checker.check import CheckEventRequest
+from fs_general_api.job_queue import LocalJobQueue
+
+
+def _check_request(general_check_id: int) -> CheckEventRequest:
+    return CheckEventRequest(
+        etl_project_id=1,
+        etl_project_version="1",
+        etl_project_name="etl_project_1",
+        jira_task="TASK-1",
+        branch_name="feature",
+        general_check_id=general_check_id,
+        check_type=CheckType.TESTING,
+        git_repo="git.example.com/features.git",
+        project_type=ProjectType.FEATURES.value,
+    )
+
+
+def test_pool_drains_queue_and_stops():
+    ctrl_event = Event()
+    ctrl_event.set()
+    processed = Queue()
+    pool = EtlProjectCheckerPool(
+        event_queue=LocalJobQueue(),
+        ctrl_queue=LocalJobQueue(),
+        ctrl_event=ctrl_event,
+        git_conn_protocol=GitConnProtocol.SSH,
+        git_username=None,
+        git_password=None,
+        workers=1,
+        concurrency=1,
+        queue_timeout=0.1,
+        batch_size=3,
+    )
+    for worker in pool.workers:
+        # заменяет получение исходного кода и проверки, процессы наследуют замену при fork
+        worker._process_requests = lambda check_requests, sync_requests, worker=worker: (
+            processed.put(
+                (
+                    [request.general_check_id for request in check_requests],
+                    worker.in_flight.value,
+                )
+            )
+        )
+
+    for general_check_id in range(1, 7):
+        pool.event_queue.put(_check_request(general_check_id))
+    pool.start()
+
+    checked, batch_sizes, in_flight = [], [], []
+    deadline = time.monotonic() + 10
+    while len(checked) < 6 and time.monotonic() < deadline:
+        general_check_ids, value = processed.get(timeout=10)
+        checked.extend(general_check_ids)
+        batch_sizes.append(len(general_check_ids))
+        in_flight.append(value)
+
+    ctrl_event.clear()
+    pool.join(timeout=10)
+
+    assert sorted(checked) == list(range(1, 7))
+    # в работе учитываются задания, а не пачки
+    assert in_flight == batch_sizes
+    assert pool.stats() == {
+        "workers": 1,
+        "alive_workers": 0,
+        "concurrency": 1,
+        "in_flight": 0,
+        "queued": 0,
+    }
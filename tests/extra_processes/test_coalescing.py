@@ -0,0 +1,177 @@
+from contextlib import contextmanager
+from queue import Queue
+from threading import Event
+from unittest.mock import MagicMock
+
+import pytest
+from fs_common_lib.fs_general_api.data_types import (
+    CheckType,
+    ProjectCheckResult,
+    ProjectType,
+)
+from git.exc import GitCommandError
+
+from fs_general_api.config import GitConnProtocol
+from fs_general_api.extra_processes.checker import EtlProjectChecker
+from fs_general_api.extra_processes.checker.check import (
+    CheckEventRequest,
+    CheckEventResponse,
+)
+from fs_general_api.extra_processes.coalescing import (
+    coalesce_jobs,
+    group_by_branch,
+)
+from fs_general_api.extra_processes.mixins import ProjectsCheckout
+from fs_general_api.extra_processes.synchronizer.definitions import (
+    SynchronizeEventRequest,
+    SynchronizeEventResponse,
+)
+from fs_general_api.job_queue import ClaimedJob, LocalJobQueue
+
+
+def _check_request(
+    general_check_id: int,
+    etl_project_name: str = "etl_project_1",
+    branch_name: str = "refs/remotes/origin/feature",
+) -> CheckEventRequest:
+    return CheckEventRequest(
+        etl_project_id=1,
+        etl_project_version="1",
+        etl_project_name=etl_project_name,
+        jira_task="TASK-1",
+        branch_name=branch_name,
+        general_check_id=general_check_id,
+        check_type=CheckType.TESTING,
+        git_repo="git.example.com/features.git",
+        project_type=ProjectType.FEATURES.value,
+    )
+
+
+def _sync_request(branch_name: str = "feature") -> SynchronizeEventRequest:
+    return SynchronizeEventRequest(
+        etl_project_id=1,
+        etl_project_version="1",
+        etl_project_name="etl_project_1",
+        jira_task="TASK-1",
+        branch_name=branch_name,
+        git_repo="git.example.com/features.git",
+        project_type=ProjectType.FEATURES.value,
+    )
+
+
+@pytest.fixture
+def projects_root(tmp_path):
+    for project_name in ("etl_project_1", "etl_project_2"):
+        path = tmp_path / project_name
+        path.mkdir()
+        for file_name in ("requirements.txt", "features.yaml"):
+            (path / file_name).write_text("")
+        (path / "settings.yaml").write_text(
+            "dag_settings:\n  schedule_interval: 5 * * * *\n"
+        )
+    return tmp_path
+
+
+@pytest.fixture
+def checker(monkeypatch, projects_root):
+    checker = EtlProjectChecker(
+        event_queue=LocalJobQueue(Queue()),
+        ctrl_queue=LocalJobQueue(Queue()),
+        ctrl_event=Event(),
+        git_conn_protocol=GitConnProtocol.SSH,
+        git_username=None,
+        git_password=None,
+        sync_queue=LocalJobQueue(Queue()),
+    )
+    checker.checkouts = []
+
+    @contextmanager
+    def _checkout_projects(git_repo_url, branch_name, project_names, paths=None):
+        checker.checkouts.append((branch_name, project_names, paths))
+        yield ProjectsCheckout(root=projects_root, commit_sha="sha-1")
+
+    monkeypatch.setattr(checker, "_resolve_branch_sha", lambda **kwargs: None)
+    monkeypatch.setattr(checker, "_save_result", lambda response: None)
+    monkeypatch.setattr(checker, "_checkout_projects", _checkout_projects)
+    return checker
+
+
+def _responses(checker):
+    responses = []
+    while not checker.ctrl_queue.queue.empty():
+        responses.append(checker.ctrl_queue.queue.get_nowait())
+    return responses
+
+
+def test_coalesce_jobs_keeps_newest():
+    jobs = [ClaimedJob(item=_check_request(general_check_id)) for general_check_id in (1, 2, 1)]
+
+    kept, duplicates = coalesce_jobs(jobs, key=lambda request: request.general_check_id)
+
+    assert kept == [jobs[1], jobs[2]]
+    assert duplicates == [jobs[0]]
+
+
+def test_group_by_branch_normalizes_refs():
+    checks = [
+        ClaimedJob(item=_check_request(1)),
+        ClaimedJob(item=_check_request(2, branch_name="other")),
+    ]
+    syncs = [ClaimedJob(item=_sync_request("feature"))]
+
+    groups = group_by_branch(checks, syncs)
+
+    assert list(groups.values()) == [([checks[0]], syncs), ([checks[1]], [])]
+
+
+def test_branch_requests_share_one_checkout(checker):
+    check_jobs = [
+        ClaimedJob(item=_check_request(1)),
+        ClaimedJob(item=_check_request(2)),
+        ClaimedJob(item=_check_request(2)),
+        ClaimedJob(item=_check_request(3, etl_project_name="etl_project_2")),
+    ]
+    sync_jobs = [ClaimedJob(item=_sync_request()), ClaimedJob(item=_sync_request())]
+
+    checker._process_jobs(check_jobs, sync_jobs)
+
+    assert checker.checkouts == [
+        ("refs/remotes/origin/feature", ["etl_project_1", "etl_project_2"], None)
+    ]
+    responses = _responses(checker)
+    check_responses = [r for r in responses if isinstance(r, CheckEventResponse)]
+    sync_responses = [r for r in responses if isinstance(r, SynchronizeEventResponse)]
+
+    assert sorted(r.check_event_request.general_check_id for r in check_responses) == [1, 2, 3]
+    assert all(r.result == ProjectCheckResult.SUCCESS for r in check_responses)
+    assert [r.schedule_interval for r in sync_responses] == ["5 * * * *"]
+    assert len([r for r in responses if r.checkout_seconds is not None]) == 1
+
+
+def test_sync_only_checkout_fetches_settings(checker):
+    checker._process_jobs([], [ClaimedJob(item=_sync_request())])
+
+    assert checker.checkouts == [("feature", ["etl_project_1"], ["settings.yaml"])]
+    assert _responses(checker)[0].schedule_interval == "5 * * * *"
+
+
+def test_git_error_is_retried_before_failing(checker, monkeypatch):
+    @contextmanager
+    def _checkout_projects(**kwargs):
+        raise GitCommandError(["git", "fetch"], 128, "connection reset")
+        yield
+
+    monkeypatch.setattr(checker, "_checkout_projects", _checkout_projects)
+
+    # пока попытки не исчерпаны, задание возвращается в очередь без ответа
+    monkeypatch.setattr(checker.event_queue, "fail", MagicMock(return_value=False))
+    checker._process_jobs([ClaimedJob(item=_check_request(1))], [])
+
+    checker.event_queue.fail.assert_called_once()
+    assert _responses(checker) == []
+
+    monkeypatch.setattr(checker.event_queue, "fail", MagicMock(return_value=True))
+    checker._process_jobs([ClaimedJob(item=_check_request(1))], [])
+
+    [response] = _responses(checker)
+    assert response.result == ProjectCheckResult.FAILED
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from fs_general_api.extra_processes.checker.scanner import ContentScanner
+
+
+@pytest.fixture
+def project_path(tmp_path):
+    (tmp_path / "etl.py").write_text(
+        "import pandas\n\ndf = sdf.toPandas()\nrows = sdf.collect()\n"
+    )
+    (tmp_path / "empty.py").write_text("")
+    (tmp_path / "query.sql").write_text("select 1;\n-- collect()\n")
+    (tmp_path / "notebook.ipynb").write_text(
+        json.dumps(
+            {
+                "cells": [
+                    {"cell_type": "markdown", "source": ["Не используйте `.toPandas()`"]},
+                    {"cell_type": "code", "source": ["import pandas\n", "df = sdf.toPandas()\n"]},
+                ]
+            },
+            indent=1,
+        )
+    )
+    (tmp_path / "readme.md").write_text("sdf.toPandas()\n")
+    for ignored in (".ipynb_checkpoints", "__pycache__", ".git"):
+        (tmp_path / ignored).mkdir()
+        (tmp_path / ignored / "etl.py").write_text("sdf.toPandas()\n")
+    return tmp_path
+
+
+def test_scan_reports_file_and_line(project_path):
+    scanner = ContentScanner([".toPandas()", ".collect()"])
+
+    matches = scanner.scan(project_path)
+
+    assert [
+        (str(match.path.relative_to(project_path)), match.cell, match.line, match.token)
+        for match in matches
+    ] == [
+        ("etl.py", None, 3, ".toPandas()"),
+        ("etl.py", None, 4, ".collect()"),
+        # в ноутбуке указываются ячейка с кодом и строка в ней
+        ("notebook.ipynb", 2, 2, ".toPandas()"),
+    ]
+
+
+def test_scan_invalid_notebook_as_text(tmp_path):
+    (tmp_path / "notebook.ipynb").write_text("{\ndf = sdf.toPandas()\n")
+
+    matches = ContentScanner([".toPandas()"]).scan(tmp_path)
+
+    assert [(match.cell, match.line) for match in matches] == [(None, 2)]
+
+
+def test_scan_respects_suffixes(project_path):
+    scanner = ContentScanner(["collect()"], suffixes=(".sql",))
+
+    matches = scanner.scan(project_path)
+
+    assert [(match.path.name, match.line) for match in matches] == [
+        ("query.sql", 2)
+    ]
+
+
+def test_scan_in_parallel(tmp_path):
+    for index in range(50):
+        module = tmp_path / f"package_{index % 5}" / f"module_{index}.py"
+        module.parent.mkdir(exist_ok=True)
+        module.write_text("x = 1\n" * index + "df = sdf.toPandas()\n")
+
+    matches = ContentScanner([".toPandas()"], max_workers=4).scan(tmp_path)
+
+    assert len(matches) == 50
+    assert {match.line for match in matches} == set(range(1, 51))
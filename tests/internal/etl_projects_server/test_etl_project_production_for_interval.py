@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+
+import croniter
+import pytest
+from fs_db.db_classes_general import EtlProjectVersion
+
+from fs_general_api.db_classes import EtlScheduleFireTime, EtlScheduleIndex
+from fs_general_api.schedule_index import refresh_versions
+
+
+@pytest.mark.usefixtures(
+    "etl_project_1_version_1",
+    "etl_project_1_version_2",
+    "etl_project_2_version_1",
+)
+class TestProductionProjectsForInterval:
+    url = "internal/etl/get_production_projects_for_interval"
+
+    @pytest.fixture(autouse=True)
+    def schedule_index(
+        self,
+        db,
+        etl_project_1_version_1: EtlProjectVersion,
+        etl_project_1_version_2: EtlProjectVersion,
+        etl_project_2_version_1: EtlProjectVersion,
+    ):
+        refresh_versions(
+            db,
+            [etl_project_1_version_1, etl_project_1_version_2, etl_project_2_version_1],
+        )
+
+    @staticmethod
+    def _expected_run_ts(version: EtlProjectVersion, start: datetime) -> str:
+        return (
+            croniter.croniter(version.schedule_interval, start)
+            .get_next(datetime)
+            .isoformat()
+        )
+
+    def test_schedule_index_is_materialized(
+        self, db, etl_project_1_version_1: EtlProjectVersion
+    ):
+        assert (
+            db.query(EtlScheduleIndex)
+            .filter(
+                EtlScheduleIndex.etl_project_version_id
+                == etl_project_1_version_1.id
+            )
+            .one()
+            .schedule_interval
+            == etl_project_1_version_1.schedule_interval
+        )
+        assert (
+            db.query(EtlScheduleFireTime)
+            .filter(
+                EtlScheduleFireTime.etl_project_version_id
+                == etl_project_1_version_1.id
+            )
+            .count()
+            > 0
+        )
+
+    def test_from_schedule_index(
+        self, db, client, etl_project_1_version_1: EtlProjectVersion
+    ):
+        start = datetime.now()
+        end = start + timedelta(hours=2)
+
+        response = client.get(
+            self.url,
+            params={
+                "datetime_start": start.isoformat(),
+                "datetime_end": end.isoformat(),
+            },
+        )
+
+        assert response.status_code == 200
+        assert [item["run_ts"] for item in response.json()] == [
+            self._expected_run_ts(etl_project_1_version_1, start)
+        ]
+
+    def test_outside_schedule_index(
+        self, db, client, etl_project_1_version_1: EtlProjectVersion
+    ):
+        start = datetime.now() + timedelta(days=30)
+        end = start + timedelta(hours=2)
+
+        response = client.get(
+            self.url,
+            params={
+                "datetime_start": start.isoformat(),
+                "datetime_end": end.isoformat(),
+            },
+        )
+
+        assert response.status_code == 200
+        assert [item["run_ts"] for item in response.json()] == [
+            self._expected_run_ts(etl_project_1_version_1, start)
+        ]
+
+    def test_unscheduled_version_is_removed(
+        self, db, client, etl_project_1_version_1: EtlProjectVersion
+    ):
+        etl_project_1_version_1.schedule_interval = None
+        refresh_versions(db, [etl_project_1_version_1])
+
+        assert (
+            db.query(EtlScheduleFireTime)
+            .filter(
+                EtlScheduleFireTime.etl_project_version_id
+                == etl_project_1_version_1.id
+            )
+            .count()
+            == 0
+        )
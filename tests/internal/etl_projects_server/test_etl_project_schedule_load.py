@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fs_db.db_classes_general import EtlProjectVersion
+
+from fs_general_api.schedule_load import ScheduleLoadCalculator
+
+
+@pytest.mark.usefixtures(
+    "etl_project_1_version_1",
+    "etl_project_1_version_2",
+    "etl_project_2_version_1",
+)
+class TestScheduleLoad:
+    url = "internal/etl/schedule_load"
+
+    def test_success(
+        self, db, client, etl_project_1_version_1: EtlProjectVersion
+    ):
+        start = datetime(2024, 1, 1, 10, 0)
+
+        response = client.get(
+            self.url,
+            params={
+                "start": start.isoformat(),
+                "end": (start + timedelta(hours=3)).isoformat(),
+                "bucket": 60,
+                "group_by_hub": True,
+            },
+        )
+
+        assert response.status_code == 200
+        assert response.json() == [
+            {
+                "start": (start + timedelta(hours=hour)).isoformat(),
+                "count": 1,
+                "hubs": {str(etl_project_1_version_1.etl_project.hub_id): 1},
+            }
+            for hour in range(3)
+        ]
+
+    def test_schedule_change(
+        self, db, client, etl_project_1_version_1: EtlProjectVersion
+    ):
+        start = datetime(2024, 1, 1, 10, 0)
+        params = {
+            "start": start.isoformat(),
+            "end": (start + timedelta(hours=1)).isoformat(),
+            "bucket": 60,
+        }
+
+        response = client.get(self.url, params=params)
+        assert [bucket["count"] for bucket in response.json()] == [1]
+
+        etl_project_1_version_1.schedule_interval = "*/30 * * * *"
+        db.flush()
+
+        response = client.get(self.url, params=params)
+        assert [bucket["count"] for bucket in response.json()] == [2]
+
+    def test_invalid_period(self, db, client):
+        start = datetime(2024, 1, 1, 10, 0)
+
+        response = client.get(
+            self.url,
+            params={
+                "start": start.isoformat(),
+                "end": (start - timedelta(hours=1)).isoformat(),
+            },
+        )
+
+        assert response.status_code == 400
+
+    def test_mixed_timezones(self, db, client):
+        start = datetime(2024, 1, 1, 10, 0)
+
+        response = client.get(
+            self.url,
+            params={
+                "start": start.isoformat(),
+                "end": (start + timedelta(hours=1)).replace(tzinfo=timezone.utc).isoformat(),
+            },
+        )
+
+        assert response.status_code == 400
+
+
+def test_calculate_without_hub():
+    start = datetime(2024, 1, 1, 10, 0)
+
+    buckets = ScheduleLoadCalculator.calculate(
+        [("0 * * * *", 1, 1), ("0 * * * *", None, 2)],
+        start=start,
+        end=start + timedelta(hours=1),
+        bucket_minutes=60,
+        group_by_hub=True,
+    )
+
+    assert [(bucket.count, bucket.hubs) for bucket in buckets] == [(3, {1: 1, None: 2})]
@@ -0,0 +1,105 @@
+from datetime import datetime
+
+import pytest
+from fs_common_lib.fs_general_api.data_types import EtlProjectStatus
+from fs_db.db_classes_general import EtlProjectVersion, HistoryEvent
+
+
+@pytest.mark.usefixtures(
+    "etl_project_1_version_1",
+    "etl_project_1_version_2",
+    "etl_project_2_version_1",
+)
+class TestEtlRunEventsView:
+    url = "internal/etl/run_events"
+
+    @staticmethod
+    def _event(etl_project_version: EtlProjectVersion, run_id: int, result: str):
+        return {
+            "etl_project_id": etl_project_version.etl_project_id,
+            "etl_project_version": etl_project_version.version,
+            "etl_run": {
+                "id": run_id,
+                "result": result,
+                "run_ts": datetime.now().isoformat(),
+            },
+        }
+
+    def test_dev_success_moves_to_testing(
+        self,
+        db,
+        client,
+        etl_project_1_version_2: EtlProjectVersion,
+    ):
+        response = client.post(
+            self.url,
+            json={
+                "source": "dev",
+                "events": [
+                    self._event(etl_project_1_version_2, 1, "SUCCESS"),
+                    self._event(etl_project_1_version_2, 1, "SUCCESS"),
+                ],
+            },
+        )
+
+        assert response.status_code == 200
+
+        db.refresh(etl_project_1_version_2)
+        assert etl_project_1_version_2.status == EtlProjectStatus.TESTING
+        assert (
+            db.query(HistoryEvent)
+            .filter(
+                HistoryEvent.etl_project_version_id
+                == etl_project_1_version_2.id
+            )
+            .count()
+            == 1
+        )
+
+    def test_prod_success_turns_off_active_version(
+        self,
+        db,
+        client,
+        etl_project_1_version_1: EtlProjectVersion,
+        etl_project_1_version_2: EtlProjectVersion,
+    ):
+        etl_project_1_version_2.status = EtlProjectStatus.PROD_REVIEW
+        db.add(etl_project_1_version_2)
+        db.flush()
+
+        response = client.post(
+            self.url,
+            json={
+                "source": "prod",
+                "events": [
+                    self._event(etl_project_1_version_2, 1, "FAIL"),
+                    self._event(etl_project_1_version_2, 2, "SUCCESS"),
+                ],
+            },
+        )
+
+        assert response.status_code == 200
+
+        db.refresh(etl_project_1_version_1)
+        db.refresh(etl_project_1_version_2)
+        assert etl_project_1_version_2.status == EtlProjectStatus.PRODUCTION
+        assert etl_project_1_version_1.status == EtlProjectStatus.TURNED_OFF
+
+    def test_dev_fail_keeps_status(
+        self,
+        db,
+        client,
+        etl_project_1_version_2: EtlProjectVersion,
+    ):
+        response = client.post(
+            self.url,
+            json={
+                "source": "dev",
+                "events": [self._event(etl_project_1_version_2, 1, "FAIL")],
+            },
+        )
+
+        assert response.status_code == 200
+
+        db.refresh(etl_project_1_version_2)
+        assert etl_project_1_version_2.status == EtlProjectStatus.DEVELOPING
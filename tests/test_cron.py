@@ -0,0 +1,75 @@
+import re
+from datetime import datetime, timedelta
+
+import croniter
+import pytest
+from hypothesis import given, settings, strategies as st
+
+from fs_general_api.cron import CompiledCronSet, CronExpressionError
+from fs_general_api.extra_processes.synchronizer.synchronizer import (
+    EtlProjectSynchronizer,
+)
+
+FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+
+def _field(low: int, high: int):
+    return st.one_of(
+        st.just("*"),
+        st.integers(low, high).map(str),
+        st.integers(1, high).map(lambda step: f"*/{step}"),
+    )
+
+
+cron_expressions = st.tuples(
+    *(_field(low, high) for low, high in FIELD_RANGES)
+).map(" ".join)
+
+start_times = st.datetimes(
+    min_value=datetime(2000, 1, 1), max_value=datetime(2090, 1, 1)
+)
+
+
+def _croniter_next(expression: str, after: datetime):
+    try:
+        return croniter.croniter(expression, after).get_next(datetime)
+    except croniter.CroniterBadDateError:
+        return None
+
+
+@settings(max_examples=500, deadline=None)
+@given(expression=cron_expressions, after=start_times)
+def test_next_fire_time_matches_croniter(expression: str, after: datetime):
+    assert re.search(EtlProjectSynchronizer.CRON_EXPRESSION_PATTERN, expression)
+
+    assert CompiledCronSet([expression]).next_fire_times(after) == [
+        _croniter_next(expression, after)
+    ]
+
+
+@settings(max_examples=100, deadline=None)
+@given(
+    expressions=st.lists(cron_expressions, min_size=1, max_size=50),
+    start=start_times,
+    window=st.integers(1, 3 * 24 * 60),
+)
+def test_fires_between_matches_croniter(expressions, start: datetime, window):
+    end = start + timedelta(minutes=window)
+
+    expected = []
+    for expression in expressions:
+        fire_time = _croniter_next(expression, start - timedelta(microseconds=1))
+        expected.append(fire_time is not None and fire_time < end)
+
+    assert CompiledCronSet(expressions).fires_between(start, end).tolist() == expected
+
+
+@pytest.mark.parametrize(
+    "expression",
+    ["*/0 * * * *", "60 * * * *", "* 24 * * *", "* * 0 * *", "1-5 * * * *", "* * * *"],
+)
+def test_unsupported_expression(expression: str):
+    assert not CompiledCronSet.is_supported(expression)
+
+    with pytest.raises(CronExpressionError):
+        CompiledCronSet([expression])
@@ -0,0 +1,214 @@
+from queue import Queue
+from unittest.mock import MagicMock
+
+import pytest
+from fs_common_lib.fs_general_api.data_types import (
+    CheckType,
+    ProjectCheckResult,
+    ProjectType,
+    SimpleCheckResult,
+)
+from fs_db.db_classes_general import EtlProjectVersion, GeneralCheck
+
+from fs_general_api import event_handler as event_handler_module
+from fs_general_api.config import settings
+from fs_general_api.db_classes import OutboxMessage
+from fs_general_api.event_handler import EventHandler
+from fs_general_api.extra_processes.checker.check import (
+    CheckEventRequest,
+    CheckEventResponse,
+    CheckResult,
+)
+from fs_general_api.extra_processes.synchronizer.definitions import (
+    SynchronizeEventRequest,
+    SynchronizeEventResponse,
+)
+from fs_general_api.job_queue import ClaimedJob, LocalJobQueue
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    monkeypatch.setattr(settings, "use_outbox", True)
+    return EventHandler(
+        ctrl_queue=LocalJobQueue(Queue()), batch_size=10, queue_timeout=0.01
+    )
+
+
+def _check_response(
+    etl_project_version: EtlProjectVersion, general_check: GeneralCheck
+) -> CheckEventResponse:
+    return CheckEventResponse(
+        result=ProjectCheckResult.SUCCESS,
+        checks=[CheckResult(description="ok", result=SimpleCheckResult.SUCCESS)],
+        check_event_request=CheckEventRequest(
+            etl_project_id=etl_project_version.etl_project_id,
+            etl_project_version=etl_project_version.version,
+            etl_project_name=etl_project_version.etl_project.name,
+            jira_task="TASK-1",
+            branch_name="branch_name",
+            general_check_id=general_check.id,
+            check_type=CheckType.TESTING,
+            git_repo="git.example.com/features.git",
+            project_type=ProjectType.FEATURES.value,
+        ),
+    )
+
+
+def _synchronize_response(
+    etl_project_version: EtlProjectVersion, schedule_interval: str
+) -> SynchronizeEventResponse:
+    return SynchronizeEventResponse(
+        synchronize_event_request=SynchronizeEventRequest(
+            etl_project_id=etl_project_version.etl_project_id,
+            etl_project_version=etl_project_version.version,
+            etl_project_name=etl_project_version.etl_project.name,
+            jira_task="TASK-1",
+            branch_name="branch_name",
+            git_repo="git.example.com/features.git",
+            project_type=ProjectType.FEATURES.value,
+        ),
+        schedule_interval=schedule_interval,
+    )
+
+
+def test_drain_limits_batch_size(handler):
+    handler.batch_size = 2
+    for index in range(3):
+        handler.ctrl_queue.put(index)
+
+    assert [job.item for job in handler.drain()] == [0, 1]
+    assert [job.item for job in handler.drain()] == [2]
+    assert handler.drain() == []
+    assert handler.stats()["last_batch_size"] == 1
+
+
+def test_batch_is_applied_with_one_lookup_per_version(
+    db, handler, monkeypatch, general_check_1, etl_project_1_version_2
+):
+    second_check = GeneralCheck(
+        etl_project_version=general_check_1.etl_project_version,
+        result=ProjectCheckResult.PROCESSING,
+    )
+    db.add(second_check)
+    db.flush()
+
+    get_etl_project_version = MagicMock(
+        wraps=handler.data_storage.get_etl_project_version
+    )
+    monkeypatch.setattr(
+        handler.data_storage, "get_etl_project_version", get_etl_project_version
+    )
+
+    handler.handle_responses(
+        [
+            ClaimedJob(
+                _check_response(
+                    general_check_1.etl_project_version, general_check_1
+                )
+            ),
+            ClaimedJob(
+                _synchronize_response(etl_project_1_version_2, "5 * * * *")
+            ),
+            ClaimedJob(
+                _check_response(general_check_1.etl_project_version, second_check)
+            ),
+        ]
+    )
+
+    assert get_etl_project_version.call_count == 2
+    assert general_check_1.result == ProjectCheckResult.SUCCESS
+    assert second_check.result == ProjectCheckResult.SUCCESS
+    assert [check.description for check in second_check.checks] == ["ok"]
+    assert etl_project_1_version_2.schedule_interval == "5 * * * *"
+
+    message = db.query(OutboxMessage).one()
+    assert message.url.endswith(f"/internal/etl/{etl_project_1_version_2.etl_project_id}")
+    assert message.payload == {
+        "data": {"cron": "5 * * * *"},
+        "general_etl_project_version": etl_project_1_version_2.version,
+    }
+
+
+def test_superseded_check_response_is_ignored(db, handler, general_check_1):
+    general_check_1.result = ProjectCheckResult.FAILED
+    db.flush()
+
+    handler.handle_responses(
+        [
+            ClaimedJob(
+                _check_response(
+                    general_check_1.etl_project_version, general_check_1
+                )
+            )
+        ]
+    )
+
+    assert general_check_1.result == ProjectCheckResult.FAILED
+    assert general_check_1.checks == []
+
+
+def test_failed_response_does_not_block_batch(
+    db, handler, general_check_1, etl_project_1_version_2
+):
+    # откат неудачной пачки не должен затронуть данные фикстур
+    db.commit()
+    missing_check = GeneralCheck(id=-1)
+
+    handler.handle_responses(
+        [
+            ClaimedJob(
+                _check_response(
+                    general_check_1.etl_project_version, missing_check
+                )
+            ),
+            ClaimedJob(
+                _synchronize_response(etl_project_1_version_2, "5 * * * *")
+            ),
+        ]
+    )
+
+    assert general_check_1.result == ProjectCheckResult.PROCESSING
+    assert etl_project_1_version_2.schedule_interval == "5 * * * *"
+    assert db.query(OutboxMessage).count() == 1
+
+
+def test_schedule_update_is_posted_without_outbox(
+    db, handler, monkeypatch, etl_project_1_version_2
+):
+    monkeypatch.setattr(settings, "use_outbox", False)
+    monkeypatch.setattr(
+        event_handler_module, "_post", MagicMock(return_value=MagicMock(status_code=200))
+    )
+
+    handler.handle_responses(
+        [ClaimedJob(_synchronize_response(etl_project_1_version_2, "5 * * * *"))]
+    )
+
+    assert etl_project_1_version_2.schedule_interval == "5 * * * *"
+    assert db.query(OutboxMessage).count() == 0
+    event_handler_module._post.assert_called_once()
+    assert event_handler_module._post.call_args[1]["json"] == {
+        "data": {"cron": "5 * * * *"},
+        "general_etl_project_version": etl_project_1_version_2.version,
+    }
+
+
+def test_failed_schedule_post_does_not_stop_other_updates(
+    db, handler, monkeypatch, etl_project_1_version_2, etl_project_2_version_1
+):
+    monkeypatch.setattr(settings, "use_outbox", False)
+    monkeypatch.setattr(
+        event_handler_module,
+        "_post",
+        MagicMock(side_effect=[ConnectionError("unavailable"), MagicMock(status_code=200)]),
+    )
+
+    handler.handle_responses(
+        [
+            ClaimedJob(_synchronize_response(etl_project_1_version_2, "5 * * * *")),
+            ClaimedJob(_synchronize_response(etl_project_2_version_1, "10 * * * *")),
+        ]
+    )
+
+    assert event_handler_module._post.call_count == 2
+    assert etl_project_2_version_1.schedule_interval == "10 * * * *"
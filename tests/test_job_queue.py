@@ -0,0 +1,259 @@
+import time
+from queue import Queue
+from threading import Timer
+
+import pytest
+from fs_common_lib.fs_general_api.data_types import (
+    CheckType,
+    ProjectCheckResult,
+    ProjectType,
+    SimpleCheckResult,
+)
+
+from fs_general_api.db_classes import Job, JobStatus
+from fs_general_api.extra_processes.checker.check import (
+    CheckEventRequest,
+    CheckEventResponse,
+    CheckResult,
+)
+from fs_general_api.job_queue import (
+    DbJobQueue,
+    JobDecodeError,
+    LocalJobQueue,
+    decode_item,
+    encode_item,
+)
+
+QUEUE_NAME = "test_queue"
+
+
+def _check_request(general_check_id: int = 1) -> CheckEventRequest:
+    return CheckEventRequest(
+        etl_project_id=1,
+        etl_project_version="1",
+        etl_project_name="etl_project_1",
+        jira_task="TASK-1",
+        branch_name="feature",
+        general_check_id=general_check_id,
+        check_type=CheckType.TESTING,
+        git_repo="git.example.com/features.git",
+        project_type=ProjectType.FEATURES.value,
+    )
+
+
+@pytest.fixture
+def job_queue(db):
+    yield DbJobQueue(
+        name=QUEUE_NAME,
+        item_types=[CheckEventRequest],
+        lease_timeout=60,
+        max_attempts=2,
+        poll_interval=0,
+        use_notify=False,
+    )
+    db.rollback()
+    db.query(Job).filter(Job.queue == QUEUE_NAME).delete()
+    db.commit()
+
+
+def test_codec_round_trip():
+    response = CheckEventResponse(
+        result=ProjectCheckResult.FAILED,
+        checks=[
+            CheckResult(description="ok", result=SimpleCheckResult.SUCCESS),
+            CheckResult(description="bad", result=SimpleCheckResult.FAILED),
+        ],
+        check_event_request=_check_request(),
+    )
+
+    decoded = decode_item(encode_item(response), [CheckEventResponse])
+
+    assert decoded == response
+    assert decoded.checks[1].result is SimpleCheckResult.FAILED
+    assert decoded.check_event_request.check_type is CheckType.TESTING
+
+
+def test_decode_unknown_type():
+    with pytest.raises(JobDecodeError):
+        decode_item(encode_item(_check_request()), [CheckEventResponse])
+
+
+def test_put_claim_complete(db, job_queue):
+    job_queue.put(_check_request(1))
+    job_queue.put(_check_request(2))
+    assert job_queue.qsize() == 2
+
+    jobs = job_queue.claim_batch(limit=10, timeout=0)
+
+    assert [job.item.general_check_id for job in jobs] == [1, 2]
+    assert [job.attempts for job in jobs] == [1, 1]
+    assert job_queue.qsize() == 0
+    assert job_queue.claim(timeout=0.05) is None
+
+    job_queue.complete(jobs)
+    assert db.query(Job).filter(Job.queue == QUEUE_NAME).count() == 0
+
+
+def test_jobs_are_claimed_by_priority(job_queue):
+    job_queue.put(_check_request(1))
+    job_queue.put(_check_request(2), priority=10)
+    job_queue.put(_check_request(3))
+
+    jobs = job_queue.claim_batch(limit=2, timeout=0)
+
+    assert [job.item.general_check_id for job in jobs] == [2, 1]
+
+
+def test_fair_queue_alternates_keys(job_queue):
+    job_queue.fair = True
+    for general_check_id, hub in ((1, "1"), (2, "1"), (3, "1"), (4, "2")):
+        job_queue.put(_check_request(general_check_id), fairness_key=hub)
+
+    jobs = [job_queue.claim(timeout=0) for _ in range(4)]
+
+    assert [job.item.general_check_id for job in jobs] == [1, 4, 2, 3]
+
+
+def test_pending_job_is_superseded(db, job_queue):
+    job_queue.put(_check_request(1), supersede_key="1:1:TESTING")
+    job_queue.put(_check_request(2), supersede_key="1:1:REVIEW")
+    job_queue.put(_check_request(3), supersede_key="1:1:TESTING")
+
+    jobs = job_queue.claim_batch(limit=10, timeout=0)
+
+    assert [job.item.general_check_id for job in jobs] == [2, 3]
+
+
+def test_failed_job_is_retried_then_dead(db, job_queue, monkeypatch):
+    monkeypatch.setattr("fs_general_api.job_queue.settings.job_backoff_base", 0)
+    job_queue.put(_check_request())
+
+    job = job_queue.claim(timeout=0)
+    assert job_queue.fail(job, "first error") is False
+
+    job = job_queue.claim(timeout=0)
+    assert job.attempts == 2
+    assert job_queue.fail(job, "second error") is True
+
+    row = db.query(Job).filter(Job.id == job.id).one()
+    db.refresh(row)
+    assert row.status == JobStatus.DEAD.value
+    assert row.last_error == "second error"
+    assert job_queue.claim(timeout=0) is None
+
+
+def test_expired_lease_is_reclaimed_then_reaped(db, job_queue):
+    job_queue.lease_timeout = -1
+    job_queue.put(_check_request())
+
+    first = job_queue.claim(timeout=0)
+    assert job_queue.reap_expired() == []
+
+    second = job_queue.claim(timeout=0)
+    assert second.id == first.id
+    assert second.attempts == 2
+
+    dead = job_queue.reap_expired()
+    assert [job.id for job in dead] == [first.id]
+    assert dead[0].item == _check_request()
+    assert job_queue.claim(timeout=0) is None
+
+
+def test_stale_claim_cannot_complete_or_fail_job(db, job_queue):
+    job_queue.lease_timeout = -1
+    job_queue.put(_check_request())
+
+    stale = job_queue.claim(timeout=0)
+    job_queue.lease_timeout = 60
+    current = job_queue.claim(timeout=0)
+    assert current.attempts == 2
+
+    # обработчик с истекшей арендой не удаляет и не возвращает в очередь задание,
+    # выданное повторно
+    job_queue.complete([stale])
+    assert job_queue.fail(stale, "stale error") is False
+
+    row = db.query(Job).filter(Job.id == current.id).one()
+    db.refresh(row)
+    assert row.status == JobStatus.RUNNING.value
+    assert row.last_error is None
+
+    job_queue.complete([current])
+    assert db.query(Job).filter(Job.queue == QUEUE_NAME).count() == 0
+
+
+def test_put_wakes_listening_queue(db, job_queue):
+    listening_queue = DbJobQueue(
+        name=QUEUE_NAME,
+        item_types=[CheckEventRequest],
+        use_notify=True,
+        notify_fallback_interval=60,
+    )
+    try:
+        assert listening_queue.claim(timeout=0) is None
+
+        job_queue.put(_check_request())
+
+        started = time.monotonic()
+        job = listening_queue.claim(timeout=10)
+        assert job.item == _check_request()
+        assert time.monotonic() - started < 5
+    finally:
+        listening_queue.listener.close()
+
+
+def test_put_is_seen_without_waiting(db, job_queue):
+    listening_queue = DbJobQueue(
+        name=QUEUE_NAME,
+        item_types=[CheckEventRequest],
+        use_notify=True,
+        notify_fallback_interval=60,
+    )
+    try:
+        assert listening_queue.claim_batch(limit=10, timeout=0) == []
+
+        job_queue.put(_check_request())
+
+        # очередь, которую опрашивают без ожидания, получает задание до периода опроса
+        deadline = time.monotonic() + 5
+        jobs = []
+        while not jobs and time.monotonic() < deadline:
+            jobs = listening_queue.claim_batch(limit=10, timeout=0)
+        assert [job.item for job in jobs] == [_check_request()]
+    finally:
+        listening_queue.listener.close()
+
+
+def test_local_jobs_are_claimed_by_priority():
+    local_queue = LocalJobQueue(Queue(), Queue())
+    local_queue.put(_check_request(1))
+    local_queue.put(_check_request(2), priority=10)
+    local_queue.put(_check_request(3))
+
+    jobs = local_queue.claim_batch(limit=2, timeout=0)
+    jobs += local_queue.claim_batch(limit=2, timeout=0)
+
+    assert [job.item.general_check_id for job in jobs] == [2, 1, 3]
+    assert local_queue.claim_batch(limit=2, timeout=0) == []
+
+
+def test_local_pending_job_is_superseded():
+    local_queue = LocalJobQueue(Queue(), Queue())
+    local_queue.put(_check_request(1), supersede_key="1:1:TESTING")
+    local_queue.put(_check_request(2), priority=10, supersede_key="1:1:REVIEW")
+    local_queue.put(_check_request(3), supersede_key="1:1:TESTING")
+
+    jobs = local_queue.claim_batch(limit=10, timeout=0)
+
+    assert [job.item.general_check_id for job in jobs] == [2, 3]
+
+
+def test_local_priority_put_wakes_waiting_claim():
+    local_queue = LocalJobQueue(Queue(), Queue())
+    Timer(0.1, local_queue.put, args=(_check_request(1),), kwargs={"priority": 10}).start()
+
+    started = time.monotonic()
+    jobs = local_queue.claim_batch(limit=1, timeout=5)
+
+    assert [job.item.general_check_id for job in jobs] == [1]
+    assert time.monotonic() - started < 5
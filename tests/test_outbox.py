@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from yarl import URL
+
+from fs_general_api.db import data_storage
+from fs_general_api.db_classes import OutboxMessage, OutboxMessageStatus
+from fs_general_api.http_clients import Upstream
+from fs_general_api.outbox import IDEMPOTENCY_KEY_HEADER, OutboxDispatcher
+
+URL_1 = "http://backend-prod/internal/etl/1"
+URL_2 = "http://backend-prod/internal/etl/2"
+
+
+@pytest.fixture
+def dispatcher() -> OutboxDispatcher:
+    return OutboxDispatcher(batch_size=10, concurrency=2, max_attempts=2)
+
+
+def _add_message(db, url: str, supersede: bool = False) -> OutboxMessage:
+    message = data_storage.add_outbox_message(
+        db_session=db,
+        upstream=Upstream.BACKEND_PROD.value,
+        method="POST",
+        url=url,
+        payload={"data": {"cron": "5 * * * *"}},
+        supersede=supersede,
+    )
+    db.flush()
+    return message
+
+
+def test_dispatch_delivers_with_idempotency_key(db, dispatcher, mock_aioresponse):
+    message = _add_message(db, URL_1)
+    mock_aioresponse.post(URL_1, status=200)
+
+    assert asyncio.run(dispatcher.dispatch_pending(db)) == 1
+
+    assert message.status == OutboxMessageStatus.DELIVERED.value
+    assert message.attempts == 1
+    request = mock_aioresponse.requests[("POST", URL(URL_1))][0]
+    assert request.kwargs["headers"][IDEMPOTENCY_KEY_HEADER] == message.idempotency_key
+    assert request.kwargs["json"] == {"data": {"cron": "5 * * * *"}}
+
+    assert asyncio.run(dispatcher.dispatch_pending(db)) == 0
+
+
+def test_dispatch_retries_with_backoff(db, dispatcher, mock_aioresponse):
+    failed = _add_message(db, URL_1)
+    delivered = _add_message(db, URL_2)
+    mock_aioresponse.post(URL_1, status=503, repeat=True)
+    mock_aioresponse.post(URL_2, status=200)
+
+    asyncio.run(dispatcher.dispatch_pending(db))
+
+    assert delivered.status == OutboxMessageStatus.DELIVERED.value
+    assert failed.status == OutboxMessageStatus.PENDING.value
+    assert failed.attempts == 1
+    assert failed.last_error.startswith("503")
+    assert failed.next_attempt_ts > datetime.now()
+
+    # до наступления времени повтора запрос не отправляется
+    assert asyncio.run(dispatcher.dispatch_pending(db)) == 0
+
+    later = datetime.now() + timedelta(hours=1)
+    assert asyncio.run(dispatcher.dispatch_pending(db, now=later)) == 1
+    assert failed.status == OutboxMessageStatus.FAILED.value
+    assert failed.attempts == 2
+
+
+def test_claimed_message_is_leased(db, dispatcher, mock_aioresponse):
+    message = _add_message(db, URL_1)
+    mock_aioresponse.post(URL_1, status=200)
+
+    # запрос, взятый в доставку другой репликой, не отправляется до истечения аренды
+    [delivery] = dispatcher._claim(db)
+    assert asyncio.run(dispatcher.dispatch_pending(db)) == 0
+
+    later = datetime.now() + dispatcher.lease + timedelta(seconds=1)
+    assert asyncio.run(dispatcher.dispatch_pending(db, now=later)) == 1
+    assert message.status == OutboxMessageStatus.DELIVERED.value
+
+    # результат реплики, у которой истекла аренда, не перезаписывает доставленный запрос
+    dispatcher._record_results(db, [delivery], ["503: unavailable"])
+    assert message.status == OutboxMessageStatus.DELIVERED.value
+    assert message.attempts == 1
+
+
+def test_messages_to_same_url_are_delivered_in_order(db, dispatcher, mock_aioresponse):
+    first = _add_message(db, URL_1)
+    second = _add_message(db, URL_1)
+    mock_aioresponse.post(URL_1, status=503)
+    mock_aioresponse.post(URL_1, status=200, repeat=True)
+
+    # более поздний запрос не отправляется, пока ожидает повтора более ранний
+    assert asyncio.run(dispatcher.dispatch_pending(db)) == 1
+    assert first.attempts == 1
+    assert second.attempts == 0
+
+    later = datetime.now() + timedelta(hours=1)
+    assert asyncio.run(dispatcher.dispatch_pending(db, now=later)) == 1
+    assert first.status == OutboxMessageStatus.DELIVERED.value
+    assert second.status == OutboxMessageStatus.PENDING.value
+
+    assert asyncio.run(dispatcher.dispatch_pending(db, now=later)) == 1
+    assert second.status == OutboxMessageStatus.DELIVERED.value
+
+
+def test_pending_message_is_superseded(db, dispatcher, mock_aioresponse):
+    leased = _add_message(db, URL_1)
+    dispatcher._claim(db)
+    superseded = _add_message(db, URL_1)
+    latest = _add_message(db, URL_1, supersede=True)
+    db.refresh(leased)
+    db.refresh(superseded)
+
+    # запрос, взятый в доставку, не заменяется и будет доставлен первым
+    assert leased.status == OutboxMessageStatus.PENDING.value
+    assert superseded.status == OutboxMessageStatus.SUPERSEDED.value
+    assert latest.status == OutboxMessageStatus.PENDING.value
+
+    mock_aioresponse.post(URL_1, status=200, repeat=True)
+    later = datetime.now() + dispatcher.lease + timedelta(seconds=1)
+    assert asyncio.run(dispatcher.dispatch_pending(db, now=later)) == 1
+    assert asyncio.run(dispatcher.dispatch_pending(db, now=later)) == 1
+    assert leased.status == OutboxMessageStatus.DELIVERED.value
+    assert latest.status == OutboxMessageStatus.DELIVERED.value
+    assert len(mock_aioresponse.requests[("POST", URL(URL_1))]) == 2
@@ -45,3 +45,81 @@ class TestEtlHistoryEventsView:
             "new_value": history_event_2.new_value,
             "old_value": history_event_2.old_value,
         } in response.json()["items"]
+
+    def test_total(
+        self,
+        db,
+        client,
+        etl_project_1_version_2: EtlProjectVersion,
+        history_event_1: HistoryEvent,
+        history_event_2: HistoryEvent,
+    ):
+        response = client.get(
+            self.url.format(etl_id=etl_project_1_version_2.etl_project_id),
+            params={"version": etl_project_1_version_2.version, "limit": 1},
+        )
+
+        assert response.status_code == 200
+        assert len(response.json()["items"]) == 1
+        assert response.json()["total"] == 2
+
+
+@pytest.mark.usefixtures(
+    "etl_project_1_version_1",
+    "etl_project_1_version_2",
+)
+class TestEtlHistoryEventsByCursorView:
+    url = "v2/etl/{etl_id}/history_event/cursor"
+
+    def test_pages(
+        self,
+        db,
+        client,
+        etl_project_1_version_2: EtlProjectVersion,
+        history_event_1: HistoryEvent,
+        history_event_2: HistoryEvent,
+    ):
+        url = self.url.format(etl_id=etl_project_1_version_2.etl_project_id)
+        params = {
+            "version": etl_project_1_version_2.version,
+            "limit": 1,
+            "with_total": True,
+        }
+
+        response = client.get(url, params=params)
+
+        assert response.status_code == 200
+        assert [item["id"] for item in response.json()["items"]] == [
+            history_event_2.id
+        ]
+        assert response.json()["total"] == 2
+        assert response.json()["next_cursor"] is not None
+
+        response = client.get(
+            url, params={**params, "cursor": response.json()["next_cursor"]}
+        )
+
+        assert response.status_code == 200
+        assert [item["id"] for item in response.json()["items"]] == [
+            history_event_1.id
+        ]
+        assert response.json()["total"] == 2
+        assert response.json()["next_cursor"] is None
+
+    def test_without_total(
+        self,
+        db,
+        client,
+        etl_project_1_version_2: EtlProjectVersion,
+        history_event_1: HistoryEvent,
+    ):
+        response = client.get(
+            self.url.format(etl_id=etl_project_1_version_2.etl_project_id),
+            params={"version": etl_project_1_version_2.version},
+        )
+
+        assert response.status_code == 200
+        assert [item["id"] for item in response.json()["items"]] == [
+            history_event_1.id
+        ]
+        assert response.json()["total"] is None
@@ -157,3 +157,24 @@ class TestEtlListView:
             ],
             "total": 1,
         }
+
+    def test_search_filter_case_insensitive(
+        self,
+        db,
+        client,
+        etl_project_2_version_1: EtlProjectVersion,
+    ):
+        response = client.get(
+            self.url, params={"search": "PROJECT_2", "ranked": True}
+        )
+
+        assert response.status_code == 200
+        assert [item["id"] for item in response.json()["items"]] == [
+            etl_project_2_version_1.etl_project.id
+        ]
+
+    def test_search_filter_escapes_wildcards(self, db, client):
+        response = client.get(self.url, params={"search": "project%2"})
+
+        assert response.status_code == 200
+        assert response.json()["items"] == []
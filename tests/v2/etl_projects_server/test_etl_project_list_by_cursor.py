@@ -0,0 +1,99 @@
+import pytest
+
+from fs_common_lib.fs_general_api.data_types import EtlProjectStatus
+from fs_db.db_classes_general import EtlProjectVersion
+
+
+@pytest.mark.usefixtures(
+    "etl_project_1_version_1",
+    "etl_project_1_version_2",
+    "etl_project_2_version_1",
+)
+class TestEtlListByCursorView:
+    url = "v2/etl/list_by_cursor"
+
+    def test_pages(
+        self,
+        db,
+        client,
+        etl_project_1_version_1: EtlProjectVersion,
+        etl_project_2_version_1: EtlProjectVersion,
+    ):
+        projects = sorted(
+            [etl_project_1_version_1.etl_project, etl_project_2_version_1.etl_project],
+            key=lambda etl_project: (etl_project.name, etl_project.id),
+        )
+
+        response = client.get(self.url, params={"limit": 1})
+
+        assert response.status_code == 200
+        assert [item["id"] for item in response.json()["items"]] == [
+            projects[0].id
+        ]
+        assert response.json()["next_cursor"] is not None
+
+        response = client.get(
+            self.url,
+            params={"limit": 1, "cursor": response.json()["next_cursor"]},
+        )
+
+        assert response.status_code == 200
+        assert [item["id"] for item in response.json()["items"]] == [
+            projects[1].id
+        ]
+        assert response.json()["next_cursor"] is None
+
+    def test_order_by_id(
+        self,
+        db,
+        client,
+        etl_project_1_version_1: EtlProjectVersion,
+        etl_project_2_version_1: EtlProjectVersion,
+    ):
+        response = client.get(self.url, params={"order_by": "id"})
+
+        assert response.status_code == 200
+        assert [item["id"] for item in response.json()["items"]] == sorted(
+            [
+                etl_project_1_version_1.etl_project.id,
+                etl_project_2_version_1.etl_project.id,
+            ]
+        )
+        assert response.json()["next_cursor"] is None
+
+    def test_status_filter(
+        self,
+        db,
+        client,
+        etl_project_2_version_1: EtlProjectVersion,
+    ):
+        response = client.get(
+            self.url, params={"status": EtlProjectStatus.TESTING.value}
+        )
+
+        assert response.status_code == 200
+        assert response.json() == {
+            "items": [
+                {
+                    "description": etl_project_2_version_1.etl_project.description,
+                    "hub_id": etl_project_2_version_1.etl_project.hub_id,
+                    "id": etl_project_2_version_1.etl_project.id,
+                    "name": etl_project_2_version_1.etl_project.name,
+                    "versions": [
+                        {
+                            "author_email": etl_project_2_version_1.author_email,
+                            "author_name": etl_project_2_version_1.author_name,
+                            "jira_task": etl_project_2_version_1.jira_task,
+                            "status": etl_project_2_version_1.status.value,
+                            "version": etl_project_2_version_1.version,
+                        }
+                    ],
+                }
+            ],
+            "next_cursor": None,
+        }
+
+    def test_invalid_cursor(self, db, client):
+        response = client.get(self.url, params={"cursor": "not-a-cursor"})
+
+        assert response.status_code == 400
@@ -0,0 +1,56 @@
+import pytest
+
+from fs_db.db_classes_general import EtlProjectVersion
+
+
+@pytest.mark.usefixtures(
+    "etl_project_1_version_1",
+    "etl_project_2_version_1",
+)
+class TestEtlSuggestView:
+    url = "v2/etl/suggest"
+
+    def test_success(
+        self,
+        db,
+        client,
+        etl_project_1_version_1: EtlProjectVersion,
+        etl_project_2_version_1: EtlProjectVersion,
+    ):
+        response = client.get(self.url, params={"prefix": "ETL_project"})
+
+        assert response.status_code == 200
+        assert response.json() == [
+            {
+                "id": etl_project_1_version_1.etl_project.id,
+                "name": etl_project_1_version_1.etl_project.name,
+            },
+            {
+                "id": etl_project_2_version_1.etl_project.id,
+                "name": etl_project_2_version_1.etl_project.name,
+            },
+        ]
+
+    def test_limit(
+        self,
+        db,
+        client,
+        etl_project_1_version_1: EtlProjectVersion,
+    ):
+        response = client.get(
+            self.url, params={"prefix": "etl_project", "limit": 1}
+        )
+
+        assert response.status_code == 200
+        assert response.json() == [
+            {
+                "id": etl_project_1_version_1.etl_project.id,
+                "name": etl_project_1_version_1.etl_project.name,
+            }
+        ]
+
+    def test_prefix_only(self, db, client):
+        response = client.get(self.url, params={"prefix": "project"})
+
+        assert response.status_code == 200
+        assert response.json() == []